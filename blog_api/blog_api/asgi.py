@@ -2,6 +2,8 @@
 ASGI config for blog_api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with ``uvicorn blog_api.asgi:application`` so async views such as
+the AI streaming endpoint (posts/streaming.py) don't tie up a worker thread.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -10,7 +12,9 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from dotenv import load_dotenv
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blog_api.settings')
+load_dotenv()
 
 application = get_asgi_application()
@@ -1,19 +1,39 @@
+import importlib.util
 import os
+import tempfile
 from pathlib import Path
-from dotenv import load_dotenv
 import dj_database_url
 from decouple import config
 
-load_dotenv()
-print( dj_database_url.parse(os.getenv('DATABASE_URL')))
+# .env is loaded by the entry points (manage.py, wsgi.py, asgi.py), not here
 GEMINI_API_KEY = config("GEMINI_API_KEY")
 BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv('SECRET_KEY')
 DEBUG = os.getenv('DEBUG') == 'True'
 
+# Persistent connections: DB_CONN_MAX_AGE seconds (0 closes after every
+# request), with a liveness check before reuse. Django 4.2 has no pool of its
+# own; behind PgBouncer in transaction mode set DB_PGBOUNCER=True.
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 60))
+
+
+def _database(url):
+    config = dj_database_url.parse(url, conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=True)
+    if os.getenv('DB_PGBOUNCER') == 'True':
+        config['DISABLE_SERVER_SIDE_CURSORS'] = True
+    return config
+
+
 DATABASES = {
-    'default': dj_database_url.parse(os.getenv('DATABASE_URL'))
+    'default': _database(os.getenv('DATABASE_URL'))
 }
+# Optional read replica for the read-only views (posts/db_router.py). Tests
+# run it against the primary's test database.
+if os.getenv('REPLICA_DATABASE_URL'):
+    DATABASES['replica'] = {**_database(os.getenv('REPLICA_DATABASE_URL')), 'TEST': {'MIRROR': 'default'}}
+DATABASE_ROUTERS = ['posts.db_router.ReplicaRouter']
+# Browsers that just wrote read from the primary for this long
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 10))
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -28,8 +48,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so Server-Timing and /metrics cover the whole stack
+    'posts.instrumentation.InstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # gzip/brotli; before anything that reads or changes the response body
+    'posts.middleware.CompressionMiddleware',
+    'posts.middleware.RateLimitHeadersMiddleware',
+    # Before SessionMiddleware so session saves count as writes
+    'posts.middleware.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -71,6 +98,14 @@ SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_ANON_KEY = os.getenv('SUPABASE_ANON_KEY')
 SUPABASE_SERVICE_ROLE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 
+# JWKS key source for SupabaseJWTAuthentication. Defaults to
+# {SUPABASE_URL}/auth/v1/.well-known/jwks.json; may also be a local file path.
+SUPABASE_JWKS_URL = os.getenv('SUPABASE_JWKS_URL')
+SUPABASE_JWKS_REFRESH_SECONDS = int(os.getenv('SUPABASE_JWKS_REFRESH_SECONDS', 600))
+# Verified-token LRU (0 disables it). Entries never outlive the token's exp.
+SUPABASE_TOKEN_CACHE_SIZE = int(os.getenv('SUPABASE_TOKEN_CACHE_SIZE', 1024))
+SUPABASE_TOKEN_CACHE_TTL = int(os.getenv('SUPABASE_TOKEN_CACHE_TTL', 300))
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
@@ -79,7 +114,8 @@ CORS_ALLOWED_ORIGINS = [
 # Template settings
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, timed for Server-Timing (posts/instrumentation.py)
+        'BACKEND': 'posts.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],  # Project-level templates
         'APP_DIRS': True,  # Look for templates in app directories
         'OPTIONS': {
@@ -102,12 +138,21 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'  # Production - for collectstatic
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Media storage caches exists/size/url lookups (see posts/storage.py)
+STORAGES = {
+    "default": {"BACKEND": "posts.storage.CachedFileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+MEDIA_METADATA_CACHE_TTL = int(os.getenv('MEDIA_METADATA_CACHE_TTL', 300))
+
 
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
 # REST Framework with JWT Authentication
+_HAS_MSGPACK = importlib.util.find_spec('msgpack') is not None
+
 REST_FRAMEWORK = {
     # Authentication
     'DEFAULT_AUTHENTICATION_CLASSES': (
@@ -121,23 +166,143 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ),
 
+    # Encoding (posts/renderers.py); MessagePack only when msgpack is installed
+    'DEFAULT_RENDERER_CLASSES': [
+        'posts.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        *(['posts.renderers.MessagePackRenderer'] if _HAS_MSGPACK else []),
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'posts.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        *(['posts.renderers.MessagePackParser'] if _HAS_MSGPACK else []),
+    ],
+
     # Pagination
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 
+    # Sliding-window limits in the shared cache (posts/throttling.py):
+    # reads, writes and AI generation each have their own rate per client
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.UserRateThrottle',
-        'rest_framework.throttling.AnonRateThrottle',
+        'posts.throttling.RequestKindThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
-        'user': '4/hour',  
-        'anon': '1/hour', 
+        'read': os.getenv('THROTTLE_READ_RATE', '300/min'),
+        'write': os.getenv('THROTTLE_WRITE_RATE', '60/min'),
+        'ai': os.getenv('THROTTLE_AI_RATE', '10/hour'),
+        # TestView demo
+        'user': '4/hour',
+        'anon': '1/hour',
     }
 }
-CACHES = { 
+# Full-text search backend for posts (see posts/search.py): 'auto' picks the
+# tsvector backend on PostgreSQL and the inverted-index table elsewhere.
+POST_SEARCH_BACKEND = os.getenv('POST_SEARCH_BACKEND', 'auto')
+
+# Image pipeline (see posts/images.py): 'thread' renders variants on a small
+# worker pool after commit, 'sync' renders inline after commit.
+IMAGE_PIPELINE_MODE = os.getenv('IMAGE_PIPELINE_MODE', 'thread')
+IMAGE_PIPELINE_WORKERS = int(os.getenv('IMAGE_PIPELINE_WORKERS', 2))
+IMAGE_VARIANT_WIDTHS = (400, 800, 1200)
+
+# Anonymous HTML page + fragment cache (see posts/page_cache.py). Entries are
+# invalidated by version bumps from signals; the timeout only bounds memory.
+PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED', 'True') == 'True'
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', 60 * 60 * 24))
+
+# AI post generation (see posts/jobs.py). AI_JOB_MODE is 'thread', 'worker'
+# (run `manage.py run_ai_jobs`) or 'sync'. Submissions are refused with 503
+# once AI_JOB_MAX_QUEUE jobs are queued or running. A running job untouched
+# for AI_JOB_STALE_AFTER seconds lost its worker and is requeued; the check
+# (and, in thread mode, re-dispatching queued jobs) runs every
+# AI_JOB_RECOVER_INTERVAL seconds.
+AI_LLM_BACKEND = os.getenv('AI_LLM_BACKEND', 'posts.ai.LiteLLMBackend')
+AI_MODEL = os.getenv('AI_MODEL', 'gemini/gemini-flash-lite-latest')
+AI_JOB_MODE = os.getenv('AI_JOB_MODE', 'thread')
+AI_JOB_CONCURRENCY = int(os.getenv('AI_JOB_CONCURRENCY', 2))
+AI_JOB_MAX_QUEUE = int(os.getenv('AI_JOB_MAX_QUEUE', 20))
+AI_JOB_TIMEOUT = int(os.getenv('AI_JOB_TIMEOUT', 60))
+AI_JOB_MAX_ATTEMPTS = int(os.getenv('AI_JOB_MAX_ATTEMPTS', 3))
+AI_JOB_RETRY_BACKOFF = float(os.getenv('AI_JOB_RETRY_BACKOFF', 1.0))
+AI_JOB_STALE_AFTER = int(os.getenv('AI_JOB_STALE_AFTER', 600))
+AI_JOB_RECOVER_INTERVAL = int(os.getenv('AI_JOB_RECOVER_INTERVAL', 60))
+
+# Generated text is reused for identical prompts (see posts/llm_cache.py).
+# AI_PROMPT_CACHE_TTL = 0 disables reuse; identical in-flight calls still coalesce.
+AI_PROMPT_CACHE_TTL = int(os.getenv('AI_PROMPT_CACHE_TTL', 3600))
+AI_PROMPT_CACHE_SIZE = int(os.getenv('AI_PROMPT_CACHE_SIZE', 256))
+
+# Responses smaller than this (bytes) are sent uncompressed (posts/middleware.py)
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.getenv('RESPONSE_COMPRESSION_MIN_SIZE', 1024))
+
+# Per-request instrumentation (see posts/instrumentation.py): Server-Timing
+# headers, and a JSON line on the 'posts.slow_requests' logger for requests
+# slower than SLOW_REQUEST_MS or making SLOW_REQUEST_QUERIES queries or more.
+# /metrics needs METRICS_TOKEN as a Bearer token; without one it is only
+# served when DEBUG is on.
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'True') == 'True'
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 500))
+SLOW_REQUEST_QUERIES = int(os.getenv('SLOW_REQUEST_QUERIES', 50))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'posts.slow_requests': {'handlers': ['console'], 'level': 'WARNING'},
+    },
+}
+
+# Bulk API endpoints (see posts/bulk.py): largest array accepted per request.
+API_BULK_MAX_ITEMS = int(os.getenv('API_BULK_MAX_ITEMS', 500))
+
+# Post view counters (see posts/counters.py): 'memory', 'cache' or 'sync'.
+# At most VIEW_COUNTER_FLUSH_SECONDS of views can be lost if a worker dies.
+VIEW_COUNTER_MODE = os.getenv('VIEW_COUNTER_MODE', 'memory')
+VIEW_COUNTER_FLUSH_SECONDS = int(os.getenv('VIEW_COUNTER_FLUSH_SECONDS', 10))
+
+# Two-tier cache (posts/cache.py): a small per-process LRU in front of a
+# cache shared by every worker. REDIS_URL selects Redis (pip install redis);
+# without it a file-backed store under CACHE_DIR stands in, shared
+# by the processes of one host (increments are serialised with flock()).
+REDIS_URL = os.getenv('REDIS_URL')
+# Counters, throttle histories, version stamps and read pins: the cache holds
+# the only copy, so they never enter L1 and the file-backed store never culls
+# them (only expired ones are removed).
+CACHE_STATE_PREFIXES = [
+    "content-version:", "content-modified:", "page-cache:stats:", "llm:stats:",
+    "view-counts:", "throttle_", "two-tier:", "db-pin:",
+]
+CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "cache-1",
-    }
+        "BACKEND": "posts.cache.TwoTierCache",
+        "LOCATION": "default",
+        "OPTIONS": {
+            "L2": "shared",
+            "L1_MAX_ENTRIES": int(os.getenv('CACHE_L1_MAX_ENTRIES', 1000)),
+            # Longest a value overwritten by another worker can still be served
+            "L1_TIMEOUT": float(os.getenv('CACHE_L1_TIMEOUT', 5)),
+            # How often each worker checks for deletes made by the others
+            "L1_SYNC_INTERVAL": float(os.getenv('CACHE_L1_SYNC_INTERVAL', 1)),
+            "L1_EXCLUDE": CACHE_STATE_PREFIXES,
+        },
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+    } if REDIS_URL else {
+        "BACKEND": "posts.cache.StateFileBasedCache",
+        "LOCATION": os.getenv('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'blog_api_cache')),
+        "OPTIONS": {
+            # Culling removes a random third of the other entries when full
+            "MAX_ENTRIES": int(os.getenv('CACHE_MAX_ENTRIES', 10000)),
+            "KEEP_PREFIXES": CACHE_STATE_PREFIXES,
+        },
+    },
 }
 
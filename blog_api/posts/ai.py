@@ -0,0 +1,250 @@
+"""AI blog generation: prompt building, LLM backends and output parsing.
+
+The backend is chosen with settings.AI_LLM_BACKEND (a dotted path). The
+default calls Gemini through litellm; StubLLMBackend returns canned JSON so
+tests and local runs work offline. Backends implement ``complete()``, which
+returns a Completion, and the async generator ``astream()``, which yields text
+and leaves the token usage on ``self.usage`` when it ends. Callers go through
+posts/llm_cache.py rather than using a backend directly.
+"""
+import ast
+import asyncio
+import json
+import re
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from django.utils.text import slugify
+
+DEFAULT_MODEL = "gemini/gemini-flash-lite-latest"
+
+Completion = namedtuple('Completion', ['text', 'usage'])
+
+
+def _usage_dict(usage):
+    if not usage:
+        return {}
+    return {
+        name: getattr(usage, name, 0) or 0
+        for name in ('prompt_tokens', 'completion_tokens', 'total_tokens')
+    }
+
+
+def build_messages(prompt):
+    return [
+        {
+            "role": "user",
+            "content": f"Generate a detailed blog post about: \"{prompt}\".\n\n"
+                       "Return your output ONLY as a valid JSON object, with these exact keys:\n"
+                       "- title (string)\n"
+                       "- content (string)\n"
+                       "- excerpt (string)\n\n"
+                       "Rules:\n"
+                       "1. Do not include any text before or after the JSON.\n"
+                       "2. Do not use markdown or code blocks.\n"
+                       "3. The JSON must be valid and directly parsable using json.loads()."
+        }
+    ]
+
+
+def get_model():
+    return getattr(settings, 'AI_MODEL', DEFAULT_MODEL)
+
+
+class LiteLLMBackend:
+    usage = None
+
+    def complete(self, messages, timeout=None):
+        from litellm import completion  # heavy; imported on first use, not at startup
+
+        response = completion(
+            model=get_model(),
+            messages=messages,
+            api_key=settings.GEMINI_API_KEY,
+            timeout=timeout,
+            log_file="litellm_logs.txt"
+        )
+        return Completion(response['choices'][0]['message']['content'], _usage_dict(response.get('usage')))
+
+    async def astream(self, messages, timeout=None):
+        from litellm import acompletion
+
+        response = await acompletion(
+            model=get_model(),
+            messages=messages,
+            api_key=settings.GEMINI_API_KEY,
+            timeout=timeout,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        async for chunk in response:
+            if getattr(chunk, 'usage', None):
+                self.usage = _usage_dict(chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
+
+class StubLLMBackend:
+    """Offline backend: echoes the prompt back as a small blog post."""
+
+    chunk_size = 8
+    usage = None
+
+    def complete(self, messages, timeout=None):
+        prompt = messages[-1]["content"]
+        match = re.search(r'about: "(.*?)"', prompt, re.S)
+        topic = match.group(1) if match else prompt[:50]
+        text = json.dumps({
+            "title": f"About {topic}",
+            "content": f"A generated post about {topic}.",
+            "excerpt": f"All about {topic}",
+        })
+        # Roughly four characters per token, like the real tokenizers
+        prompt_tokens, completion_tokens = len(prompt) // 4, len(text) // 4
+        return Completion(text, {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+        })
+
+    async def astream(self, messages, timeout=None):
+        text, self.usage = self.complete(messages, timeout)
+        for i in range(0, len(text), self.chunk_size):
+            yield text[i:i + self.chunk_size]
+            await asyncio.sleep(0)
+
+
+def get_llm_backend():
+    path = getattr(settings, 'AI_LLM_BACKEND', 'posts.ai.LiteLLMBackend')
+    return import_string(path)()
+
+
+def parse_ai_output(text):
+    """Best-effort parse of the model's reply into a dict with title/content/excerpt."""
+    text = (text or '').strip()
+    # Models sometimes wrap the JSON in a ```json fence despite the instructions
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text)
+    match = re.search(r"\{.*\}", text, re.S)
+    candidates = [text] + ([match.group(0)] if match else [])
+    for candidate in candidates:
+        for loader in (json.loads, ast.literal_eval):
+            try:
+                parsed = loader(candidate)
+            except (ValueError, SyntaxError):
+                continue
+            if isinstance(parsed, dict):
+                return parsed
+    return {}
+
+
+def generated_post_fields(prompt, ai_output):
+    """Title/content/excerpt for a post, falling back to the raw output."""
+    parsed = parse_ai_output(ai_output)
+    title = parsed.get('title') or f"AI: {prompt}"
+    content = parsed.get('content') or ai_output
+    excerpt = (parsed.get('excerpt') or content[:150])[:150]
+    return {'title': title, 'content': content, 'excerpt': excerpt}
+
+
+class StreamingFieldParser:
+    """Pull string fields out of a JSON object while it is still streaming.
+
+    ``feed(chunk)`` returns ``[(field, text), ...]`` for the characters of the
+    top-level string values of ``fields`` seen in that chunk, with escapes
+    decoded. It only drives the live preview: the stored post is always
+    parsed from the complete output with parse_ai_output().
+    """
+    ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self, fields=('title', 'content', 'excerpt')):
+        self.fields = set(fields)
+        self._depth = 0
+        self._expect_key = False
+        self._in_string = False
+        self._is_key = False
+        self._escape = None
+        self._key_chars = []
+        self._key = None
+
+    def feed(self, chunk):
+        deltas = []
+        for ch in chunk:
+            if not self._in_string:
+                self._structural(ch)
+                continue
+            if self._escape is not None:
+                self._escape += ch
+                if self._escape[0] == 'u':
+                    if len(self._escape) < 5:
+                        continue
+                    try:
+                        text = chr(int(self._escape[1:], 16))
+                    except ValueError:
+                        text = ''
+                else:
+                    text = self.ESCAPES.get(ch, ch)
+                self._escape = None
+            elif ch == '\\':
+                self._escape = ''
+                continue
+            elif ch == '"':
+                self._in_string = False
+                self._key = ''.join(self._key_chars) if self._is_key else None
+                continue
+            else:
+                text = ch
+
+            if self._is_key:
+                self._key_chars.append(text)
+            elif self._depth == 1 and self._key in self.fields and text:
+                if deltas and deltas[-1][0] == self._key:
+                    deltas[-1] = (self._key, deltas[-1][1] + text)
+                else:
+                    deltas.append((self._key, text))
+        return deltas
+
+    def _structural(self, ch):
+        if ch == '"':
+            self._in_string = True
+            self._is_key = self._expect_key and self._depth == 1
+            self._key_chars = []
+        elif ch in '{[':
+            self._depth += 1
+            self._expect_key = ch == '{'
+        elif ch in '}]':
+            self._depth -= 1
+        elif ch == ':':
+            self._expect_key = False
+        elif ch == ',':
+            self._expect_key = True
+
+
+def unique_slug(title, max_length=50):
+    from .models import Post
+
+    base = slugify(title)[:max_length] or 'post'
+    slug, n = base, 2
+    while Post.objects.filter(slug=slug).exists():
+        suffix = f"-{n}"
+        slug = f"{base[:max_length - len(suffix)]}{suffix}"
+        n += 1
+    return slug
+
+
+def create_generated_post(user, prompt, ai_output, post_status="draft"):
+    from django.utils import timezone
+
+    from .models import Post
+
+    fields = generated_post_fields(prompt, ai_output)
+    return Post.objects.create(
+        author=user,
+        slug=unique_slug(fields['title']),
+        status=post_status,
+        published_at=timezone.now() if post_status == "published" else None,
+        **fields,
+    )
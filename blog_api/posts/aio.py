@@ -0,0 +1,40 @@
+"""Helpers for the async views.
+
+Django 4.2 has no ``request.auser()``, and touching the lazy ``request.user``
+from the event loop raises SynchronousOnlyOperation once a session has to be
+loaded. The async views resolve the user up front with aget_user(), after
+which templates and context processors can read it freely.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import render
+
+# Templates read the cache and the storage (fragments, media URLs), so
+# rendering happens in a worker thread, off the event loop.
+_render = sync_to_async(render)
+
+
+def _load_user(request):
+    user = request.user
+    user.is_authenticated  # evaluate the lazy object
+    return user
+
+
+async def aget_user(request):
+    """request.user, loaded without blocking the event loop.
+
+    Visitors without a session cookie are anonymous and need no database
+    access, so the common case never leaves the event loop.
+    """
+    if not hasattr(request, '_async_user'):
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            request._async_user = await sync_to_async(_load_user)(request)
+        else:
+            request._async_user = _load_user(request)
+    return request._async_user
+
+
+async def arender(request, template_name, context=None, status=None):
+    """render() for async views; all data in `context` must already be loaded."""
+    await aget_user(request)
+    return await _render(request, template_name, context, status=status)
@@ -1,16 +1,14 @@
-import requests
 import jwt
-from jwt import PyJWKClient
-from django.conf import settings
-from django.contrib.auth import get_user_model
+from asgiref.sync import sync_to_async
 from rest_framework import authentication, exceptions
-
-User = get_user_model()
+from .aio import aget_user
+from .jwks import get_jwks_cache, get_token_cache
+from .identity import aresolve_identity, resolve_identity
 
 class SupabaseJWTAuthentication(authentication.BaseAuthentication):
     """Authenticate requests using Supabase JWT (Bearer token)."""
     
-    def authenticate(self, request):
+    def _bearer_token(self, request):
         auth_header = request.headers.get('Authorization')
         if not auth_header:
             return None
@@ -22,22 +20,11 @@ class SupabaseJWTAuthentication(authentication.BaseAuthentication):
             
         if scheme.lower() != 'bearer':
             return None
+        return token
 
-        # Use the existing Supabase URL from your settings
-        jwks_url = f"{settings.SUPABASE_URL}/auth/v1/.well-known/jwks.json"
-        
+    def _verified_payload(self, token):
         try:
-            jwk_client = PyJWKClient(jwks_url)
-            signing_key = jwk_client.get_signing_key_from_jwt(token)
-            
-            # Enhanced token decoding with better error handling
-            payload = jwt.decode(
-                token, 
-                signing_key.key, 
-                algorithms=["RS256"], 
-                options={"verify_aud": False}
-            )
-            
+            payload = self.decode_token(token)
         except jwt.ExpiredSignatureError:
             raise exceptions.AuthenticationFailed('Token has expired')
         except jwt.InvalidTokenError as e:
@@ -45,55 +32,86 @@ class SupabaseJWTAuthentication(authentication.BaseAuthentication):
         except Exception as e:
             raise exceptions.AuthenticationFailed(f'Authentication failed: {str(e)}')
 
-        supabase_user_id = payload.get('sub')
-        if not supabase_user_id:
+        if not payload.get('sub'):
             raise exceptions.AuthenticationFailed('Token missing sub claim')
+        return payload
+
+    def authenticate(self, request):
+        token = self._bearer_token(request)
+        if token is None:
+            return None
+        payload = self._verified_payload(token)
 
-        # Use the email as username if available, otherwise use the supabase ID
-        email = payload.get('email', '')
-        username = email if email else supabase_user_id
-        
-        # Get or create user - enhanced to handle edge cases
+        # Map the Supabase identity to a local user; returning users cost a
+        # single cached lookup and no writes.
         try:
-            user, created = User.objects.get_or_create(
-                username=username, 
-                defaults={'email': email}
-            )
-            
-            # Update email if it changed in Supabase
-            if user.email != email and email:
-                user.email = email
-                user.save()
-                
+            user, profile = resolve_identity(payload['sub'], payload.get('email', ''))
         except Exception as e:
             raise exceptions.AuthenticationFailed(f'Could not create user: {str(e)}')
-        
-        # Create or update profile - with error handling
+
+        return (user, token)
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views.
+
+        A token seen before and a returning user are handled entirely on the
+        event loop; only a first-time token (RSA check, maybe a JWKS fetch)
+        or a new identity goes to a thread.
+        """
+        token = self._bearer_token(request)
+        if token is None:
+            return None
+        if get_token_cache().get(token) is not None:
+            payload = self._verified_payload(token)
+        else:
+            payload = await sync_to_async(self._verified_payload)(token)
+
         try:
-            from .models import Profile
-            profile, profile_created = Profile.objects.get_or_create(
-                user=user, 
-                defaults={
-                    'auth_id': supabase_user_id,
-                    'username': username,
-                    'email': email  
-                }
-            )
-            
-            # Update profile if it already existed
-            if not profile_created:
-                profile.auth_id = supabase_user_id
-                if hasattr(profile, 'email') and email:
-                    profile.email = email
-                profile.save()
-                
+            user, profile = await aresolve_identity(payload['sub'], payload.get('email', ''))
         except Exception as e:
-            # Don't fail authentication if profile creation fails
-            print(f"Profile creation error: {str(e)}")
-            # Continue with user authentication anyway
-        
+            raise exceptions.AuthenticationFailed(f'Could not create user: {str(e)}')
+
         return (user, token)
 
+    def decode_token(self, token):
+        """Verify the token against the cached JWKS keys.
+
+        A token that was verified before (and hasn't expired) is served from
+        the verified-token cache without repeating the RSA check.
+        """
+        token_cache = get_token_cache()
+        payload = token_cache.get(token)
+        if payload is not None:
+            return payload
+
+        signing_key = get_jwks_cache().get_signing_key_from_jwt(token)
+        payload = jwt.decode(
+            token,
+            signing_key.key,
+            algorithms=["RS256"],
+            options={"verify_aud": False}
+        )
+        token_cache.set(token, payload)
+        return payload
+
     def authenticate_header(self, request):
         """Return value for WWW-Authenticate header."""
-        return 'Bearer realm="api"'
\ No newline at end of file
+        return 'Bearer realm="api"'
+
+
+async def aauthenticate_request(request):
+    """(user, auth) for async API views, trying what DRF would, in the same order.
+
+    Honours rest_framework.test.force_authenticate(), then the Supabase bearer
+    token, then the session. Anonymous requests give (None, None).
+    """
+    forced_user = getattr(request, '_force_auth_user', None)
+    if forced_user is not None:
+        return forced_user, getattr(request, '_force_auth_token', None)
+    result = await SupabaseJWTAuthentication().aauthenticate(request)
+    if result is not None:
+        return result
+    user = await aget_user(request)
+    if user.is_authenticated and user.is_active:
+        return user, None
+    return None, None
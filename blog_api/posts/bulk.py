@@ -0,0 +1,256 @@
+"""Bulk create/update/delete for the API viewsets.
+
+``POST``, ``PATCH`` and ``DELETE`` on ``<list url>/bulk/`` take a JSON array
+and answer with one result per item, in input order::
+
+    {"results": [{"index": 0, "status": 201, "data": {...}},
+                 {"index": 1, "status": 400, "errors": {...}}]}
+
+The response is 207 when any item failed. Items are validated one by one
+(BulkListSerializer) and all targets are fetched in one query, so object
+permissions are checked without refetching. The valid items are then written
+with a single bulk_create()/bulk_update()/delete() in one transaction.
+Updates and deletes identify objects by the viewset's lookup field (``id``
+when that is the primary key).
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+from rest_framework import exceptions, serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .instrumentation import TimedDataMixin
+from .signals import bulk_written
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField that BulkListSerializer can resolve for a whole batch in one query."""
+    prefetched = None
+
+    def to_internal_value(self, data):
+        if self.prefetched is None:
+            return super().to_internal_value(data)
+        try:
+            return self.prefetched[self.get_queryset().model._meta.pk.to_python(data)]
+        except (KeyError, TypeError, DjangoValidationError):
+            self.fail('does_not_exist', pk_value=data)
+
+
+class BulkListSerializer(TimedDataMixin, serializers.ListSerializer):
+    """ListSerializer that validates each item independently.
+
+    For updates `instance` is a list of objects aligned with `data`.
+    """
+
+    def validate_items(self):
+        """Return [(index, validated_data)]; failures go to `item_errors`."""
+        self._prefetch_related_fields()
+        self.item_errors = {}
+        valid = []
+        for index, item in enumerate(self.initial_data):
+            self.child.instance = self.instance[index] if self.instance is not None else None
+            self.child.initial_data = item
+            try:
+                valid.append((index, self.child.run_validation(item)))
+            except exceptions.ValidationError as exc:
+                self.item_errors[index] = exc.detail
+        self.child.instance = None
+        return valid
+
+    def _prefetch_related_fields(self):
+        for name, field in self.child.fields.items():
+            if not isinstance(field, BulkPrimaryKeyRelatedField) or field.read_only:
+                continue
+            values = {item.get(field.source) for item in self.initial_data if isinstance(item, dict)}
+            pk_field = field.get_queryset().model._meta.pk
+            keys = set()
+            for value in values - {None}:
+                try:
+                    keys.add(pk_field.to_python(value))
+                except DjangoValidationError:
+                    pass
+            field.prefetched = field.get_queryset().in_bulk(keys)
+
+
+def _ok(index, code, data=None):
+    result = {'index': index, 'status': code}
+    if data is not None:
+        result['data'] = data
+    return result
+
+
+def _error(index, code, errors):
+    return {'index': index, 'status': code, 'errors': errors}
+
+
+class BulkModelMixin:
+    """Adds the ``bulk`` action to a ModelViewSet.
+
+    Hooks: perform_bulk_create(), perform_bulk_update() and
+    perform_bulk_destroy(); `bulk_prefetch` lists relations to prefetch
+    before the written objects are serialized.
+    """
+    bulk_prefetch = ()
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list):
+            raise exceptions.ValidationError('Expected a list of items.')
+        max_items = getattr(settings, 'API_BULK_MAX_ITEMS', 500)
+        if len(items) > max_items:
+            raise exceptions.ValidationError(f'At most {max_items} items per request.')
+
+        results = [None] * len(items)
+        handler, success = {
+            'POST': (self._bulk_create, status.HTTP_201_CREATED),
+            'PATCH': (self._bulk_update, status.HTTP_200_OK),
+            'DELETE': (self._bulk_destroy, status.HTTP_200_OK),
+        }[request.method]
+        with transaction.atomic():
+            handler(items, results)
+        failed = any(result['status'] >= 400 for result in results)
+        return Response({'results': results}, status=status.HTTP_207_MULTI_STATUS if failed else success)
+
+    # --- helpers ---
+
+    def _item_key(self):
+        return 'id' if self.lookup_field == 'pk' else self.lookup_field
+
+    def _lookup_values(self, items, results, scalars_allowed=False):
+        """{index: lookup value} for items that name an object."""
+        key = self._item_key()
+        opts = self.get_queryset().model._meta
+        model_field = opts.pk if key == 'id' else opts.get_field(key)
+        lookups = {}
+        for index, item in enumerate(items):
+            value = item if scalars_allowed and not isinstance(item, dict) else (
+                item.get(key) if isinstance(item, dict) else None
+            )
+            if value is None:
+                results[index] = _error(index, 400, {key: ['This field is required.']})
+                continue
+            try:
+                lookups[index] = model_field.to_python(value)
+            except DjangoValidationError:
+                results[index] = _error(index, 404, {'detail': 'Not found.'})
+        return lookups
+
+    def _permitted_objects(self, items, results, scalars_allowed=False):
+        """[(index, obj)] for items whose object exists and may be changed, fetched in one query."""
+        lookups = self._lookup_values(items, results, scalars_allowed)
+        field_name = 'pk' if self._item_key() == 'id' else self._item_key()
+        found = self.get_queryset().in_bulk(set(lookups.values()), field_name=field_name)
+        seen = set()
+        permitted = []
+        for index, value in lookups.items():
+            obj = found.get(value)
+            if obj is None:
+                results[index] = _error(index, 404, {'detail': 'Not found.'})
+            elif value in seen:
+                results[index] = _error(index, 400, {'detail': 'Duplicate item in this request.'})
+            else:
+                seen.add(value)
+                try:
+                    self.check_object_permissions(self.request, obj)
+                except (exceptions.PermissionDenied, exceptions.NotAuthenticated) as exc:
+                    results[index] = _error(index, 403, {'detail': str(exc.detail)})
+                    continue
+                permitted.append((index, obj))
+        return permitted
+
+    def _write(self, valid, results, write):
+        """Run `write` in a savepoint; a constraint violation fails the whole batch, not the request."""
+        try:
+            with transaction.atomic():
+                return write()
+        except IntegrityError:
+            for index, _ in valid:
+                results[index] = _error(index, 409, {'detail': 'Conflicts with existing data or another item.'})
+            return None
+
+    def _serialize(self, pairs, results, code):
+        objects = [obj for _, obj in pairs]
+        if self.bulk_prefetch:
+            prefetch_related_objects(objects, *self.bulk_prefetch)
+        data = self.get_serializer(objects, many=True).data
+        for (index, _), item_data in zip(pairs, data):
+            results[index] = _ok(index, code, item_data)
+
+    # --- actions ---
+
+    def _bulk_create(self, items, results):
+        serializer = self.get_serializer(data=items, many=True)
+        valid = serializer.validate_items()
+        for index, errors in serializer.item_errors.items():
+            results[index] = _error(index, 400, errors)
+        if not valid:
+            return
+        created = self._write(valid, results, lambda: self.perform_bulk_create([data for _, data in valid]))
+        if created is not None:
+            self._serialize(list(zip([index for index, _ in valid], created)), results, 201)
+
+    def _bulk_update(self, items, results):
+        permitted = self._permitted_objects(items, results)
+        if not permitted:
+            return
+        serializer = self.get_serializer(
+            [obj for _, obj in permitted], data=[items[index] for index, _ in permitted], many=True, partial=True
+        )
+        valid = serializer.validate_items()
+        for position, errors in serializer.item_errors.items():
+            index = permitted[position][0]
+            results[index] = _error(index, 400, errors)
+        if not valid:
+            return
+        pairs = [(permitted[position][0], permitted[position][1], data) for position, data in valid]
+        updated = self._write(
+            [(index, data) for index, _, data in pairs], results,
+            lambda: self.perform_bulk_update([(obj, data) for _, obj, data in pairs]),
+        )
+        if updated is not None:
+            self._serialize([(index, obj) for index, obj, _ in pairs], results, 200)
+
+    def _bulk_destroy(self, items, results):
+        permitted = self._permitted_objects(items, results, scalars_allowed=True)
+        if not permitted:
+            return
+        if self._write(permitted, results, lambda: self.perform_bulk_destroy([obj for _, obj in permitted]) or True):
+            for index, _ in permitted:
+                results[index] = _ok(index, 204)
+
+    # --- hooks ---
+
+    def perform_bulk_create(self, validated):
+        model = self.get_queryset().model
+        objects = model.objects.bulk_create([model(**data) for data in validated])
+        bulk_written(model, objects)
+        return objects
+
+    def perform_bulk_update(self, changes):
+        """`changes` is [(obj, validated_data)]."""
+        model = self.get_queryset().model
+        fields = set()
+        for obj, data in changes:
+            for name, value in data.items():
+                setattr(obj, name, value)
+                fields.add(name)
+        # bulk_update() skips save(), so auto_now fields must be set here
+        now = timezone.now()
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                for obj, _ in changes:
+                    setattr(obj, field.attname, now)
+                fields.add(field.name)
+        objects = [obj for obj, _ in changes]
+        if fields:
+            model.objects.bulk_update(objects, sorted(fields))
+        bulk_written(model, objects)
+        return objects
+
+    def perform_bulk_destroy(self, objects):
+        # QuerySet.delete() still sends post_delete, which keeps the caches right
+        self.get_queryset().model.objects.filter(pk__in=[obj.pk for obj in objects]).delete()
@@ -0,0 +1,441 @@
+"""Two-tier cache backend: a per-process LRU (L1) in front of a shared cache (L2).
+
+L2 is another CACHES alias: Redis in production, or a file-backed store
+shared by the processes on one host (see settings.py). Every worker then
+sees the same page cache, throttle counters and version stamps, and hot keys
+are still served from memory.
+
+Consistency across processes:
+
+* Keys starting with one of L1_EXCLUDE (counters, throttle histories, the
+  version stamps of posts/page_cache.py) never enter L1, so every process
+  reads and increments the same value in L2.
+* Entries keyed by a version stamp are never stale; a bump just makes new
+  keys. Other L1 entries live at most L1_TIMEOUT seconds.
+* delete() and delete_many() append the deleted keys to a log in L2. Each
+  process reads the new log entries at most every L1_SYNC_INTERVAL seconds
+  and drops just those keys from its L1; if it fell too far behind, or an
+  entry is missing, it drops its whole L1 instead. clear() bumps a
+  generation stamp that makes every process drop its L1.
+
+get_or_set() is single-flight: one thread per process, and one process per
+L2, recomputes a missing key while the others wait for its result.
+
+Counters rely on incr() and add() being atomic across processes. Redis
+provides that; FileBasedCache implements both as a read followed by a write,
+so with a file-based L2 they run under an exclusive flock() on a lock file
+in the cache directory. FileBasedCache also culls a random third of its
+files when full; StateFileBasedCache keeps the keys that hold the only copy
+of some state (counters, rate-limit windows, version stamps) out of that.
+
+Per-tier hit/miss counts for this process: get_cache_stats().
+"""
+import glob
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+
+from .instrumentation import record_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = 'two-tier:generation'
+DELETED_SEQ_KEY = 'two-tier:deleted'
+# A process further behind than this drops its whole L1 rather than read them all
+MAX_DELETED_READ = 1000
+LOCK_STRIPES = 64
+
+
+def _deleted_key(n):
+    return f'two-tier:deleted:{n}'
+
+
+class _Store:
+    """The L1 LRU and counters shared by all threads of the process for one alias."""
+
+    def __init__(self):
+        self.entries = OrderedDict()  # key -> (expires_at, pickled value)
+        self.lock = threading.Lock()
+        self.generation = None
+        self.deleted_seen = None  # last entry of the delete log applied to L1
+        self.checked_at = 0.0
+        self.key_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self.stats = {
+            'l1': {'hit': 0, 'miss': 0},
+            'l2': {'hit': 0, 'miss': 0},
+            'single_flight': {'computed': 0, 'waited': 0},
+        }
+        self.warned_unlocked = False
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def _get_store(name):
+    with _stores_lock:
+        if name not in _stores:
+            _stores[name] = _Store()
+        return _stores[name]
+
+
+def get_cache_stats(alias='default'):
+    """{'l1': {'hit', 'miss'}, 'l2': {...}, 'single_flight': {...}} for this process."""
+    cache = caches[alias]
+    if not isinstance(cache, TwoTierCache):
+        return {}
+    with cache._store.lock:
+        return {tier: dict(counts) for tier, counts in cache._store.stats.items()}
+
+
+@contextmanager
+def _flock(file_cache, key):
+    """Hold one of LOCK_STRIPES lock files in `file_cache`'s directory for `key`."""
+    stripe = int(hashlib.md5(key.encode()).hexdigest(), 16) % LOCK_STRIPES
+    os.makedirs(file_cache._dir, exist_ok=True)
+    fd = os.open(os.path.join(file_cache._dir, f'.lock-{stripe}'), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # releases the lock
+
+
+class StateFileBasedCache(FileBasedCache):
+    """FileBasedCache that never culls keys starting with one of KEEP_PREFIXES.
+
+    Those keys are written to a `keep/` subdirectory, which culling doesn't
+    count or sample. Expired files there are swept at most every
+    SWEEP_INTERVAL seconds once it holds MAX_ENTRIES files.
+    """
+
+    def __init__(self, dir, params):
+        options = params.get('OPTIONS', {})
+        self._keep_prefixes = tuple(options.get('KEEP_PREFIXES', ()))
+        self._keep_dir = os.path.join(os.path.abspath(dir), 'keep')
+        self._sweep_interval = float(options.get('SWEEP_INTERVAL', 60))
+        self._swept_at = 0.0
+        super().__init__(dir, params)
+
+    def _createdir(self):
+        super()._createdir()
+        os.makedirs(self._keep_dir, 0o700, exist_ok=True)
+
+    def _key_to_file(self, key, version=None):
+        fname = super()._key_to_file(key, version)
+        if key.startswith(self._keep_prefixes):
+            return os.path.join(self._keep_dir, os.path.basename(fname))
+        return fname
+
+    def _list_kept_files(self):
+        return [os.path.join(self._keep_dir, fname) for fname in glob.glob1(self._keep_dir, f'*{self.cache_suffix}')]
+
+    def _cull(self):
+        super()._cull()
+        now = time.monotonic()
+        if now - self._swept_at < self._sweep_interval:
+            return
+        self._swept_at = now
+        kept = self._list_kept_files()
+        if len(kept) < self._max_entries:
+            return
+        for fname in kept:
+            try:
+                with open(fname, 'rb') as f:
+                    self._is_expired(f)  # deletes it if so
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        super().clear()
+        for fname in self._list_kept_files():
+            self._delete(fname)
+
+
+class TwoTierCache(BaseCache):
+    _missing = object()
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = options['L2']
+        self._l1_max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        self._l1_timeout = float(options.get('L1_TIMEOUT', 5))
+        self._sync_interval = float(options.get('L1_SYNC_INTERVAL', 1))
+        self._exclude = tuple(options.get('L1_EXCLUDE', ()))
+        self._lock_timeout = float(options.get('LOCK_TIMEOUT', 30))
+        self._store = _get_store(name)
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def _atomic(self, key):
+        """Make a read-modify-write of `key` in L2 atomic across processes."""
+        l2 = self.l2
+        if not isinstance(l2, FileBasedCache):
+            return nullcontext()
+        if fcntl is None:
+            if not self._store.warned_unlocked:
+                self._store.warned_unlocked = True
+                logger.warning(
+                    "Cache %r is file-based and this platform has no flock(); counters and "
+                    "rate limits can lose increments between processes. Set REDIS_URL.", self._l2_alias,
+                )
+            return nullcontext()
+        return _flock(l2, key)
+
+    # --- L1 ---
+
+    def _l1_key(self, key, version):
+        return self.make_and_validate_key(key, version=version)
+
+    def _cacheable(self, key):
+        return not key.startswith(self._exclude)
+
+    def _sync(self):
+        """Apply the deletes and clears other processes made since the last check."""
+        store = self._store
+        now = time.monotonic()
+        if now - store.checked_at < self._sync_interval:
+            return
+        found = self.l2.get_many([GENERATION_KEY, DELETED_SEQ_KEY])
+        generation, newest = found.get(GENERATION_KEY), found.get(DELETED_SEQ_KEY, 0)
+        seen = store.deleted_seen
+        deleted, drop_all = set(), generation != store.generation
+        if seen is not None and newest != seen and not drop_all:
+            if not 0 < newest - seen <= MAX_DELETED_READ:
+                drop_all = True
+            else:
+                slots = [_deleted_key(n) for n in range(seen + 1, newest + 1)]
+                logged = self.l2.get_many(slots)
+                # A missing entry has expired or is still being written
+                drop_all = len(logged) < len(slots)
+                for keys in logged.values():
+                    deleted.update(keys)
+        with store.lock:
+            if drop_all:
+                store.entries.clear()
+            for l1_key in deleted:
+                store.entries.pop(l1_key, None)
+            store.generation, store.deleted_seen = generation, newest
+            store.checked_at = now
+
+    def _l1_get(self, key, version):
+        if not self._cacheable(key):
+            return self._missing
+        self._sync()
+        store = self._store
+        l1_key = self._l1_key(key, version)
+        with store.lock:
+            entry = store.entries.get(l1_key)
+            if entry is not None and entry[0] > time.monotonic():
+                store.entries.move_to_end(l1_key)
+                store.stats['l1']['hit'] += 1
+                pickled = entry[1]
+            else:
+                if entry is not None:
+                    del store.entries[l1_key]
+                store.stats['l1']['miss'] += 1
+                return self._missing
+        return pickle.loads(pickled)
+
+    def _l1_set(self, key, value, timeout, version):
+        if not self._cacheable(key):
+            return
+        timeout = self.get_backend_timeout(timeout)
+        ttl = self._l1_timeout if timeout is None else min(self._l1_timeout, timeout - time.time())
+        if ttl <= 0:
+            return self._l1_delete(key, version)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        store = self._store
+        l1_key = self._l1_key(key, version)
+        with store.lock:
+            store.entries[l1_key] = (time.monotonic() + ttl, pickled)
+            store.entries.move_to_end(l1_key)
+            while len(store.entries) > self._l1_max_entries:
+                store.entries.popitem(last=False)
+
+    def _l1_delete(self, key, version):
+        store = self._store
+        with store.lock:
+            store.entries.pop(self._l1_key(key, version), None)
+
+    def _count(self, tier, outcome, n=1):
+        with self._store.lock:
+            self._store.stats[tier][outcome] += n
+        if tier == 'l2' or outcome == 'hit':
+            # Per-request totals for Server-Timing (an L1 miss falls through to L2)
+            record_cache(outcome == 'hit', n)
+
+    def _log_deletes(self, keys, version):
+        """Tell the other processes to drop `keys` from their L1."""
+        l1_keys = [self._l1_key(key, version) for key in keys if self._cacheable(key)]
+        if not l1_keys:
+            return
+        with self._atomic(DELETED_SEQ_KEY):
+            try:
+                n = self.l2.incr(DELETED_SEQ_KEY)
+            except ValueError:
+                n = 1 if self.l2.add(DELETED_SEQ_KEY, 1, None) else self.l2.incr(DELETED_SEQ_KEY)
+        # Processes that haven't read it by then drop their whole L1
+        self.l2.set(_deleted_key(n), l1_keys, max(60, 10 * self._sync_interval))
+
+    def _invalidate_everywhere(self):
+        # A fresh stamp rather than an increment: clear() has just emptied L2,
+        # so a counter would restart at the value the other processes hold.
+        self.l2.set(GENERATION_KEY, os.urandom(8).hex(), None)
+
+    # --- cache API ---
+
+    def get(self, key, default=None, version=None):
+        value = self._l1_get(key, version)
+        if value is not self._missing:
+            return value
+        value = self.l2.get(key, self._missing, version=version)
+        if value is self._missing:
+            self._count('l2', 'miss')
+            return default
+        self._count('l2', 'hit')
+        # L2 doesn't say how long the value has left; L1_TIMEOUT bounds it anyway
+        self._l1_set(key, value, DEFAULT_TIMEOUT, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found, remaining = {}, []
+        for key in keys:
+            value = self._l1_get(key, version)
+            if value is self._missing:
+                remaining.append(key)
+            else:
+                found[key] = value
+        if remaining:
+            from_l2 = self.l2.get_many(remaining, version=version)
+            self._count('l2', 'hit', len(from_l2))
+            self._count('l2', 'miss', len(remaining) - len(from_l2))
+            for key, value in from_l2.items():
+                self._l1_set(key, value, DEFAULT_TIMEOUT, version)
+            found.update(from_l2)
+        return found
+
+    async def aget(self, key, default=None, version=None):
+        # L1 hits don't leave the event loop; only L2 needs a thread
+        if self._cacheable(key) and time.monotonic() - self._store.checked_at < self._sync_interval:
+            value = self._l1_get(key, version)
+            if value is not self._missing:
+                return value
+        return await super().aget(key, default, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout, version=version)
+        self._l1_set(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._l1_set(key, value, timeout, version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._atomic(key):
+            added = self.l2.add(key, value, timeout, version=version)
+        if added:
+            self._l1_set(key, value, timeout, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._l1_delete(key, version)
+        with self._atomic(key):
+            return self.l2.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._l1_delete(key, version)
+        with self._atomic(key):
+            return self.l2.decr(key, delta, version=version)
+
+    def has_key(self, key, version=None):
+        return self._l1_get(key, version) is not self._missing or self.l2.has_key(key, version=version)
+
+    def delete(self, key, version=None):
+        self._l1_delete(key, version)
+        deleted = self.l2.delete(key, version=version)
+        self._log_deletes([key], version)
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        for key in keys:
+            self._l1_delete(key, version)
+        self.l2.delete_many(keys, version=version)
+        self._log_deletes(keys, version)
+
+    def clear(self):
+        with self._store.lock:
+            self._store.entries.clear()
+        self.l2.clear()
+        self._invalidate_everywhere()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        value = self.get(key, self._missing, version=version)
+        if value is not self._missing:
+            return value
+        if not callable(default):
+            self.add(key, default, timeout, version=version)
+            return self.get(key, default, version=version)
+
+        # One thread per process...
+        with self._store.key_locks[hash(self._l1_key(key, version)) % LOCK_STRIPES]:
+            value = self.get(key, self._missing, version=version)
+            if value is not self._missing:
+                self._count('single_flight', 'waited')
+                return value
+            # ...and one process per L2 recomputes
+            lock_key = f'{key}:single-flight'
+            with self._atomic(lock_key):
+                locked = self.l2.add(lock_key, 1, self._lock_timeout, version=version)
+            if not locked:
+                value = self._wait_for(key, version)
+                if value is not self._missing:
+                    self._count('single_flight', 'waited')
+                    return value
+            try:
+                value = default()
+                self.set(key, value, timeout, version=version)
+                self._count('single_flight', 'computed')
+            finally:
+                self.l2.delete(lock_key, version=version)
+            return value
+
+    def _wait_for(self, key, version):
+        """Poll L2 for a value another process is computing, up to LOCK_TIMEOUT."""
+        deadline = time.monotonic() + self._lock_timeout
+        delay = 0.005
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            value = self.l2.get(key, self._missing, version=version)
+            if value is not self._missing:
+                self._l1_set(key, value, DEFAULT_TIMEOUT, version)
+                return value
+            delay = min(delay * 2, 0.1)
+        return self._missing
@@ -0,0 +1,76 @@
+"""ETag / Last-Modified support for the REST viewsets.
+
+Validators are derived from the version stamps in posts/page_cache.py, so a
+matching If-None-Match / If-Modified-Since is answered with 304 before the
+main query runs and without touching the serializer. Any add, edit or delete
+of a member bumps the stamps the collection depends on.
+"""
+import hashlib
+
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from .page_cache import get_last_modified, get_versions
+
+
+class ConditionalGetMixin:
+    """Add conditional GET handling to `list` and `retrieve`.
+
+    Subclasses implement get_validator_scopes() and return the version scopes
+    the current action's response depends on.
+    """
+
+    def get_validator_scopes(self):
+        raise NotImplementedError
+
+    def _validators(self, request):
+        scopes = self.get_validator_scopes()
+        versions = get_versions(*scopes)
+        raw = ':'.join([
+            request.get_full_path(),
+            request.get_host(),
+            getattr(request.accepted_renderer, 'format', ''),
+            *map(str, versions),
+        ])
+        etag = f'"{hashlib.md5(raw.encode()).hexdigest()}"'
+        return etag, get_last_modified(*scopes)
+
+    def _not_modified(self, request, etag, last_modified, lookup=None):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            # Weak comparison (RFC 9110 13.1.2): CompressionMiddleware sends W/"..."
+            etags = {tag.removeprefix('W/') for tag in parse_etags(if_none_match)}
+            if '*' in etags:
+                # "*" matches any current representation, so the object has to exist
+                if lookup is not None:
+                    lookup()
+                return True
+            return etag in etags
+        if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        return bool(last_modified and if_modified_since and last_modified <= if_modified_since)
+
+    def _conditional(self, request, render, lookup=None):
+        """render() unless the request's validators still match.
+
+        `lookup` finds the single object a retrieve is about, raising Http404
+        when there is none; `If-None-Match: *` only matches once it has.
+        """
+        etag, last_modified = self._validators(request)
+        if self._not_modified(request, etag, last_modified, lookup):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = render()
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(request, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(
+            request, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs), self.get_object,
+        )
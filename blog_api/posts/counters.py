@@ -0,0 +1,248 @@
+"""Buffered view counters for Post.click_count.
+
+Page views are collected outside the request's transaction and written back
+in periodic batched `UPDATE ... SET click_count = click_count + n` statements,
+so reads never take a row lock on hot posts and concurrent increments are not
+lost to read-modify-write races.
+
+VIEW_COUNTER_MODE selects where pending increments live:
+
+* ``memory`` - a per-process buffer flushed by a daemon thread every
+  VIEW_COUNTER_FLUSH_SECONDS (and at interpreter exit).
+* ``cache``  - the shared Django cache, so any process (for example the
+  ``flush_view_counts`` management command) can flush them.
+* ``sync``   - write through immediately; meant for tests.
+
+VIEW_COUNTER_FLUSH_SECONDS bounds how many seconds of views can be lost if a
+process dies before flushing.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+SLOT_SEQ_KEY = 'view-counts:slots'
+SLOTS_READ_KEY = 'view-counts:slots-read'
+UNWRITTEN_SLOTS_KEY = 'view-counts:unwritten-slots'
+FLUSH_LOCK_KEY = 'view-counts:flush-lock'
+
+
+def _count_key(post_id):
+    return f'view-counts:{post_id}'
+
+
+def _slot_key(slot):
+    return f'view-counts:slot:{slot}'
+
+
+def _incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return 1 if cache.add(key, 1, None) else cache.incr(key)
+
+
+def apply_increments(increments):
+    """Write {post_id: n} to the database in one transaction.
+
+    Posts with the same delta share a single UPDATE, so a flush costs one
+    statement per distinct increment rather than one per post.
+    """
+    from .models import Post
+
+    by_delta = defaultdict(list)
+    for post_id, n in increments.items():
+        if n:
+            by_delta[n].append(post_id)
+    with transaction.atomic():
+        for n, post_ids in by_delta.items():
+            Post.objects.filter(pk__in=post_ids).update(click_count=F('click_count') + n)
+    return sum(n * len(ids) for n, ids in by_delta.items())
+
+
+class MemoryViewCounter:
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def record(self, post_id):
+        with self._lock:
+            self._pending[str(post_id)] += 1
+        self._start_flusher()
+
+    def _start_flusher(self):
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='view-counter-flush', daemon=True)
+                self._flusher.start()
+                atexit.register(self.flush)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("View counter flush failed: %s", e)
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+        try:
+            return apply_increments(pending)
+        except Exception:
+            # Put the counts back so the next flush retries them.
+            with self._lock:
+                self._pending.update(pending)
+            raise
+
+
+class CacheViewCounter:
+    """Pending counts live in the shared cache under one key per post.
+
+    Count keys never expire; a flush subtracts what it wrote. Dirty post ids
+    are announced in a log of numbered slots: the view that takes a count
+    from 0 to 1 gets the next slot number from an atomic counter and writes
+    its post id there. A flush reads every slot written since the last one,
+    so no get/set of a shared set can drop an id. A slot handed out but not
+    yet written is read again by later flushes for `slot_timeout` seconds;
+    in case its writer died in between, ids are also re-announced every
+    REANNOUNCE_EVERY views.
+    """
+
+    REANNOUNCE_EVERY = 50
+
+    def __init__(self, slot_timeout):
+        self.slot_timeout = slot_timeout
+
+    def _announce(self, *post_ids):
+        for post_id in post_ids:
+            cache.set(_slot_key(_incr(SLOT_SEQ_KEY)), str(post_id), None)
+
+    def record(self, post_id):
+        n = _incr(_count_key(post_id))
+        if n == 1 or n % self.REANNOUNCE_EVERY == 0:
+            self._announce(post_id)
+
+    def flush(self):
+        # Two flushers would both write the same counts
+        if not cache.add(FLUSH_LOCK_KEY, 1, 60):
+            return 0
+        try:
+            return self._flush()
+        finally:
+            cache.delete(FLUSH_LOCK_KEY)
+
+    def _flush(self):
+        last = cache.get(SLOTS_READ_KEY, 0)
+        newest = cache.get(SLOT_SEQ_KEY, 0)
+        unwritten = cache.get(UNWRITTEN_SLOTS_KEY, {})
+        slots = [*unwritten, *range(last + 1, newest + 1)]
+        if not slots:
+            return 0
+        found = cache.get_many([_slot_key(slot) for slot in slots])
+        now = time.time()
+        unwritten = {
+            slot: unwritten.get(slot, now) for slot in slots
+            if _slot_key(slot) not in found and now - unwritten.get(slot, now) < self.slot_timeout
+        }
+
+        increments = {}
+        still_pending = []
+        for post_id in set(found.values()):
+            key = _count_key(post_id)
+            n = cache.get(key)
+            if not n:
+                continue
+            # Subtract rather than delete so views recorded meanwhile survive.
+            if cache.decr(key, n) > 0:
+                still_pending.append(post_id)
+            increments[post_id] = n
+        try:
+            flushed = apply_increments(increments)
+        except Exception:
+            # Put the counts back; the slots are read again next time.
+            for post_id, n in increments.items():
+                cache.incr(_count_key(post_id), n)
+            raise
+        cache.set_many({SLOTS_READ_KEY: newest, UNWRITTEN_SLOTS_KEY: unwritten}, None)
+        cache.delete_many(list(found))
+        if still_pending:
+            self._announce(*still_pending)
+        return flushed
+
+
+class SyncViewCounter:
+    def record(self, post_id):
+        apply_increments({post_id: 1})
+
+    def flush(self):
+        return 0
+
+
+_counter = None
+_counter_lock = threading.Lock()
+
+
+def get_view_counter():
+    global _counter
+    if _counter is None:
+        with _counter_lock:
+            if _counter is None:
+                mode = getattr(settings, 'VIEW_COUNTER_MODE', 'memory')
+                interval = getattr(settings, 'VIEW_COUNTER_FLUSH_SECONDS', 10)
+                if mode == 'sync':
+                    _counter = SyncViewCounter()
+                elif mode == 'cache':
+                    _counter = CacheViewCounter(slot_timeout=max(interval * 10, 300))
+                else:
+                    _counter = MemoryViewCounter(flush_interval=interval)
+    return _counter
+
+
+def record_view(post_id):
+    get_view_counter().record(post_id)
+
+
+async def arecord_view(post_id):
+    """record_view() for async views; only the in-memory counter runs inline."""
+    counter = get_view_counter()
+    if isinstance(counter, MemoryViewCounter):
+        counter.record(post_id)
+    else:
+        await sync_to_async(counter.record)(post_id)
+
+
+def flush_view_counts():
+    return get_view_counter().flush()
+
+
+def reset_view_counter():
+    global _counter
+    with _counter_lock:
+        _counter = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(sender, setting, **kwargs):
+    if setting.startswith('VIEW_COUNTER_'):
+        reset_view_counter()
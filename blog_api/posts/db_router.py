@@ -0,0 +1,123 @@
+"""Send read-only page and API traffic to an optional read replica.
+
+Only views that opt in with @replica_reads (or ReplicaReadsMixin on a
+viewset) read from the ``replica`` alias, and only for GET/HEAD; everything
+else, and every write, uses ``default``. Without a replica configured
+(REPLICA_DATABASE_URL) the router changes nothing.
+
+Read-your-writes: once a request writes, the rest of it reads from the
+primary, and ReplicaPinningMiddleware sets a short-lived cookie that keeps
+that browser on the primary for REPLICA_PIN_SECONDS, longer than the
+replica is expected to lag. API clients with bearer tokens ignore cookies,
+so the writer's user id is pinned in the cache for as long, and
+ReplicaReadsMixin checks it once DRF has authenticated the request.
+"""
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+REPLICA = 'replica'
+PIN_COOKIE = 'db_pin'
+
+
+class RoutingState:
+    """Per-request routing flags, set up by ReplicaPinningMiddleware."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.replica_ok = False
+        self.wrote = False
+
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+def begin_request(pinned):
+    return _state.set(RoutingState(pinned))
+
+
+def end_request(token):
+    state = _state.get()
+    _state.reset(token)
+    return state
+
+
+def _user_pin_key(user_id):
+    return f'db-pin:user:{user_id}'
+
+
+def pin_user(user_id):
+    """Keep `user_id` on the primary for REPLICA_PIN_SECONDS."""
+    if REPLICA in settings.DATABASES:
+        cache.set(_user_pin_key(user_id), 1, getattr(settings, 'REPLICA_PIN_SECONDS', 10))
+
+
+def check_user_pin(user_id):
+    """Pin the current request if `user_id` wrote in the last REPLICA_PIN_SECONDS."""
+    state = _state.get()
+    if state is not None and not state.pinned and REPLICA in settings.DATABASES:
+        state.pinned = cache.get(_user_pin_key(user_id)) is not None
+
+
+def _allow_replica(request):
+    state = _state.get()
+    if state is not None and request.method in ('GET', 'HEAD'):
+        state.replica_ok = True
+
+
+def replica_reads(view):
+    """Let a GET/HEAD of `view` read from the replica."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            _allow_replica(request)
+            return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        _allow_replica(request)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaReadsMixin:
+    """Viewset mixin: the actions in `replica_actions` read from the replica."""
+    replica_actions = ('list', 'retrieve')
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.action_map.get(request.method.lower()) in self.replica_actions:
+            _allow_replica(request)
+        return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            check_user_pin(request.user.pk)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is not None and state.replica_ok and not state.pinned and not state.wrote
+            and REPLICA in settings.DATABASES
+        ):
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both aliases
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
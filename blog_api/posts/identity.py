@@ -0,0 +1,112 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from .models import Profile
+
+User = get_user_model()
+
+IDENTITY_CACHE_TIMEOUT = 60 * 60
+
+
+def _cache_key(supabase_user_id):
+    return f"supabase-identity:{supabase_user_id}"
+
+
+def _remember(supabase_user_id, profile, email):
+    cache.set(
+        _cache_key(supabase_user_id),
+        {'user_id': profile.user_id, 'profile_id': profile.pk, 'email': email},
+        IDENTITY_CACHE_TIMEOUT,
+    )
+
+
+def forget_identity(supabase_user_id):
+    cache.delete(_cache_key(supabase_user_id))
+
+
+def _sync_email(profile, email):
+    """Write the email claim through to User/Profile, but only if it changed."""
+    if not email:
+        return
+    user = profile.user
+    if user.email != email:
+        User.objects.filter(pk=user.pk).update(email=email)
+        user.email = email
+    if profile.email != email:
+        Profile.objects.filter(pk=profile.pk).update(email=email)
+        profile.email = email
+
+
+def _create_identity(supabase_user_id, email):
+    username = email if email else supabase_user_id
+    with transaction.atomic():
+        # Accounts created before the sub mapping existed were keyed by username.
+        user = User.objects.filter(username=username).first()
+        if user is None:
+            user = User.objects.create(username=username, email=email)
+        profile = Profile.objects.filter(user=user).first()
+        if profile is None:
+            profile = Profile.objects.create(
+                user=user, auth_id=supabase_user_id, username=username, email=email
+            )
+        elif profile.auth_id != supabase_user_id:
+            Profile.objects.filter(pk=profile.pk).update(auth_id=supabase_user_id)
+            profile.auth_id = supabase_user_id
+    profile.user = user
+    return profile
+
+
+def resolve_identity(supabase_user_id, email=''):
+    """Map a Supabase `sub` to its (User, Profile), creating them on first sight.
+
+    A returning user costs one SELECT (profile joined to user) and no writes;
+    rows are only updated when the email claim differs from the one we last saw.
+    The returned user has `user.profile` pre-populated.
+    """
+    cached = cache.get(_cache_key(supabase_user_id))
+    if cached is not None:
+        try:
+            profile = Profile.objects.select_related('user').get(pk=cached['profile_id'])
+        except Profile.DoesNotExist:
+            forget_identity(supabase_user_id)
+        else:
+            if email and email != cached['email']:
+                _sync_email(profile, email)
+                _remember(supabase_user_id, profile, email)
+            return profile.user, profile
+
+    profile = Profile.objects.select_related('user').filter(auth_id=supabase_user_id).first()
+    if profile is None:
+        try:
+            profile = _create_identity(supabase_user_id, email)
+        except IntegrityError:
+            # Another request created the identity concurrently.
+            profile = Profile.objects.select_related('user').get(auth_id=supabase_user_id)
+    else:
+        _sync_email(profile, email)
+
+    _remember(supabase_user_id, profile, email)
+    user = profile.user
+    user.profile = profile
+    return user, profile
+
+
+async def aresolve_identity(supabase_user_id, email=''):
+    """resolve_identity() for async views.
+
+    A returning user whose email claim hasn't changed is read with the async
+    cache and ORM; anything that might write runs resolve_identity() in a thread.
+    """
+    cached = await cache.aget(_cache_key(supabase_user_id))
+    if cached is not None and (not email or email == cached['email']):
+        try:
+            profile = await Profile.objects.select_related('user').aget(pk=cached['profile_id'])
+        except Profile.DoesNotExist:
+            pass
+        else:
+            user = profile.user
+            user.profile = profile
+            return user, profile
+    return await sync_to_async(resolve_identity)(supabase_user_id, email)
@@ -0,0 +1,129 @@
+"""Background image pipeline for Post.image.
+
+Post.save only schedules work (after the transaction commits); a small
+thread pool then hashes the upload, skips it if the content is unchanged,
+and writes resized JPEG + WebP variants for `srcset`. The derived file names
+are stored on Post.image_variants so templates never recompute paths.
+
+IMAGE_PIPELINE_MODE is 'thread' (default) or 'sync' (run inline after
+commit, for tests and management commands).
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+
+from .page_cache import bump
+
+logger = logging.getLogger(__name__)
+
+VARIANT_DIR = "posts/images/post_list_img"
+DEFAULT_WIDTHS = (400, 800, 1200)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'IMAGE_PIPELINE_WORKERS', 2),
+                    thread_name_prefix='image-pipeline',
+                )
+    return _executor
+
+
+def hash_file(field_file):
+    digest = hashlib.sha256()
+    field_file.open('rb')
+    try:
+        for chunk in field_file.chunks():
+            digest.update(chunk)
+    finally:
+        field_file.close()
+    return digest.hexdigest()
+
+
+def render_variants(field_file, widths):
+    """Return {(fmt, width): bytes} for every target width not wider than the source."""
+    from PIL import Image
+
+    field_file.open('rb')
+    try:
+        source = Image.open(field_file)
+        source.load()
+    finally:
+        field_file.close()
+    source = source.convert("RGB")
+
+    rendered = {}
+    for width in sorted(set(min(w, source.width) for w in widths)):
+        img = source.copy()
+        # Bound the width only: srcset `Nw` descriptors promise that width
+        img.thumbnail((width, 10 ** 6))
+        for fmt, options in (('jpeg', {'quality': 70, 'optimize': True}), ('webp', {'quality': 70, 'method': 4})):
+            buf = io.BytesIO()
+            img.save(buf, fmt.upper(), **options)
+            rendered[(fmt, img.width)] = buf.getvalue()
+    return rendered
+
+
+def process_post_image(post_id):
+    from .models import Post
+
+    post = Post.objects.filter(pk=post_id).only('id', 'slug', 'image', 'image_hash', 'image_variants').first()
+    if post is None or not post.image:
+        return
+    storage = post.image.storage
+    if not storage.exists(post.image.name):
+        return
+
+    content_hash = hash_file(post.image)
+    if content_hash == post.image_hash and post.image_variants:
+        return
+
+    widths = getattr(settings, 'IMAGE_VARIANT_WIDTHS', DEFAULT_WIDTHS)
+    base, _ = os.path.splitext(os.path.basename(post.image.name))
+    variants = {'jpeg': {}, 'webp': {}}
+    for (fmt, width), data in render_variants(post.image, widths).items():
+        ext = 'jpg' if fmt == 'jpeg' else 'webp'
+        name = f"{VARIANT_DIR}/{base}_{content_hash[:8]}_{width}.{ext}"
+        if not storage.exists(name):
+            name = storage.save(name, ContentFile(data))
+        variants[fmt][str(width)] = name
+    smallest = min(variants['jpeg'], key=int)
+    variants['thumbnail'] = variants['jpeg'][smallest]
+
+    # .update() so this doesn't re-trigger save() hooks or bump updated_at
+    Post.objects.filter(pk=post_id).update(image_hash=content_hash, image_variants=variants)
+    # page:{slug} too: it is the detail view's ETag scope, and the HTML page shows the variants
+    bump('list', f'post:{post_id}', f'page:{post.slug}')
+
+
+def _run(post_id):
+    try:
+        process_post_image(post_id)
+    except Exception:
+        logger.exception("Image processing failed for post %s", post_id)
+    finally:
+        if getattr(settings, 'IMAGE_PIPELINE_MODE', 'thread') != 'sync':
+            close_old_connections()
+
+
+def enqueue_post_image(post_id):
+    """Process the post's image once the current transaction commits."""
+    def submit():
+        if getattr(settings, 'IMAGE_PIPELINE_MODE', 'thread') == 'sync':
+            _run(post_id)
+        else:
+            _get_executor().submit(_run, post_id)
+    transaction.on_commit(submit)
@@ -0,0 +1,316 @@
+"""Per-request performance instrumentation.
+
+InstrumentationMiddleware collects, for each request:
+
+* ``db``    - SQL query count and time, on every connection (a permanent
+  execute wrapper installed when a connection opens)
+* ``cache`` - hits and misses of the two-tier cache (posts/cache.py)
+* ``http``  - outbound HTTP: the JWKS fetch and LLM calls
+* ``tpl``   - template rendering (InstrumentedDjangoTemplates)
+* ``ser``   - DRF serializer ``.data`` (TimedDataMixin)
+
+and reports them three ways: a ``Server-Timing`` header (SERVER_TIMING), a
+JSON log line on the ``posts.slow_requests`` logger for requests over
+SLOW_REQUEST_MS or SLOW_REQUEST_QUERIES, and the Prometheus text endpoint
+at /metrics (metrics_view), with a latency histogram per view name.
+
+Histograms are kept per process, like prometheus_client without its
+multiprocess mode; the page cache and LLM counters are shared. Outside a
+request every hook is a single ContextVar lookup.
+"""
+import hmac
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.template.backends.django import DjangoTemplates
+
+slow_logger = logging.getLogger('posts.slow_requests')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestMetrics:
+    __slots__ = ('started', 'db_count', 'db_time', 'cache_hits', 'cache_misses', 'timings', '_open')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_count = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.timings = {'http': 0.0, 'tpl': 0.0, 'ser': 0.0}
+        self._open = set()
+
+
+_current = ContextVar('request_metrics', default=None)
+
+
+def current_metrics():
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    """Add the time spent in the block to the current request's `name` timing.
+
+    Nested spans of the same name (a serializer inside a serializer) count once.
+    """
+    metrics = _current.get()
+    if metrics is None or name in metrics._open:
+        yield
+        return
+    metrics._open.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timings[name] += time.perf_counter() - started
+        metrics._open.discard(name)
+
+
+def record_cache(hit, n=1):
+    metrics = _current.get()
+    if metrics is not None:
+        if hit:
+            metrics.cache_hits += n
+        else:
+            metrics.cache_misses += n
+
+
+def _time_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_count += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def _instrument_connection(sender, connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        # First, so connection.execute_wrapper() blocks still pop their own
+        connection.execute_wrappers.insert(0, _time_query)
+
+
+def _instrument_open_connections():
+    # Connections opened before this module was imported
+    for connection in connections.all(initialized_only=True):
+        _instrument_connection(None, connection)
+
+
+# --- templates and serializers ---
+
+class _TimedTemplate:
+    def __init__(self, template):
+        self._wrapped = template
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def render(self, context=None, request=None):
+        with span('tpl'):
+            return self._wrapped.render(context, request)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates backend that times each top-level render."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+class TimedDataMixin:
+    """Serializer mixin: time building `.data`."""
+
+    @property
+    def data(self):
+        with span('ser'):
+            return super().data
+
+
+# --- metrics registry ---
+
+class _Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}  # (view, method) -> [bucket counts..., +Inf count, sum]
+        self.counters = {}  # (name, view) -> value
+
+    def observe(self, view, method, metrics, duration):
+        with self.lock:
+            histogram = self.histograms.get((view, method))
+            if histogram is None:
+                histogram = self.histograms[(view, method)] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    histogram[i] += 1
+            histogram[len(LATENCY_BUCKETS)] += 1
+            histogram[-1] += duration
+            for name, value in (
+                ('db_queries', metrics.db_count), ('db_seconds', metrics.db_time),
+                ('http_seconds', metrics.timings['http']),
+                ('cache_hits', metrics.cache_hits), ('cache_misses', metrics.cache_misses),
+            ):
+                self.counters[(name, view)] = self.counters.get((name, view), 0) + value
+
+    def snapshot(self):
+        with self.lock:
+            return {k: list(v) for k, v in self.histograms.items()}, dict(self.counters)
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+registry = _Registry()
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unmatched>'
+    return match.view_name or match._func_path
+
+
+# --- middleware ---
+
+def server_timing(metrics, total):
+    ms = lambda seconds: f'{seconds * 1000:.1f}'  # noqa: E731
+    parts = [
+        f'db;dur={ms(metrics.db_time)};desc="{metrics.db_count} queries"',
+        f'cache;desc="{metrics.cache_hits} hits {metrics.cache_misses} misses"',
+    ]
+    parts += [f'{name};dur={ms(seconds)}' for name, seconds in metrics.timings.items() if seconds]
+    parts.append(f'app;dur={ms(total)}')
+    return ', '.join(parts)
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        _instrument_open_connections()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        total = time.perf_counter() - metrics.started
+        view = _view_name(request)
+        registry.observe(view, request.method, metrics, total)
+        if getattr(settings, 'SERVER_TIMING', True):
+            response['Server-Timing'] = server_timing(metrics, total)
+        if (
+            total * 1000 >= getattr(settings, 'SLOW_REQUEST_MS', 500)
+            or metrics.db_count >= getattr(settings, 'SLOW_REQUEST_QUERIES', 50)
+        ):
+            slow_logger.warning(json.dumps({
+                'event': 'slow_request',
+                'method': request.method,
+                'path': request.path,
+                'view': view,
+                'status': response.status_code,
+                'duration_ms': round(total * 1000, 1),
+                'db_queries': metrics.db_count,
+                'db_ms': round(metrics.db_time * 1000, 1),
+                'cache_hits': metrics.cache_hits,
+                'cache_misses': metrics.cache_misses,
+                **{f'{name}_ms': round(seconds * 1000, 1) for name, seconds in metrics.timings.items()},
+            }))
+        return response
+
+
+# --- /metrics ---
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}'
+
+
+def render_metrics():
+    from .cache import get_cache_stats
+    from .llm_cache import get_llm_stats
+    from .page_cache import get_stats
+
+    histograms, counters = registry.snapshot()
+    lines = [
+        '# HELP blog_request_duration_seconds Request latency by view.',
+        '# TYPE blog_request_duration_seconds histogram',
+    ]
+    for (view, method), values in sorted(histograms.items()):
+        for bound, count in zip((*LATENCY_BUCKETS, '+Inf'), values):
+            lines.append(f'blog_request_duration_seconds_bucket{_labels(view=view, method=method, le=bound)} {count}')
+        lines.append(f'blog_request_duration_seconds_count{_labels(view=view, method=method)} {values[-2]}')
+        lines.append(f'blog_request_duration_seconds_sum{_labels(view=view, method=method)} {values[-1]:.6f}')
+    for name in ('db_queries', 'db_seconds', 'http_seconds', 'cache_hits', 'cache_misses'):
+        lines.append(f'# TYPE blog_request_{name}_total counter')
+        for (counter, view), value in sorted(counters.items()):
+            if counter == name:
+                lines.append(f'blog_request_{name}_total{_labels(view=view)} {value}')
+
+    lines.append('# TYPE blog_cache_lookups_total counter')
+    for tier, outcomes in get_cache_stats().items():
+        for outcome, value in outcomes.items():
+            lines.append(f'blog_cache_lookups_total{_labels(tier=tier, outcome=outcome)} {value}')
+    lines.append('# TYPE blog_page_cache_total counter')
+    for kind, outcomes in get_stats().items():
+        for outcome, value in outcomes.items():
+            lines.append(f'blog_page_cache_total{_labels(kind=kind, outcome=outcome)} {value}')
+    lines.append('# TYPE blog_llm_total counter')
+    for name, value in get_llm_stats().items():
+        if name not in ('hit_rate', 'avg_latency_ms'):
+            lines.append(f'blog_llm_total{_labels(stat=name)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Prometheus text format, for `Authorization: Bearer <METRICS_TOKEN>`.
+
+    Without METRICS_TOKEN it is only served when DEBUG is on.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        allowed = hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        allowed = settings.DEBUG
+    if not allowed:
+        return HttpResponse(status=403)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,195 @@
+"""Background queue for AI post generation.
+
+Submitting a prompt creates a GenerationJob row and returns immediately; the
+LLM call, parsing and Post creation happen off the request. AI_JOB_MODE
+decides who runs queued jobs:
+
+* ``thread`` - a per-process pool of AI_JOB_CONCURRENCY threads (default)
+* ``worker`` - only the ``run_ai_jobs`` management command
+* ``sync``   - inline right after commit (tests)
+
+Jobs are claimed with a conditional UPDATE, so a job never runs twice even
+when several processes poll the same table. Submissions beyond
+AI_JOB_MAX_QUEUE unfinished jobs are rejected with QueueFull.
+
+A job that raises is marked failed. One whose worker died (a deploy, an OOM
+kill) stays running until recover_jobs() finds it untouched for
+AI_JOB_STALE_AFTER seconds and requeues it, or fails it when it has no
+attempts left.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .ai import create_generated_post
+from .llm_cache import cached_completion
+from .models import GenerationJob
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_last_recovery = None
+_recovery_lock = threading.Lock()
+
+
+class QueueFull(Exception):
+    """Too many unfinished generation jobs; the caller should retry later."""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_setting('AI_JOB_CONCURRENCY', 2),
+                    thread_name_prefix='ai-jobs',
+                )
+    return _executor
+
+
+def pending_jobs():
+    return GenerationJob.objects.filter(status__in=("queued", "running"))
+
+
+def submit_generation(user, prompt, post_status="draft"):
+    if _setting('AI_JOB_MODE', 'thread') == 'thread':
+        recover_jobs()
+    if pending_jobs().count() >= _setting('AI_JOB_MAX_QUEUE', 20):
+        raise QueueFull("The AI generator is busy, please try again shortly.")
+    job = GenerationJob.objects.create(user=user, prompt=prompt, post_status=post_status)
+    transaction.on_commit(lambda: dispatch(job.pk))
+    return job
+
+
+def dispatch(job_id):
+    mode = _setting('AI_JOB_MODE', 'thread')
+    if mode == 'sync':
+        run_job(job_id)
+    elif mode == 'thread':
+        get_executor().submit(run_in_thread, job_id)
+    # 'worker': left queued for the run_ai_jobs command
+
+
+def run_in_thread(job_id):
+    """run_job() for pool threads: log instead of raising, and release the connection."""
+    try:
+        run_job(job_id)
+    except Exception:
+        logger.exception("AI generation job %s crashed", job_id)
+    finally:
+        close_old_connections()
+
+
+def _backoff(attempt):
+    base = _setting('AI_JOB_RETRY_BACKOFF', 1.0)
+    return min(base * 2 ** (attempt - 1), 30) + random.uniform(0, base)
+
+
+def claim(job_id):
+    # update() skips auto_now; the reaper needs updated_at to see the job is alive
+    return GenerationJob.objects.filter(pk=job_id, status="queued").update(
+        status="running", updated_at=timezone.now(),
+    ) == 1
+
+
+def _fail(job_id, error):
+    GenerationJob.objects.filter(pk=job_id, status="running").update(
+        status="failed", error=error, updated_at=timezone.now(),
+    )
+
+
+def run_job(job_id):
+    """Run one queued job to completion. Returns False if another worker owns it.
+
+    Whatever goes wrong after the claim (a slug clash, a database error) ends
+    with the job marked failed, never left running.
+    """
+    if not claim(job_id):
+        return False
+    try:
+        _generate(job_id)
+    except Exception as e:
+        logger.exception("AI generation job %s crashed", job_id)
+        _fail(job_id, str(e) or e.__class__.__name__)
+    return True
+
+
+def _generate(job_id):
+    job = GenerationJob.objects.select_related('user').get(pk=job_id)
+    max_attempts = _setting('AI_JOB_MAX_ATTEMPTS', 3)
+    if job.attempts >= max_attempts:
+        raise RuntimeError("No attempts left")
+
+    # A requeued job keeps the attempts its lost worker already made
+    for attempt in range(job.attempts + 1, max_attempts + 1):
+        job.attempts = attempt
+        job.save(update_fields=['attempts', 'updated_at'])
+        try:
+            ai_output = cached_completion(job.prompt, timeout=_setting('AI_JOB_TIMEOUT', 60))
+            break
+        except Exception as e:
+            logger.warning("AI generation job %s attempt %s failed: %s", job_id, attempt, e)
+            if attempt == max_attempts:
+                job.status = "failed"
+                job.error = str(e)
+                job.save(update_fields=['status', 'error', 'updated_at'])
+                return
+            time.sleep(_backoff(attempt))
+
+    job.post = create_generated_post(job.user, job.prompt, ai_output, job.post_status)
+    job.status = "succeeded"
+    job.save(update_fields=['post', 'status', 'updated_at'])
+
+
+def reap_stale_jobs():
+    """Requeue running jobs nobody has touched for AI_JOB_STALE_AFTER seconds.
+
+    A live worker saves the job at every attempt, so a quiet one has lost its
+    worker. Jobs that used up AI_JOB_MAX_ATTEMPTS are failed instead.
+    Returns (requeued, failed).
+    """
+    now = timezone.now()
+    stale = GenerationJob.objects.filter(
+        status="running", updated_at__lt=now - timedelta(seconds=_setting('AI_JOB_STALE_AFTER', 600)),
+    )
+    max_attempts = _setting('AI_JOB_MAX_ATTEMPTS', 3)
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status="failed", error="The worker stopped before the job finished.", updated_at=now,
+    )
+    requeued = stale.filter(attempts__lt=max_attempts).update(status="queued", updated_at=now)
+    if requeued or failed:
+        logger.warning("Reaped stale AI generation jobs: %s requeued, %s failed", requeued, failed)
+    return requeued, failed
+
+
+def recover_jobs():
+    """Reap stale jobs, then dispatch every queued job to this process's pool.
+
+    In thread mode a queued job only lives in an on_commit callback of the
+    process that submitted it, so a restart would strand it. Runs on the first
+    submission in each process and then at most every AI_JOB_RECOVER_INTERVAL
+    seconds; claims are atomic, so dispatching a job another process already
+    holds is harmless.
+    """
+    global _last_recovery
+    with _recovery_lock:
+        now = time.monotonic()
+        if _last_recovery is not None and now - _last_recovery < _setting('AI_JOB_RECOVER_INTERVAL', 60):
+            return
+        _last_recovery = now
+    reap_stale_jobs()
+    for job_id in GenerationJob.objects.filter(status="queued").order_by('created_at').values_list('pk', flat=True):
+        get_executor().submit(run_in_thread, job_id)
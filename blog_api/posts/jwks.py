@@ -0,0 +1,202 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .instrumentation import span
+
+logger = logging.getLogger(__name__)
+
+
+def jwks_source():
+    """Where to load signing keys from: an explicit URL/file, or the Supabase default."""
+    source = getattr(settings, 'SUPABASE_JWKS_URL', None)
+    if source:
+        return source
+    return f"{settings.SUPABASE_URL}/auth/v1/.well-known/jwks.json"
+
+
+class JWKSCache:
+    """Process-wide cache of the JWKS signing keys, indexed by `kid`.
+
+    Keys are fetched once, refreshed by a daemon thread every `refresh_interval`
+    seconds, and re-fetched inline only when a token carries an unknown `kid`.
+    `source` may be an http(s) URL, a `file://` URL or a plain path to a JWKS
+    JSON file, which keeps tests offline.
+    """
+
+    def __init__(self, source, refresh_interval=600, min_refetch_interval=30, timeout=5):
+        self.source = source
+        self.refresh_interval = refresh_interval
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+        self._keys = {}
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        # Held while fetching, so concurrent misses wait for one fetch
+        self._fetch_lock = threading.Lock()
+        self._refresher = None
+
+    def _load(self):
+        if self.source.startswith(('http://', 'https://')):
+            with span('http'):
+                response = requests.get(self.source, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+        else:
+            path = self.source[len('file://'):] if self.source.startswith('file://') else self.source
+            with open(path) as fh:
+                data = json.load(fh)
+        keys = {}
+        for jwk in jwt.PyJWKSet.from_dict(data).keys:
+            keys[jwk.key_id] = jwk
+        return keys
+
+    def refresh(self):
+        with self._fetch_lock:
+            return self._refresh()
+
+    def _refresh(self):
+        keys = self._load()
+        with self._lock:
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+        return keys
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the last good key set; the next tick will retry.
+                logger.warning("JWKS background refresh failed: %s", e)
+
+    def start_background_refresh(self):
+        if not self.refresh_interval or self._refresher is not None:
+            return
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._refresh_loop, name='jwks-refresh', daemon=True)
+                self._refresher.start()
+
+    def get_signing_key(self, kid):
+        key = self._keys.get(kid)
+        if key is not None:
+            return key
+        # Unknown kid: the keys may have rotated. Re-fetch, but not more often
+        # than min_refetch_interval so a flood of bad tokens can't hammer the host.
+        with self._fetch_lock:
+            # Requests that waited here find the keys the first one fetched
+            key = self._keys.get(kid)
+            if key is None and (not self._keys or time.monotonic() - self._fetched_at >= self.min_refetch_interval):
+                self._refresh()
+                key = self._keys.get(kid)
+        if self._keys:
+            self.start_background_refresh()
+        if key is None:
+            raise jwt.InvalidTokenError(f'Unable to find a signing key that matches: "{kid}"')
+        return key
+
+    def get_signing_key_from_jwt(self, token):
+        header = jwt.get_unverified_header(token)
+        return self.get_signing_key(header.get('kid'))
+
+
+class VerifiedTokenCache:
+    """TTL-bounded LRU of already-verified token payloads, keyed by token hash.
+
+    An entry lives until the token's own `exp` or `ttl` seconds, whichever
+    comes first, so a cached token never outlives its signature.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def set(self, token, payload):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if payload.get('exp'):
+            expires_at = min(expires_at, payload['exp'])
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_jwks_cache = None
+_token_cache = None
+_init_lock = threading.Lock()
+
+
+def get_jwks_cache():
+    global _jwks_cache
+    if _jwks_cache is None:
+        with _init_lock:
+            if _jwks_cache is None:
+                _jwks_cache = JWKSCache(
+                    jwks_source(),
+                    refresh_interval=getattr(settings, 'SUPABASE_JWKS_REFRESH_SECONDS', 600),
+                )
+    return _jwks_cache
+
+
+def get_token_cache():
+    global _token_cache
+    if _token_cache is None:
+        with _init_lock:
+            if _token_cache is None:
+                _token_cache = VerifiedTokenCache(
+                    maxsize=getattr(settings, 'SUPABASE_TOKEN_CACHE_SIZE', 1024),
+                    ttl=getattr(settings, 'SUPABASE_TOKEN_CACHE_TTL', 300),
+                )
+    return _token_cache
+
+
+def reset_caches():
+    """Drop the process-wide caches (used by tests and after settings changes)."""
+    global _jwks_cache, _token_cache
+    with _init_lock:
+        _jwks_cache = None
+        _token_cache = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(sender, setting, **kwargs):
+    if setting.startswith('SUPABASE_'):
+        reset_caches()
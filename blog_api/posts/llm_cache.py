@@ -0,0 +1,221 @@
+"""Prompt cache, in-flight deduplication and metrics for LLM calls.
+
+Every generation goes through cached_completion() (job queue) or
+astream_completion() (SSE endpoint):
+
+* Results are kept in a process-wide TTL-bounded LRU keyed on the
+  normalised prompt, the model and a hash of the prompt template, so
+  editing the template or switching model never serves stale output.
+* Identical prompts that arrive while a call is already running wait for
+  that call instead of starting another paid one (a double-clicked submit
+  becomes one upstream request). Streams use the cache but don't coalesce.
+* Each upstream call records latency and token usage, and every lookup
+  records hit/miss, in shared cache counters; see get_llm_stats().
+
+AI_PROMPT_CACHE_TTL = 0 turns result caching off; coalescing stays on.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .ai import Completion, build_messages, get_llm_backend, get_model
+from .instrumentation import span
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY = 'llm:stats:{name}'
+STAT_NAMES = (
+    'hits', 'misses', 'coalesced', 'calls', 'errors',
+    'latency_ms', 'prompt_tokens', 'completion_tokens', 'total_tokens',
+)
+STREAM_CHUNK = 64
+
+
+def normalize_prompt(prompt):
+    return ' '.join(prompt.split()).casefold()
+
+
+def template_fingerprint():
+    return hashlib.sha256(json.dumps(build_messages('{prompt}')).encode()).hexdigest()[:16]
+
+
+def prompt_key(prompt):
+    raw = '\0'.join([get_model(), template_fingerprint(), normalize_prompt(prompt)])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class PromptCache:
+    """TTL-bounded LRU of generated text, keyed by prompt_key()."""
+
+    def __init__(self, maxsize=256, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, text = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return text
+
+    def set(self, key, text):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_prompt_cache = None
+_init_lock = threading.Lock()
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def get_prompt_cache():
+    global _prompt_cache
+    if _prompt_cache is None:
+        with _init_lock:
+            if _prompt_cache is None:
+                _prompt_cache = PromptCache(
+                    maxsize=getattr(settings, 'AI_PROMPT_CACHE_SIZE', 256),
+                    ttl=getattr(settings, 'AI_PROMPT_CACHE_TTL', 3600),
+                )
+    return _prompt_cache
+
+
+def reset_prompt_cache():
+    global _prompt_cache
+    with _init_lock:
+        _prompt_cache = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(sender, setting, **kwargs):
+    if setting.startswith('AI_'):
+        reset_prompt_cache()
+
+
+def _incr(name, amount=1):
+    key = STATS_KEY.format(name=name)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        if not cache.add(key, amount, None):
+            cache.incr(key, amount)
+
+
+def record_call(started, usage, error=False):
+    latency_ms = int((time.monotonic() - started) * 1000)
+    _incr('calls')
+    _incr('latency_ms', latency_ms)
+    if error:
+        _incr('errors')
+    for name in ('prompt_tokens', 'completion_tokens', 'total_tokens'):
+        if usage.get(name):
+            _incr(name, usage[name])
+    logger.info("LLM call: %sms, %s tokens%s", latency_ms, usage.get('total_tokens', '?'), " (failed)" if error else "")
+
+
+def get_llm_stats():
+    """Counters across all worker processes, plus derived hit rate and average latency."""
+    found = cache.get_many([STATS_KEY.format(name=name) for name in STAT_NAMES])
+    stats = {name: found.get(STATS_KEY.format(name=name), 0) for name in STAT_NAMES}
+    lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+    stats['hit_rate'] = round((stats['hits'] + stats['coalesced']) / lookups, 3) if lookups else 0.0
+    stats['avg_latency_ms'] = round(stats['latency_ms'] / stats['calls']) if stats['calls'] else 0
+    return stats
+
+
+def _call_backend(prompt, timeout):
+    started = time.monotonic()
+    try:
+        with span('http'):
+            result = get_llm_backend().complete(build_messages(prompt), timeout=timeout)
+    except Exception:
+        record_call(started, {}, error=True)
+        raise
+    if not isinstance(result, Completion):
+        result = Completion(result, {})
+    record_call(started, result.usage)
+    return result.text
+
+
+def cached_completion(prompt, timeout=None):
+    """Generated text for `prompt`, from the cache, a running call, or the LLM."""
+    key = prompt_key(prompt)
+    text = get_prompt_cache().get(key)
+    if text is not None:
+        _incr('hits')
+        return text
+
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    if not leader:
+        _incr('coalesced')
+        return future.result(timeout=timeout)
+
+    _incr('misses')
+    try:
+        text = _call_backend(prompt, timeout)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        get_prompt_cache().set(key, text)
+        future.set_result(text)
+        return text
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+async def astream_completion(prompt, timeout=None):
+    """Yield generated text as it arrives; cached prompts replay instantly."""
+    key = prompt_key(prompt)
+    text = get_prompt_cache().get(key)
+    if text is not None:
+        await sync_to_async(_incr)('hits')
+        for i in range(0, len(text), STREAM_CHUNK):
+            yield text[i:i + STREAM_CHUNK]
+        return
+
+    await sync_to_async(_incr)('misses')
+    backend = get_llm_backend()
+    started = time.monotonic()
+    chunks = []
+    try:
+        async for chunk in backend.astream(build_messages(prompt), timeout=timeout):
+            chunks.append(chunk)
+            yield chunk
+    except Exception:
+        await sync_to_async(record_call)(started, {}, True)
+        raise
+    await sync_to_async(record_call)(started, backend.usage or {})
+    get_prompt_cache().set(key, ''.join(chunks))
@@ -0,0 +1,462 @@
+"""Load-test harness: a seeded dataset, a concurrent HTTP driver and baselines.
+
+* seed_dataset() bulk-loads users (with the Profile rows Supabase logins map
+  to), tags, posts, PostTag rows and comments. Output is reproducible for a
+  given seed: the same ids, slugs and texts, with dates spread over the
+  three years before seeding. It sends no signals and skips the search
+  index unless asked for it. Load it into its own database (DATABASE_URL);
+  the seeded users are recognised by USER_PREFIX.
+* run_load() serves the project on a local threaded HTTP server and drives it
+  from `concurrency` client threads for `duration` seconds. Requests follow
+  one of the MIXES of ENDPOINTS and pick posts with a skew, so some posts
+  are hot. Supabase JWTs are signed with a throwaway key
+  (StubSupabase) and the LLM backend is StubLLMBackend, so nothing leaves
+  the machine. It returns throughput and p50/p95/p99 latency per endpoint.
+* compare() checks a run against a saved baseline (loadtest_baseline.json)
+  and lists the regressions.
+
+Like runserver, the local server opens a database connection for every
+request. Compare runs with each other, not with production numbers.
+
+Entry points: manage.py seed_loadtest and manage.py loadtest.
+"""
+import json
+import os
+import platform
+import random
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+from http.client import HTTPConnection
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import page_cache, search
+from .models import Comment, Post, PostTag, Profile, Tag
+
+USER_PREFIX = 'loadtest-'
+
+WORDS = (
+    "api async backend benchmark browser build cache cloud code commit compiler "
+    "container data database debug deploy design django docker edge engine error "
+    "event feature framework function garden graph index interface javascript kernel "
+    "latency library linux memory migration model network object orm performance "
+    "pipeline platform postgres process profile python query queue react redis "
+    "release request response review runtime schema search security server service "
+    "session shell signal socket stack storage stream string system template test "
+    "thread token trace travel type update user version view worker workflow"
+).split()
+TOPICS = (
+    "Python", "Django", "Databases", "DevOps", "Frontend", "Security", "Career",
+    "Testing", "Performance", "Design", "AI", "Cloud", "Open Source", "Tutorials",
+)
+
+
+def _words(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+def _sentence(rng):
+    return _words(rng, rng.randint(8, 20)).capitalize() + '.'
+
+
+def _paragraphs(rng, count):
+    return '\n\n'.join(' '.join(_sentence(rng) for _ in range(rng.randint(3, 7))) for _ in range(count))
+
+
+def _skewed(rng, n, power=3):
+    """An index in range(n), low ones much more likely: a few posts are hot."""
+    return min(n - 1, int(n * rng.random() ** power))
+
+
+def _uuid(rng):
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+@contextmanager
+def _explicit_timestamps(*fields):
+    """Let bulk_create() keep the dates we generate instead of now()."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def seed_dataset(posts, comments, users, tags, seed=0, batch_size=5000, index_search=False, log=None):
+    """Bulk-load a reproducible dataset; refuses if one was loaded already."""
+    log = log or (lambda message: None)
+    if User.objects.filter(username__startswith=USER_PREFIX).exists():
+        raise ValueError("This database already has a load-test dataset; seed an empty database.")
+    rng = random.Random(seed)
+    now = timezone.now()
+    password = make_password(None)
+
+    with transaction.atomic():
+        user_objs = User.objects.bulk_create(
+            [
+                User(username=f'{USER_PREFIX}{i}', email=f'{USER_PREFIX}{i}@example.com', password=password)
+                for i in range(users)
+            ],
+            batch_size=batch_size,
+        )
+        Profile.objects.bulk_create(
+            [
+                Profile(user=user, auth_id=user.username, username=user.username, email=user.email)
+                for user in user_objs
+            ],
+            batch_size=batch_size,
+        )
+        tag_objs = Tag.objects.bulk_create(
+            [Tag(name=f'{TOPICS[i % len(TOPICS)]} {i}', slug=slugify(f'{TOPICS[i % len(TOPICS)]} {i}'))
+             for i in range(tags)],
+            batch_size=batch_size,
+        )
+    user_ids = [user.pk for user in user_objs]
+    tag_ids = [tag.pk for tag in tag_objs]
+    log(f"{users} users, {tags} tags")
+
+    post_dates = []
+    published_at = Post._meta.get_field('published_at')
+    created_at = Post._meta.get_field('created_at')
+    updated_at = Post._meta.get_field('updated_at')
+    comment_created_at = Comment._meta.get_field('created_at')
+    with _explicit_timestamps(published_at, created_at, updated_at, comment_created_at):
+        for start in range(0, posts, batch_size):
+            batch, post_tags = [], []
+            for i in range(start, min(posts, start + batch_size)):
+                title = _words(rng, rng.randint(4, 9)).capitalize()
+                date = now - timedelta(seconds=rng.randint(0, 3 * 365 * 24 * 3600))
+                content = _paragraphs(rng, rng.randint(3, 8))
+                post = Post(
+                    id=_uuid(rng), author_id=user_ids[_skewed(rng, users, 2)], title=title,
+                    slug=f"{slugify(title)[:40].rstrip('-')}-{i}", content=content, excerpt=content[:200],
+                    status='published' if rng.random() < 0.9 else 'draft',
+                    published_at=date, created_at=date, updated_at=date,
+                )
+                batch.append(post)
+                post_dates.append((post.pk, date))
+                picked = {tag_ids[_skewed(rng, tags, 2)] for _ in range(rng.randint(0, 5))} if tags else ()
+                post_tags.extend(PostTag(post_id=post.pk, tag_id=tag_id) for tag_id in picked)
+            with transaction.atomic():
+                Post.objects.bulk_create(batch)
+                PostTag.objects.bulk_create(post_tags)
+            log(f"posts: {start + len(batch)}/{posts}")
+
+        # Comments cluster on the hot posts, as they do in practice
+        shuffled = post_dates[:]
+        rng.shuffle(shuffled)
+        for start in range(0, comments, batch_size):
+            batch = []
+            for _ in range(start, min(comments, start + batch_size)):
+                post_id, date = shuffled[_skewed(rng, len(shuffled))]
+                batch.append(Comment(
+                    id=_uuid(rng), post_id=post_id,
+                    author_id=user_ids[_skewed(rng, users, 2)] if rng.random() < 0.95 else None,
+                    content=' '.join(_sentence(rng) for _ in range(rng.randint(1, 4))),
+                    created_at=date + timedelta(seconds=rng.randint(60, 30 * 24 * 3600)),
+                    approved=rng.random() < 0.95,
+                ))
+            with transaction.atomic():
+                Comment.objects.bulk_create(batch)
+            log(f"comments: {start + len(batch)}/{comments}")
+
+    if index_search:
+        ids = [post_id for post_id, _ in post_dates]
+        for start in range(0, len(ids), 1000):
+            search.index_posts(ids[start:start + 1000])
+        log("search index built")
+    # bulk_create() sends no signals: cached list pages would not show the new posts
+    page_cache.bump('list', 'tags')
+    return dataset_summary()
+
+
+def dataset_summary():
+    return {
+        'users': User.objects.filter(username__startswith=USER_PREFIX).count(),
+        'posts': Post.objects.count(),
+        'published': Post.objects.filter(status='published').count(),
+        'comments': Comment.objects.count(),
+        'tags': Tag.objects.count(),
+        'post_tags': PostTag.objects.count(),
+    }
+
+
+# --- stubs ---
+
+class StubSupabase:
+    """Signs Supabase-style JWTs for the seeded users with a throwaway key.
+
+    The public half is written as a JWKS file in `directory`, for
+    SUPABASE_JWKS_URL.
+    """
+    kid = 'loadtest'
+
+    def __init__(self, directory):
+        self._private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(self._private_key.public_key()))
+        jwk.update({'kid': self.kid, 'use': 'sig', 'alg': 'RS256'})
+        self.jwks_path = os.path.join(directory, 'jwks.json')
+        with open(self.jwks_path, 'w') as fh:
+            json.dump({'keys': [jwk]}, fh)
+
+    def token(self, i, lifetime=3600):
+        claims = {
+            'sub': f'{USER_PREFIX}{i}', 'email': f'{USER_PREFIX}{i}@example.com',
+            'exp': int(time.time()) + lifetime,
+        }
+        return jwt.encode(claims, self._private_key, algorithm='RS256', headers={'kid': self.kid})
+
+
+# --- driver ---
+
+ENDPOINTS = {
+    'post_list': lambda target, rng: ('/', {}),
+    'post_detail': lambda target, rng: (f'/posts/{target.slug(rng)}/', {}),
+    'post_comments': lambda target, rng: (f'/posts/{target.slug(rng)}/comments/', {}),
+    'api_posts': lambda target, rng: ('/api/posts/', {}),
+    'api_post_detail': lambda target, rng: (f'/api/posts/{target.slug(rng)}/', {}),
+    'api_comments': lambda target, rng: (f'/api/posts/{target.slug(rng)}/comments/', {}),
+    'api_me': lambda target, rng: ('/api/me/', {'Authorization': f'Bearer {target.token(rng)}'}),
+}
+# Relative request weights
+MIXES = {
+    'browse': {'post_list': 4, 'post_detail': 5, 'post_comments': 1},
+    'api': {'api_posts': 3, 'api_post_detail': 3, 'api_comments': 2, 'api_me': 2},
+}
+MIXES['mixed'] = {**MIXES['browse'], **MIXES['api']}
+
+
+class Target:
+    """What the endpoints need: published slugs and bearer tokens."""
+
+    def __init__(self, slugs, tokens):
+        self.slugs = slugs
+        self.tokens = tokens
+
+    def slug(self, rng):
+        return self.slugs[_skewed(rng, len(self.slugs))]
+
+    def token(self, rng):
+        return rng.choice(self.tokens)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class _QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class _LoadTestServer(ThreadedWSGIServer):
+    # runserver's backlog of 10 drops connections under a few dozen clients
+    request_queue_size = 256
+
+
+@contextmanager
+def local_server():
+    """Serve the project on 127.0.0.1:<free port> in a thread; yields the port."""
+    server = _LoadTestServer(('127.0.0.1', 0), _QuietRequestHandler)
+    server.set_app(WSGIHandler())
+    thread = threading.Thread(target=server.serve_forever, name='loadtest-server', daemon=True)
+    thread.start()
+    try:
+        yield server.server_address[1]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def drive(port, target, mix, duration, concurrency, seed=0):
+    """Request `mix` from `concurrency` threads for `duration` seconds.
+
+    Returns (elapsed, {endpoint: [latency seconds]}, {endpoint: error count}).
+    """
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    deadline = time.perf_counter() + duration
+    latencies, errors = defaultdict(list), Counter()
+    lock = threading.Lock()
+
+    def worker(n):
+        rng = random.Random(seed * 10_000 + n)
+        mine, my_errors = defaultdict(list), Counter()
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            path, headers = ENDPOINTS[name](target, rng)
+            conn = HTTPConnection('127.0.0.1', port, timeout=60)
+            started = time.perf_counter()
+            try:
+                conn.request('GET', path, headers={'Host': 'localhost', **headers})
+                response = conn.getresponse()
+                response.read()
+                ok = response.status < 400
+            except OSError:
+                ok = False
+            finally:
+                conn.close()
+            mine[name].append(time.perf_counter() - started)
+            if not ok:
+                my_errors[name] += 1
+        with lock:
+            for name, samples in mine.items():
+                latencies[name].extend(samples)
+            errors.update(my_errors)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, latencies, errors
+
+
+def _stats(samples, errors, elapsed):
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'rps': round(len(samples) / elapsed, 1),
+        'p50_ms': round(percentile(samples, 50) * 1000, 2),
+        'p95_ms': round(percentile(samples, 95) * 1000, 2),
+        'p99_ms': round(percentile(samples, 99) * 1000, 2),
+    }
+
+
+def summarize(elapsed, latencies, errors):
+    endpoints = {
+        name: _stats(samples, errors[name], elapsed) for name, samples in sorted(latencies.items()) if samples
+    }
+    everything = [sample for samples in latencies.values() for sample in samples]
+    if everything:
+        endpoints['all'] = _stats(everything, sum(errors.values()), elapsed)
+    return endpoints
+
+
+def run_load(mix='mixed', duration=30, warmup=5, concurrency=16, seed=0, page_cache_enabled=True,
+             token_users=50, slug_sample=2000):
+    """Run one load test against the current database and return the results dict."""
+    if not Post.objects.filter(status='published').exists():
+        raise ValueError("No published posts; run manage.py seed_loadtest first.")
+    users = User.objects.filter(username__startswith=USER_PREFIX).count()
+    if not users and 'api_me' in MIXES[mix]:
+        raise ValueError("No load-test users; run manage.py seed_loadtest first.")
+    # A stable sample: the newest posts, which the feed also links to
+    slugs = list(
+        Post.objects.filter(status='published').order_by('-published_at', '-id')
+        .values_list('slug', flat=True)[:slug_sample]
+    )
+
+    with _stubbed_settings(page_cache_enabled) as stub:
+        target = Target(slugs, [stub.token(i) for i in range(min(users, token_users))])
+        with local_server() as port:
+            if warmup:
+                drive(port, target, MIXES[mix], warmup, concurrency, seed)
+            elapsed, latencies, errors = drive(port, target, MIXES[mix], duration, concurrency, seed)
+
+    return {
+        'dataset': dataset_summary(),
+        'config': {
+            'mix': mix, 'duration': duration, 'concurrency': concurrency,
+            'page_cache': page_cache_enabled, 'seed': seed,
+        },
+        'environment': {
+            'python': platform.python_version(), 'database': connection.vendor, 'cpus': os.cpu_count(),
+        },
+        'endpoints': summarize(elapsed, latencies, errors),
+    }
+
+
+@contextmanager
+def _stubbed_settings(page_cache_enabled):
+    with tempfile.TemporaryDirectory() as directory:
+        stub = StubSupabase(directory)
+        overrides = {
+            'DEBUG': False,
+            'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'localhost', '127.0.0.1'],
+            'PAGE_CACHE_ENABLED': page_cache_enabled,
+            'SUPABASE_JWKS_URL': stub.jwks_path,
+            'SUPABASE_JWKS_REFRESH_SECONDS': 0,
+            'AI_LLM_BACKEND': 'posts.ai.StubLLMBackend',
+            # Measure the throttle's cost, not its limits
+            'REST_FRAMEWORK': {
+                **settings.REST_FRAMEWORK,
+                'DEFAULT_THROTTLE_RATES': {
+                    scope: '1000000/s' for scope in settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_RATES', {})
+                },
+            },
+            'SLOW_REQUEST_MS': 10 ** 9,
+            'SLOW_REQUEST_QUERIES': 10 ** 9,
+        }
+        with override_settings(**overrides):
+            yield stub
+
+
+# --- baselines ---
+
+def load_results(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def save_results(path, results):
+    with open(path, 'w') as fh:
+        json.dump(results, fh, indent=2, sort_keys=True)
+        fh.write('\n')
+
+
+def compare(baseline, results, tolerance=0.2):
+    """Regressions of `results` against `baseline`, as human-readable strings.
+
+    Flags an endpoint whose p50 or p95 latency grew, or whose throughput
+    fell, by more than `tolerance` (a fraction), or whose error rate rose
+    by more than one percentage point.
+    """
+    regressions = []
+    for name, base in baseline['endpoints'].items():
+        current = results['endpoints'].get(name)
+        if current is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if current[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {base[metric]} -> {current[metric]}")
+        if current['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(f"{name}: rps {base['rps']} -> {current['rps']}")
+        base_rate = base['errors'] / max(base['requests'], 1)
+        rate = current['errors'] / max(current['requests'], 1)
+        if rate > base_rate + 0.01:
+            regressions.append(f"{name}: error rate {base_rate:.1%} -> {rate:.1%}")
+    return regressions
+
+
+def comparable(baseline, results):
+    """Differences in dataset or configuration that make a comparison meaningless."""
+    notes = []
+    for key in ('mix', 'duration', 'concurrency', 'page_cache'):
+        if baseline['config'].get(key) != results['config'].get(key):
+            notes.append(f"{key}: {baseline['config'].get(key)} vs {results['config'].get(key)}")
+    for key in ('posts', 'comments'):
+        base, current = baseline['dataset'].get(key, 0), results['dataset'].get(key, 0)
+        if base and abs(current - base) / base > 0.1:
+            notes.append(f"{key}: {base} vs {current}")
+    return notes
@@ -0,0 +1,75 @@
+import gzip
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from posts import middleware, renderers
+from posts.models import Comment, Post
+from posts.searilizers import PostSerializer
+from posts.sparse import FieldSelection
+
+from .bench_read_path import Command as ReadPathCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure encode time and size of one page of posts for each API "
+        "renderer, raw and compressed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=10, help="Posts per page.")
+        parser.add_argument('--repeat', type=int, default=200, help="Encodes per renderer.")
+        parser.add_argument('--seed', type=int, default=0, help="Create this many published posts first.")
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            ReadPathCommand(stdout=self.stdout).seed(options['seed'])
+        posts = list(
+            Post.objects.filter(status='published').order_by('-published_at', '-id')
+            .select_related('author')
+            .prefetch_related('tags', Prefetch('comments', queryset=Comment.objects.select_related('author')))
+            [:options['page_size']]
+        )
+        if not posts:
+            raise CommandError("No published posts; run with --seed N.")
+        request = Request(APIRequestFactory().get('/api/posts/'))
+        pages = {
+            'full': PostSerializer(posts, many=True, context={'request': request}).data,
+            'list': PostSerializer(posts, many=True, context={
+                'request': request, 'sparse': FieldSelection(PostSerializer.Meta.list_fields),
+            }).data,
+        }
+
+        encoders = [('drf-json', JSONRenderer()), ('orjson', renderers.ORJSONRenderer())]
+        if renderers.msgpack is not None:
+            encoders.append(('msgpack', renderers.MessagePackRenderer()))
+
+        self.stdout.write(f"{len(posts)} posts per page, {options['repeat']} encodes each")
+        self.stdout.write(
+            f"{'page':<5} {'renderer':<9} {'encode ms':>10} {'bytes':>9} {'gzip':>8} {'gzip ms':>8}"
+            + (f" {'br':>8} {'br ms':>7}" if middleware.brotli else '')
+        )
+        for page_name, data in pages.items():
+            for name, renderer in encoders:
+                elapsed, body = self.time(lambda: renderer.render(data), options['repeat'])
+                line = f"{page_name:<5} {name:<9} {elapsed * 1000:>10.3f} {len(body):>9}"
+                gz_elapsed, gz = self.time(lambda: gzip.compress(body, compresslevel=6), 20)
+                line += f" {len(gz):>8} {gz_elapsed * 1000:>8.3f}"
+                if middleware.brotli:
+                    br_elapsed, br = self.time(
+                        lambda: middleware.brotli.compress(body, quality=middleware.BROTLI_QUALITY), 20
+                    )
+                    line += f" {len(br):>8} {br_elapsed * 1000:>7.3f}"
+                self.stdout.write(line)
+
+    def time(self, func, repeat):
+        """Mean seconds per call and the last result."""
+        started = time.perf_counter()
+        for _ in range(repeat):
+            result = func()
+        return (time.perf_counter() - started) / repeat, result
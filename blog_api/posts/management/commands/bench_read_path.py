@@ -0,0 +1,136 @@
+import asyncio
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings
+
+from posts.models import Comment, Post
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests/sec and p99 latency of the read views under the WSGI "
+        "and ASGI handlers, in-process and against the same database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Requests per handler and path.")
+        parser.add_argument('--concurrency', type=int, default=20, help="Requests in flight at once.")
+        parser.add_argument('--seed', type=int, default=0, help="Create this many published posts first.")
+        parser.add_argument('--path', action='append', dest='paths',
+                            help="Path to request (repeatable). Defaults to the list, detail and comments pages.")
+        parser.add_argument('--page-cache', action='store_true',
+                            help="Leave the anonymous page cache on (off by default so views do real work).")
+        parser.add_argument('--host', default='localhost')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['seed'])
+        paths = options['paths'] or self.default_paths()
+        overrides = {
+            'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, options['host']],
+            'PAGE_CACHE_ENABLED': options['page_cache'],
+        }
+        with override_settings(**overrides):
+            self.stdout.write(f"{'handler':<6} {'path':<40} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+            for path in paths:
+                for name, run in (('wsgi', self.run_wsgi), ('asgi', self.run_asgi)):
+                    elapsed, latencies, statuses = run(path, options)
+                    bad = [s for s in statuses if s != 200]
+                    if bad:
+                        raise CommandError(f"{name} {path}: got status {bad[0]} ({len(bad)} non-200 responses)")
+                    self.stdout.write(
+                        f"{name:<6} {path:<40} {len(latencies) / elapsed:>8.1f} "
+                        f"{statistics.median(latencies) * 1000:>8.1f} {_percentile(latencies, 99) * 1000:>8.1f}"
+                    )
+
+    def seed(self, count):
+        author, _ = User.objects.get_or_create(username='bench-author')
+        existing = Post.objects.filter(author=author).count()
+        for i in range(existing, existing + count):
+            post = Post.objects.create(
+                title=f"Benchmark post {i}", slug=f"bench-post-{i}", content="Lorem ipsum " * 200,
+                author=author, status='published',
+            )
+            Comment.objects.bulk_create(
+                Comment(post=post, author=author, content=f"Comment {j}") for j in range(10)
+            )
+
+    def default_paths(self):
+        post = Post.objects.filter(status='published').order_by('-published_at', '-id').first()
+        if post is None:
+            raise CommandError("No published posts; run with --seed N.")
+        return ['/', f'/posts/{post.slug}/', f'/posts/{post.slug}/comments/']
+
+    def run_wsgi(self, path, options):
+        app = WSGIHandler()
+        host = options['host']
+
+        def one(_):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+                'SERVER_NAME': host, 'SERVER_PORT': '80', 'HTTP_HOST': host, 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+                'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+            }
+            status = []
+            started = time.perf_counter()
+            body = app(environ, lambda s, headers, exc_info=None: status.append(int(s.split()[0])))
+            b''.join(body)
+            body.close()
+            return time.perf_counter() - started, status[0]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(one, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+        connections.close_all()
+        return elapsed, [r[0] for r in results], [r[1] for r in results]
+
+    def run_asgi(self, path, options):
+        app = ASGIHandler()
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+            'root_path': '', 'headers': [(b'host', options['host'].encode())],
+            'client': ('127.0.0.1', 50000), 'server': (options['host'], 80),
+        }
+
+        async def one(semaphore):
+            async with semaphore:
+                status = []
+
+                async def receive():
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+                async def send(message):
+                    if message['type'] == 'http.response.start':
+                        status.append(message['status'])
+
+                started = time.perf_counter()
+                await app(dict(scope), receive, send)
+                return time.perf_counter() - started, status[0]
+
+        async def main():
+            semaphore = asyncio.Semaphore(options['concurrency'])
+            return await asyncio.gather(*(one(semaphore) for _ in range(options['requests'])))
+
+        started = time.perf_counter()
+        results = asyncio.run(main())
+        elapsed = time.perf_counter() - started
+        connections.close_all()
+        return elapsed, [r[0] for r in results], [r[1] for r in results]
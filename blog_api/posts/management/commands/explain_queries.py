@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.query_plans import check_query_plans
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot post/comment/tag queries and check they use the intended indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help="Print the full plan for every query.")
+
+    def handle(self, *args, **options):
+        failures = []
+        for name, plan, used, sorts in check_query_plans():
+            if used and not sorts:
+                self.stdout.write(self.style.SUCCESS(f"OK    {name}: {used}"))
+            else:
+                reason = 'extra sort step' if used else 'no expected index'
+                self.stdout.write(self.style.ERROR(f"FAIL  {name}: {reason}"))
+                failures.append(name)
+            if options['verbose_plans'] or not used or sorts:
+                self.stdout.write(plan)
+        if failures:
+            raise CommandError(f"{len(failures)} query plan(s) don't use their index: {', '.join(failures)}")
@@ -0,0 +1,27 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.counters import flush_view_counts
+
+
+class Command(BaseCommand):
+    help = "Flush buffered post view counts into Post.click_count (VIEW_COUNTER_MODE=cache)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep running and flush every VIEW_COUNTER_FLUSH_SECONDS.",
+        )
+        parser.add_argument('--interval', type=int, default=None, help="Override the flush interval in seconds.")
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or getattr(settings, 'VIEW_COUNTER_FLUSH_SECONDS', 10)
+        while True:
+            flushed = flush_view_counts()
+            if flushed or not options['loop']:
+                self.stdout.write(f"Flushed {flushed} view(s)")
+            if not options['loop']:
+                break
+            time.sleep(interval)
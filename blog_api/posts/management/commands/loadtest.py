@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the site on a local server with concurrent clients and report "
+        "throughput and p50/p95/p99 latency per endpoint; optionally save the "
+        "results or compare them with a baseline. Seed data with seed_loadtest."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mix', choices=sorted(loadtest.MIXES), default='mixed')
+        parser.add_argument('--duration', type=float, default=30, help="Measured seconds.")
+        parser.add_argument('--warmup', type=float, default=5, help="Unmeasured seconds first.")
+        parser.add_argument('--concurrency', type=int, default=16, help="Client threads.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--no-page-cache', action='store_true',
+                            help="Turn the anonymous page cache off so views do the full work.")
+        parser.add_argument('--save', metavar='PATH', help="Write the results as JSON (e.g. a new baseline).")
+        parser.add_argument('--compare', metavar='PATH', help="Baseline JSON to compare against.")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Allowed slowdown before flagging a regression (fraction, default 0.2).")
+
+    def handle(self, *args, **options):
+        try:
+            results = loadtest.run_load(
+                mix=options['mix'], duration=options['duration'], warmup=options['warmup'],
+                concurrency=options['concurrency'], seed=options['seed'],
+                page_cache_enabled=not options['no_page_cache'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        dataset = results['dataset']
+        self.stdout.write(f"{dataset['posts']} posts, {dataset['comments']} comments, {options['mix']} mix, "
+                          f"{options['concurrency']} clients, {options['duration']:g}s")
+        self.stdout.write(f"{'endpoint':<16} {'requests':>9} {'errors':>7} {'req/s':>8} "
+                          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for name, stats in results['endpoints'].items():
+            self.stdout.write(
+                f"{name:<16} {stats['requests']:>9} {stats['errors']:>7} {stats['rps']:>8.1f} "
+                f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}"
+            )
+
+        if options['save']:
+            loadtest.save_results(options['save'], results)
+            self.stdout.write(f"Saved to {options['save']}")
+        if options['compare']:
+            baseline = loadtest.load_results(options['compare'])
+            for note in loadtest.comparable(baseline, results):
+                self.stdout.write(self.style.WARNING(f"Not like for like: {note}"))
+            regressions = loadtest.compare(baseline, results, options['tolerance'])
+            if regressions:
+                raise CommandError("Regressions against the baseline:\n  " + "\n  ".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
@@ -0,0 +1,89 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Imported on first use only (see posts/ai.py); loading any of them during
+# startup is a regression.
+LAZY_MODULES = ('litellm',)
+
+# Runs in a fresh interpreter: this process has already imported everything.
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver, resolve
+get_resolver().reverse_dict
+resolve('/api/posts/')
+print(json.dumps({
+    'seconds': time.perf_counter() - started,
+    'loaded': sorted(name for name in %r if name in sys.modules),
+}))
+"""
+
+
+def profile_startup(importtime=True):
+    """Time django.setup() plus URL resolution in a new Python process.
+
+    Returns {'seconds', 'loaded', 'imports'}; `loaded` lists the LAZY_MODULES
+    that were imported, and `imports` is [(module, self_us, cumulative_us,
+    depth)] from ``python -X importtime`` (empty when importtime is False).
+    """
+    env = {**os.environ}
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'blog_api.settings')
+    command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-c', STARTUP_SCRIPT % (LAZY_MODULES,)]
+    result = subprocess.run(command, capture_output=True, text=True, env=env)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'startup failed')
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    report['imports'] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        report['imports'].append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return report
+
+
+class Command(BaseCommand):
+    help = (
+        "Report how long django.setup() plus URL resolution takes in a fresh "
+        "process, and which modules the time goes to."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20, help="Rows to show.")
+        parser.add_argument(
+            '--modules', action='store_true',
+            help="List single modules by cumulative time instead of packages by own time.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            report = profile_startup()
+        except RuntimeError as exc:
+            raise CommandError(f"Startup failed: {exc}")
+
+        self.stdout.write(f"startup: {report['seconds'] * 1000:.0f} ms (setup + URL resolution, with -X importtime)")
+        if options['modules']:
+            rows = sorted(((cumulative, name) for name, _, cumulative, _ in report['imports']), reverse=True)
+            self.stdout.write(f"\n{'cumulative ms':>14}  module")
+        else:
+            by_package = defaultdict(int)
+            for name, self_us, _, _ in report['imports']:
+                by_package[name.split('.')[0]] += self_us
+            rows = sorted(((us, name) for name, us in by_package.items()), reverse=True)
+            self.stdout.write(f"\n{'own ms':>14}  package")
+        for us, name in rows[:options['top']]:
+            self.stdout.write(f"{us / 1000:>14.1f}  {name}")
+
+        if report['loaded']:
+            self.stdout.write(self.style.WARNING(
+                f"\nImported at startup but meant to load lazily: {', '.join(report['loaded'])}"
+            ))
@@ -0,0 +1,41 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.jobs import reap_stale_jobs, run_in_thread
+from posts.models import GenerationJob
+
+
+class Command(BaseCommand):
+    help = "Run queued AI generation jobs (use with AI_JOB_MODE=worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=None,
+                            help="Parallel LLM calls (default AI_JOB_CONCURRENCY).")
+        parser.add_argument('--poll', type=float, default=1.0, help="Seconds between polls when idle.")
+        parser.add_argument('--once', action='store_true', help="Drain the queue once and exit.")
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency'] or getattr(settings, 'AI_JOB_CONCURRENCY', 2)
+        reap_interval = getattr(settings, 'AI_JOB_RECOVER_INTERVAL', 60)
+        last_reap = None
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='ai-jobs') as pool:
+            while True:
+                # Jobs a dead worker left running go back in the queue
+                if last_reap is None or time.monotonic() - last_reap >= reap_interval:
+                    reap_stale_jobs()
+                    last_reap = time.monotonic()
+                job_ids = list(
+                    GenerationJob.objects.filter(status="queued")
+                    .order_by('created_at')
+                    .values_list('pk', flat=True)[:concurrency]
+                )
+                if job_ids:
+                    wait([pool.submit(run_in_thread, job_id) for job_id in job_ids])
+                    self.stdout.write(f"Processed {len(job_ids)} job(s)")
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll'])
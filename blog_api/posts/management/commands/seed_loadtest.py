@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.loadtest import seed_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-load a reproducible load-test dataset (users, tags, posts, post tags "
+        "and comments) into an empty database. See posts/loadtest.py."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--comments', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=5_000)
+        parser.add_argument('--tags', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0, help="Random seed; same seed, same data.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--index-search', action='store_true', help="Also build the post search index.")
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['posts'] < 1:
+            raise CommandError("Need at least one user and one post.")
+        try:
+            summary = seed_dataset(
+                options['posts'], options['comments'], options['users'], options['tags'],
+                seed=options['seed'], batch_size=options['batch_size'],
+                index_search=options['index_search'], log=self.stdout.write,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f"{count} {name}" for name, count in summary.items())
+        ))
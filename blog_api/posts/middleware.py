@@ -0,0 +1,186 @@
+"""Project middleware.
+
+CompressionMiddleware: like django.middleware.gzip.GZipMiddleware, plus
+Brotli when the optional ``brotli`` package is installed, a size threshold
+(RESPONSE_COMPRESSION_MIN_SIZE) and a content-type allow-list. Streaming
+responses are passed through untouched: compressing them would buffer the
+Server-Sent Events from posts/streaming.py.
+
+RateLimitHeadersMiddleware: RateLimit-* headers from posts/throttling.py.
+
+ReplicaPinningMiddleware: per-request read-replica routing state and the
+read-your-writes cookie (posts/db_router.py).
+
+All of them run natively in sync and async stacks, so the async views don't hop
+to a thread for them.
+"""
+import math
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import SimpleLazyObject
+from django.utils.text import compress_string
+
+from . import db_router
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript', 'application/xml',
+    'application/msgpack', 'image/svg+xml',
+)
+# Dynamic content: quality 5 compresses better than gzip -6 at similar speed
+BROTLI_QUALITY = 5
+# Same BREACH mitigation as GZipMiddleware
+GZIP_MAX_RANDOM_BYTES = 100
+
+
+def accepted_encodings(header):
+    """{'gzip': 1.0, 'br': 0.5, ...} from an Accept-Encoding header."""
+    encodings = {}
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            encodings[name.strip().lower()] = q
+    return encodings
+
+
+def choose_encoding(header, content_type):
+    encodings = accepted_encodings(header)
+    if brotli is not None and encodings.get('br', 0) > 0 and not content_type.startswith('text/html'):
+        # HTML pages carry CSRF tokens; keep them on gzip, which pads against BREACH
+        return 'br'
+    if encodings.get('gzip', encodings.get('*', 0)) > 0:
+        return 'gzip'
+    return None
+
+
+class _ResponseMiddleware:
+    """Sync and async capable middleware that only post-processes the response."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        raise NotImplementedError
+
+
+class CompressionMiddleware(_ResponseMiddleware):
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '').lower()
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+        if len(response.content) < getattr(settings, 'RESPONSE_COMPRESSION_MIN_SIZE', 1024):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), content_type)
+        if encoding is None:
+            return response
+        if encoding == 'br':
+            compressed = brotli.compress(response.content, quality=BROTLI_QUALITY)
+        else:
+            compressed = compress_string(response.content, max_random_bytes=GZIP_MAX_RANDOM_BYTES)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        response.headers['Content-Encoding'] = encoding
+        # The bytes differ per encoding, so a strong ETag must become weak
+        # (RFC 9110 8.8.1); ConditionalGetMixin compares weakly.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        return response
+
+
+class RateLimitHeadersMiddleware(_ResponseMiddleware):
+    def process_response(self, request, response):
+        result = getattr(request, 'rate_limit', None)
+        if result is not None:
+            response.headers['RateLimit-Limit'] = str(result.limit)
+            response.headers['RateLimit-Remaining'] = str(result.remaining)
+            response.headers['RateLimit-Reset'] = str(result.reset)
+            if not result.allowed and not response.has_header('Retry-After'):
+                response.headers['Retry-After'] = str(math.ceil(result.wait))
+        return response
+
+
+def _authenticated_user_id(request):
+    """The user DRF authenticated (e.g. from a bearer token), without loading a session user."""
+    user = getattr(request, 'user', None)
+    if user is None or isinstance(user, SimpleLazyObject):
+        # Session users keep the pin cookie
+        return None
+    return user.pk if user.is_authenticated else None
+
+
+class ReplicaPinningMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = db_router.begin_request(self.is_pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            state = db_router.end_request(token)
+        return self.process_response(request, state, response)
+
+    async def __acall__(self, request):
+        token = db_router.begin_request(self.is_pinned(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            state = db_router.end_request(token)
+        if state.wrote:
+            # Pinning the user writes to the cache
+            return await sync_to_async(self.process_response)(request, state, response)
+        return self.process_response(request, state, response)
+
+    def is_pinned(self, request):
+        return db_router.PIN_COOKIE in request.COOKIES
+
+    def process_response(self, request, state, response):
+        if state.wrote:
+            response.set_cookie(
+                db_router.PIN_COOKIE, '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 10),
+                httponly=True, samesite='Lax',
+            )
+            user_id = _authenticated_user_id(request)
+            if user_id is not None:
+                db_router.pin_user(user_id)
+        return response
@@ -0,0 +1,87 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:52
+
+import re
+from collections import Counter
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Frozen copies of posts.search as of this migration, so later changes to the
+# app code can't change what it does.
+CONFIG = 'english'
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+MAX_TERM_LENGTH = 64
+FIELD_WEIGHTS = (('title', 8), ('tags', 4), ('excerpt', 2), ('content', 1))
+
+
+def tokenize(text):
+    return [t[:MAX_TERM_LENGTH] for t in TERM_RE.findall((text or '').lower()) if len(t) > 1]
+
+
+def extract_terms(title, content, excerpt='', tag_names=()):
+    fields = {'title': title, 'tags': ' '.join(tag_names), 'excerpt': excerpt, 'content': content}
+    weights = Counter()
+    for field, weight in FIELD_WEIGHTS:
+        for term in tokenize(fields[field]):
+            weights[term] += weight
+    return weights
+
+
+def add_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("ALTER TABLE posts_post ADD COLUMN search_vector tsvector")
+    schema_editor.execute(
+        "CREATE INDEX posts_post_search_vector_gin ON posts_post USING GIN (search_vector)"
+    )
+    schema_editor.execute(f"""
+        UPDATE posts_post p SET search_vector =
+            setweight(to_tsvector('{CONFIG}', coalesce(p.title, '')), 'A') ||
+            setweight(to_tsvector('{CONFIG}', coalesce((
+                SELECT string_agg(t.name, ' ') FROM posts_tag t
+                JOIN posts_posttag pt ON pt.tag_id = t.id WHERE pt.post_id = p.id
+            ), '')), 'B') ||
+            setweight(to_tsvector('{CONFIG}', coalesce(p.excerpt, '')), 'C') ||
+            setweight(to_tsvector('{CONFIG}', coalesce(p.content, '')), 'D')
+    """)
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("ALTER TABLE posts_post DROP COLUMN search_vector")
+
+
+def build_inverted_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    Post = apps.get_model('posts', 'Post')
+    PostSearchTerm = apps.get_model('posts', 'PostSearchTerm')
+    rows = []
+    for post in Post.objects.prefetch_related('tags').iterator(chunk_size=500):
+        terms = extract_terms(post.title, post.content, post.excerpt, [t.name for t in post.tags.all()])
+        rows.extend(PostSearchTerm(post_id=post.pk, term=term, weight=weight) for term, weight in terms.items())
+    PostSearchTerm.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'post'], name='posts_posts_term_bc18fd_idx')],
+            },
+        ),
+        migrations.RunPython(add_search_vector, drop_search_vector),
+        migrations.RunPython(build_inverted_index, migrations.RunPython.noop),
+    ]
@@ -2,7 +2,6 @@ import uuid,os
 from django.db import models
 from django.conf import settings
 from django.utils.text import slugify
-from PIL import Image
 from django.utils import timezone
 import os
 from django.conf import settings
@@ -46,36 +45,82 @@ class Post(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     tags = models.ManyToManyField(Tag, through='PostTag', blank=True)
     click_count = models.PositiveIntegerField(default=0) 
+    # Filled in by the image pipeline (posts/images.py)
+    image_hash = models.CharField(max_length=64, blank=True, default='')
+    image_variants = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        indexes = [
+            # Published feed: WHERE status='published' ORDER BY published_at DESC, id DESC
+            models.Index(
+                fields=['-published_at', '-id'],
+                condition=models.Q(status='published'),
+                name='post_published_feed_idx',
+            ),
+            # Author dashboards and any status filter not covered by the partial index
+            models.Index(fields=['status', '-published_at', '-id'], name='post_status_published_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if self.status == "published" and not self.published_at:
               self.published_at = timezone.now()
         if not self.slug:
             self.slug = slugify(self.title)
+        update_fields = kwargs.get('update_fields')
+        image_changed = (
+            self.image.name != getattr(self, '_loaded_image_name', None)
+            and (update_fields is None or 'image' in update_fields)
+        )
+        if image_changed and not self.image:
+            self.image_hash, self.image_variants = '', {}
         super().save(*args, **kwargs)
-        if self.image and os.path.exists(self.image.path):
-            img = Image.open(self.image)
-            img = img.convert("RGB")
-            img.thumbnail((400, 400))
-
-            base, ext = os.path.splitext(os.path.basename(self.image.name))
-            thumb_filename = f"{base}_thumb.jpg"
-            thumb_path = os.path.join(settings.MEDIA_ROOT, "posts/images/post_list_img", thumb_filename)
-
-            os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
-
-            img.save(thumb_path, "JPEG", quality=70, optimize=True)
-            self._thumbnail_name = f"posts/images/post_list_img/{thumb_filename}"
+        self._loaded_image_name = self.image.name
+        self._loaded_slug = self.slug
+        # Thumbnails are rendered off the request by posts.images
+        if image_changed and self.image:
+            from .images import enqueue_post_image
+            enqueue_post_image(self.pk)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'image' in field_names:
+            instance._loaded_image_name = instance.image.name
+        if 'slug' in field_names:
+            instance._loaded_slug = instance.slug
+        return instance
+
+    def _variant_url(self, name):
+        return os.path.join(settings.MEDIA_URL, name)
 
     @property
     def thumbnail_url(self):
-        if hasattr(self, "_thumbnail_name"):
-            return os.path.join(settings.MEDIA_URL, self._thumbnail_name)
+        if self.image_variants.get("thumbnail"):
+            return self._variant_url(self.image_variants["thumbnail"])
         if self.image:
+            # Images uploaded before the pipeline existed have a _thumb.jpg;
+            # new ones show the original until their variants are rendered.
             base, _ = os.path.splitext(os.path.basename(self.image.name))
-            thumb_filename = f"{base}_thumb.jpg"
-            return os.path.join(settings.MEDIA_URL, "posts/images/post_list_img", thumb_filename)
+            legacy = f"posts/images/post_list_img/{base}_thumb.jpg"
+            if self.image.storage.exists(legacy):
+                return self._variant_url(legacy)
+            return self.image.url
         return None
 
+    def _srcset(self, fmt):
+        widths = self.image_variants.get(fmt) or {}
+        return ", ".join(
+            f"{self._variant_url(name)} {width}w" for width, name in sorted(widths.items(), key=lambda i: int(i[0]))
+        )
+
+    @property
+    def image_srcset(self):
+        return self._srcset("jpeg")
+
+    @property
+    def image_webp_srcset(self):
+        return self._srcset("webp")
+
     def __str__(self):
         return self.title
 
@@ -83,6 +128,25 @@ class PostTag(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
     tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'tag'], name='posttag_unique_post_tag'),
+        ]
+        indexes = [
+            # Tag pages: posts for a tag (the unique constraint covers post -> tags)
+            models.Index(fields=['tag', 'post'], name='posttag_tag_post_idx'),
+        ]
+
+
+class PostSearchTerm(models.Model):
+    """Inverted index row used by the non-Postgres search backend (posts/search.py)."""
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [models.Index(fields=['term', 'post'])]
+
 
 class Comment(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -92,5 +156,47 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     approved = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            # Comment lists: WHERE post_id=? AND approved ORDER BY created_at DESC, id DESC
+            models.Index(
+                fields=['post', '-created_at', '-id'],
+                condition=models.Q(approved=True),
+                name='comment_approved_post_idx',
+            ),
+            models.Index(fields=['post', 'approved', '-created_at'], name='comment_post_approved_idx'),
+        ]
+
     def __str__(self):
         return f"Comment by {self.author} on {self.post}"
+
+
+class GenerationJob(models.Model):
+    """An AI post-generation request processed in the background (posts/jobs.py)."""
+    STATUS_CHOICES = (
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("succeeded", "Succeeded"),
+        ("failed", "Failed"),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='generation_jobs')
+    prompt = models.TextField()
+    post_status = models.CharField(max_length=20, choices=Post.STATUS_CHOICES, default='draft')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    post = models.ForeignKey(Post, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'], name='generationjob_status_idx')]
+
+    @property
+    def is_finished(self):
+        return self.status in ("succeeded", "failed")
+
+    def __str__(self):
+        return f"Generation job {self.id} ({self.status})"
@@ -0,0 +1,220 @@
+"""Rendered page and fragment caching for the HTML views.
+
+Cache keys embed version stamps kept in the shared cache. Signals bump the
+stamps of exactly the content that changed (see posts/signals.py), so stale
+entries are simply never read again and expire on their own; no TTL guessing
+and no cross-process purge. Stamp updates use cache.incr(), which is atomic
+on shared backends, so this is safe with several worker processes.
+
+Version scopes:
+
+* ``list``           - anything shown or searchable on post_list
+* ``post:<pk>``      - a post's body and tags
+* ``comments:<pk>``  - a post's approved comments
+* ``page:<slug>``    - everything rendered for a post slug (post_comments,
+  the API post detail and its nested comments)
+* ``comments``       - any comment anywhere (API comment/post lists)
+* ``tags``           - the tag collection
+"""
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .aio import aget_user
+
+STATS_KEY = 'page-cache:stats:{kind}:{outcome}'
+
+
+def _version_key(scope):
+    return f'content-version:{scope}'
+
+
+def _initial_version():
+    # Time-based so a version evicted from the cache never restarts at a
+    # number whose old entries might still be cached.
+    return int(time.time() * 1000)
+
+
+def get_versions(*scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            cache.add(key, _initial_version(), None)
+            version = cache.get(key)
+        versions.append(version)
+    return versions
+
+
+async def aget_versions(*scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    found = await cache.aget_many(keys)
+    versions = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            await cache.aadd(key, _initial_version(), None)
+            version = await cache.aget(key)
+        versions.append(version)
+    return versions
+
+
+def _modified_key(scope):
+    return f'content-modified:{scope}'
+
+
+def bump(*scopes):
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, _initial_version(), None):
+                cache.incr(key)
+    now = int(time.time())
+    cache.set_many({_modified_key(scope): now for scope in scopes}, None)
+
+
+def get_last_modified(*scopes):
+    """Unix time of the latest bump of any scope, or None if any is unknown."""
+    found = cache.get_many([_modified_key(scope) for scope in scopes])
+    if len(found) < len(scopes):
+        return None
+    return max(found.values())
+
+
+def _timeout():
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def record(kind, outcome):
+    key = STATS_KEY.format(kind=kind, outcome=outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+async def arecord(kind, outcome):
+    key = STATS_KEY.format(kind=kind, outcome=outcome)
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        if not await cache.aadd(key, 1, None):
+            await cache.aincr(key)
+
+
+def get_stats():
+    """{kind: {'hit': n, 'miss': n}} across all worker processes."""
+    kinds = ('page', 'fragment')
+    keys = {STATS_KEY.format(kind=k, outcome=o): (k, o) for k in kinds for o in ('hit', 'miss')}
+    found = cache.get_many(list(keys))
+    stats = {k: {'hit': 0, 'miss': 0} for k in kinds}
+    for key, (kind, outcome) in keys.items():
+        stats[kind][outcome] = found.get(key, 0)
+    return stats
+
+
+def fragment_key(name, versions, *parts):
+    raw = ':'.join(str(p) for p in (*parts, *versions))
+    return f'fragment:{name}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def get_or_render_fragment(name, scopes, parts, render):
+    key = fragment_key(name, get_versions(*scopes), *parts)
+    rendered = []
+
+    def miss():
+        rendered.append(True)
+        return render()
+
+    # get_or_set() is single-flight on the two-tier cache (posts/cache.py):
+    # after a bump, one worker renders while the rest wait for its result
+    html = cache.get_or_set(key, miss, _timeout())
+    record('fragment', 'miss' if rendered else 'hit')
+    return html
+
+
+def _is_cacheable_request(request):
+    return (
+        getattr(settings, 'PAGE_CACHE_ENABLED', True)
+        and request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        # Pending flash messages make the page personal
+        and 'messages' not in request.COOKIES
+    )
+
+
+def _page_key(view, request, versions):
+    raw = ':'.join([request.get_full_path(), *map(str, versions)])
+    return f'page:{view.__name__}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def _cached_response(cached):
+    content, content_type = cached
+    response = HttpResponse(content, content_type=content_type)
+    response['X-Page-Cache'] = 'HIT'
+    return response
+
+
+def _is_storable(response):
+    return response.status_code == 200 and not response.streaming and not response.cookies
+
+
+def cache_anonymous_page(scopes):
+    """Cache the full rendered page for anonymous GETs.
+
+    `scopes(request, *args, **kwargs)` returns the version scopes the page
+    depends on. Logged-in users always get a fresh render, so personalised
+    parts (nav bar, comment form, CSRF tokens) are never shared. Works on
+    both sync and async views.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            return _async_cache_anonymous_page(view, scopes)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _is_cacheable_request(request):
+                return view(request, *args, **kwargs)
+            key = _page_key(view, request, get_versions(*scopes(request, *args, **kwargs)))
+            cached = cache.get(key)
+            if cached is not None:
+                record('page', 'hit')
+                return _cached_response(cached)
+            record('page', 'miss')
+            response = view(request, *args, **kwargs)
+            if _is_storable(response):
+                cache.set(key, (response.content, response['Content-Type']), _timeout())
+            response['X-Page-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def _async_cache_anonymous_page(view, scopes):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        await aget_user(request)
+        if not _is_cacheable_request(request):
+            return await view(request, *args, **kwargs)
+        key = _page_key(view, request, await aget_versions(*scopes(request, *args, **kwargs)))
+        cached = await cache.aget(key)
+        if cached is not None:
+            await arecord('page', 'hit')
+            return _cached_response(cached)
+        await arecord('page', 'miss')
+        response = await view(request, *args, **kwargs)
+        if _is_storable(response):
+            await cache.aset(key, (response.content, response['Content-Type']), _timeout())
+        response['X-Page-Cache'] = 'MISS'
+        return response
+    return wrapper
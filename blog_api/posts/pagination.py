@@ -0,0 +1,184 @@
+"""Keyset (cursor) pagination for post feeds and comment lists.
+
+Pages are selected with a WHERE on the ordering columns of the last row seen
+(e.g. ``(published_at, id) < (:t, :id)``) instead of COUNT(*) + OFFSET, so a
+deep page costs the same as the first one and rows inserted meanwhile don't
+shift the page boundaries.
+"""
+import base64
+import binascii
+import json
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.encoding import force_str
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+KeysetPage = namedtuple('KeysetPage', ['items', 'next_cursor', 'previous_cursor'])
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values, reverse=False):
+    payload = {'v': [force_str(v) for v in values]}
+    if reverse:
+        payload['r'] = 1
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(cursor, model, ordering):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        raw_values = payload['v']
+    except (TypeError, ValueError, KeyError, binascii.Error):
+        raise InvalidCursor('Invalid cursor')
+    if len(raw_values) != len(ordering):
+        raise InvalidCursor('Invalid cursor')
+    values = []
+    for field_name, raw in zip(ordering, raw_values):
+        field = model._meta.get_field(field_name.lstrip('-'))
+        try:
+            values.append(field.to_python(raw))
+        except Exception:
+            raise InvalidCursor('Invalid cursor')
+    return values, bool(payload.get('r'))
+
+
+def _after(ordering, values):
+    """Q for rows strictly after `values` in `ordering` (row-value comparison)."""
+    condition = Q()
+    equal = Q()
+    for field_name, value in zip(ordering, values):
+        name = field_name.lstrip('-')
+        lookup = 'lt' if field_name.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def _flip(ordering):
+    return [f[1:] if f.startswith('-') else f'-{f}' for f in ordering]
+
+
+def _row_values(obj, ordering):
+    return [getattr(obj, f.lstrip('-')) for f in ordering]
+
+
+def _keyset_queryset(queryset, ordering, cursor):
+    if not cursor:
+        return queryset.order_by(*ordering), False
+    values, reverse = decode_cursor(cursor, queryset.model, ordering)
+    if reverse:
+        return queryset.filter(_after(_flip(ordering), values)).order_by(*_flip(ordering)), True
+    return queryset.filter(_after(ordering, values)).order_by(*ordering), False
+
+
+def _build_page(rows, ordering, cursor, page_size, reverse):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or reverse:
+            next_cursor = encode_cursor(_row_values(rows[-1], ordering))
+        if cursor and (has_more or not reverse):
+            previous_cursor = encode_cursor(_row_values(rows[0], ordering), reverse=True)
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=10):
+    """Return one page of `queryset` ordered by `ordering` (which must end in a unique field)."""
+    queryset, reverse = _keyset_queryset(queryset, ordering, cursor)
+    rows = list(queryset[:page_size + 1])
+    return _build_page(rows, ordering, cursor, page_size, reverse)
+
+
+async def akeyset_page(queryset, ordering, cursor=None, page_size=10):
+    """keyset_page() for async views."""
+    queryset, reverse = _keyset_queryset(queryset, ordering, cursor)
+    rows = [row async for row in queryset[:page_size + 1]]
+    return _build_page(rows, ordering, cursor, page_size, reverse)
+
+
+class KeysetPagination(pagination.BasePagination):
+    """DRF pagination class built on keyset_page().
+
+    Querysets ordered some other way (an explicit ?ordering=, or relevance
+    ranking from search) can't be keyset-paginated; those fall back to
+    page-number pagination.
+    """
+    ordering = None
+    page_size = None
+    cursor_query_param = 'cursor'
+    fallback_class = pagination.PageNumberPagination
+
+    def get_page_size(self):
+        return self.page_size or settings.REST_FRAMEWORK.get('PAGE_SIZE') or 10
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.fallback = None
+        current = tuple(str(o) for o in queryset.query.order_by)
+        if current and current != tuple(self.ordering):
+            self.fallback = self.fallback_class()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        try:
+            page = keyset_page(
+                queryset, self.ordering,
+                cursor=request.query_params.get(self.cursor_query_param),
+                page_size=self.get_page_size(),
+            )
+        except InvalidCursor as e:
+            raise NotFound(str(e))
+        self.next_cursor = page.next_cursor
+        self.previous_cursor = page.previous_cursor
+        return page.items
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.previous_cursor)
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class PostCursorPagination(KeysetPagination):
+    ordering = ('-published_at', '-id')
+
+
+class CommentCursorPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
@@ -7,4 +7,5 @@ class IsAuthorOrReadOnly(permissions.BasePermission):
         if request.method in permissions.SAFE_METHODS:
             return True
             
-        return obj.author == request.user
\ No newline at end of file
+        # Compare ids so checking a batch of objects doesn't load each author
+        return obj.author_id == request.user.pk
\ No newline at end of file
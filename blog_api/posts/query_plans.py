@@ -0,0 +1,64 @@
+"""EXPLAIN checks for the hot query shapes and the indexes meant to serve them.
+
+Used by the `explain_queries` management command and the test suite. The
+expected index names come from Meta.indexes on Post, Comment and PostTag.
+"""
+from django.db import connection, transaction
+
+from .models import Comment, Post, PostTag
+from .pagination import CommentCursorPagination, PostCursorPagination
+
+SAMPLE_UUID = '00000000-0000-0000-0000-000000000000'
+
+# Plan fragments meaning the database sorted rows itself instead of reading
+# them in index order.
+SORT_MARKERS = ('TEMP B-TREE', 'Sort Key')
+
+
+def hot_queries():
+    """(name, queryset, acceptable index names) for each main access path."""
+    return [
+        (
+            'published feed',
+            Post.objects.filter(status='published').order_by(*PostCursorPagination.ordering)[:10],
+            {'post_published_feed_idx', 'post_status_published_idx'},
+        ),
+        (
+            'approved comments for a post',
+            Comment.objects.filter(post_id=SAMPLE_UUID, approved=True).order_by(*CommentCursorPagination.ordering)[:20],
+            {'comment_approved_post_idx', 'comment_post_approved_idx'},
+        ),
+        (
+            'posts for a tag',
+            PostTag.objects.filter(tag_id=0).values('post_id'),
+            {'posttag_tag_post_idx'},
+        ),
+        (
+            'tags for a post',
+            PostTag.objects.filter(post_id=SAMPLE_UUID).values('tag_id'),
+            # SQLite builds UNIQUE constraints into the table as sqlite_autoindex_*
+            {'posttag_unique_post_tag', 'sqlite_autoindex_posts_posttag'},
+        ),
+    ]
+
+
+def explain(queryset):
+    if connection.vendor != 'postgresql':
+        return queryset.explain()
+    # On small or empty tables Postgres rightly prefers a seq scan; disable it
+    # so the plan shows whether the index *can* serve the query.
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+def check_query_plans():
+    """Return [(name, plan, index_used_or_None, sorted_in_memory)] for every hot query."""
+    results = []
+    for name, queryset, indexes in hot_queries():
+        plan = explain(queryset)
+        used = next((idx for idx in sorted(indexes) if idx in plan), None)
+        sorts = any(marker in plan for marker in SORT_MARKERS)
+        results.append((name, plan, used, sorts))
+    return results
@@ -0,0 +1,146 @@
+"""Indexed full-text search over published posts.
+
+Two backends share one interface:
+
+* ``PostgresSearchBackend`` keeps a weighted ``tsvector`` column on the post
+  table (title > tags > excerpt > content) behind a GIN index and ranks with
+  ``ts_rank_cd``.
+* ``InvertedIndexSearchBackend`` stores (term, post, weight) rows in
+  ``PostSearchTerm`` and is used on SQLite and other databases.
+
+Both are updated incrementally from signals (see posts/signals.py) and return
+each matching post once, best match first.
+"""
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, F, FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+MAX_TERM_LENGTH = 64
+
+# Relative weight of each field for the inverted index; mirrors the
+# A/B/C/D weights used for the Postgres tsvector.
+FIELD_WEIGHTS = (('title', 8), ('tags', 4), ('excerpt', 2), ('content', 1))
+
+
+def tokenize(text):
+    return [t[:MAX_TERM_LENGTH] for t in TERM_RE.findall((text or '').lower()) if len(t) > 1]
+
+
+def extract_terms(title, content, excerpt='', tag_names=()):
+    """Return {term: weight} for one post, summing the weight of every occurrence."""
+    fields = {'title': title, 'tags': ' '.join(tag_names), 'excerpt': excerpt, 'content': content}
+    weights = Counter()
+    for field, weight in FIELD_WEIGHTS:
+        for term in tokenize(fields[field]):
+            weights[term] += weight
+    return weights
+
+
+class InvertedIndexSearchBackend:
+    def index_posts(self, post_ids):
+        from .models import Post, PostSearchTerm
+
+        posts = Post.objects.filter(pk__in=post_ids).prefetch_related('tags')
+        rows = []
+        for post in posts:
+            terms = extract_terms(post.title, post.content, post.excerpt, [t.name for t in post.tags.all()])
+            rows.extend(PostSearchTerm(post=post, term=term, weight=weight) for term, weight in terms.items())
+        PostSearchTerm.objects.filter(post_id__in=post_ids).delete()
+        PostSearchTerm.objects.bulk_create(rows, batch_size=500)
+
+    def search(self, queryset, query):
+        from .models import PostSearchTerm
+
+        terms = tokenize(query)
+        if not terms:
+            return queryset.none().annotate(search_rank=Value(None, output_field=FloatField()))
+        # Every query term must match (prefix match, so partial words still
+        # find posts); the rank sums the weights of all matching terms.
+        for term in terms:
+            queryset = queryset.filter(
+                pk__in=PostSearchTerm.objects.filter(term__startswith=term).values('post_id')
+            )
+        any_term = Q()
+        for term in terms:
+            any_term |= Q(term__startswith=term)
+        rank = (
+            PostSearchTerm.objects.filter(any_term, post=OuterRef('pk'))
+            .values('post')
+            .annotate(score=Sum('weight'))
+            .values('score')
+        )
+        return queryset.annotate(search_rank=Subquery(rank, output_field=FloatField()))
+
+
+class PostgresSearchBackend:
+    CONFIG = 'english'
+
+    def index_posts(self, post_ids):
+        from .models import Post, PostTag, Tag
+
+        post_table = Post._meta.db_table
+        sql = f"""
+            UPDATE {post_table} p SET search_vector =
+                setweight(to_tsvector(%(config)s::regconfig, coalesce(p.title, '')), 'A') ||
+                setweight(to_tsvector(%(config)s::regconfig, coalesce((
+                    SELECT string_agg(t.name, ' ')
+                    FROM {Tag._meta.db_table} t
+                    JOIN {PostTag._meta.db_table} pt ON pt.tag_id = t.id
+                    WHERE pt.post_id = p.id
+                ), '')), 'B') ||
+                setweight(to_tsvector(%(config)s::regconfig, coalesce(p.excerpt, '')), 'C') ||
+                setweight(to_tsvector(%(config)s::regconfig, coalesce(p.content, '')), 'D')
+            WHERE p.id = ANY(%(ids)s::uuid[])
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {'config': self.CONFIG, 'ids': [str(pk) for pk in post_ids]})
+
+    def search(self, queryset, query):
+        table = queryset.model._meta.db_table
+        tsquery = f"websearch_to_tsquery('{self.CONFIG}', %s)"
+        return queryset.alias(
+            search_match=RawSQL(f"{table}.search_vector @@ {tsquery}", [query], output_field=BooleanField()),
+        ).filter(search_match=True).annotate(
+            search_rank=RawSQL(f"ts_rank_cd({table}.search_vector, {tsquery})", [query], output_field=FloatField()),
+        )
+
+
+def get_search_backend():
+    name = getattr(settings, 'POST_SEARCH_BACKEND', 'auto')
+    if name == 'postgres' or (name == 'auto' and connection.vendor == 'postgresql'):
+        return PostgresSearchBackend()
+    return InvertedIndexSearchBackend()
+
+
+def index_posts(post_ids):
+    post_ids = list(post_ids)
+    if post_ids:
+        get_search_backend().index_posts(post_ids)
+
+
+def search_posts(queryset, query):
+    """Filter `queryset` to posts matching `query`, best match first."""
+    ordering = queryset.query.order_by or ('-published_at',)
+    ranked = get_search_backend().search(queryset, query)
+    return ranked.order_by(F('search_rank').desc(nulls_last=True), *ordering)
+
+
+class PostSearchFilter(filters.BaseFilterBackend):
+    """Drop-in for SearchFilter on PostViewSet that uses the search index.
+
+    Place it after OrderingFilter: the requested ordering becomes the
+    tie-breaker behind relevance.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return search_posts(queryset, query)
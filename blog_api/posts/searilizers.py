@@ -3,6 +3,11 @@ from .models import Post, Tag, Comment
 from django.contrib.auth.models import User
 from rest_framework import serializers
 from .models import Profile
+from .models import GenerationJob
+from django.urls import reverse
+from .bulk import BulkListSerializer, BulkPrimaryKeyRelatedField
+from .instrumentation import TimedDataMixin
+from .sparse import SparseFieldsMixin
 # Nested serializer for author
 class AuthorSerializer(serializers.ModelSerializer):
     class Meta:
@@ -10,19 +15,23 @@ class AuthorSerializer(serializers.ModelSerializer):
         fields = ('id', 'username')
 
 # Tag serializer
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedDataMixin, serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ('id', 'name', 'slug')
+        list_serializer_class = BulkListSerializer
 
 # Comment serializer
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(TimedDataMixin, SparseFieldsMixin, serializers.ModelSerializer):
     author = AuthorSerializer(read_only=True)
+    post = BulkPrimaryKeyRelatedField(queryset=Post.objects.all())
 
     class Meta:
         model = Comment
         fields = ('id', 'post', 'author', 'content', 'created_at', 'approved')
         read_only_fields = ('author', 'approved', 'created_at')
+        list_serializer_class = BulkListSerializer
+        expandable_fields = ('author',)
 
     def create(self, validated_data):
         # Automatically assign the currently logged-in user as author
@@ -32,31 +41,58 @@ class CommentSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 # Post serializer with image upload support
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(TimedDataMixin, SparseFieldsMixin, serializers.ModelSerializer):
     author = AuthorSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     comments = CommentSerializer(many=True, read_only=True)
     image = serializers.ImageField(required=False, allow_null=True)  # support optional image
+    # Writes set tags by slug; reads get the nested `tags`
+    tag_slugs = serializers.ListField(child=serializers.SlugField(), write_only=True, required=False)
+    thumbnail_url = serializers.ReadOnlyField()
 
     class Meta:
         model = Post
         fields = (
             'id', 'author', 'title', 'slug', 'content', 'excerpt',
             'status', 'published_at', 'created_at', 'updated_at',
-            'tags', 'comments', 'image'
+            'tags', 'comments', 'image', 'thumbnail_url', 'tag_slugs'
         )
         read_only_fields = ('author', 'comments', 'created_at', 'updated_at','click_count')
+        list_serializer_class = BulkListSerializer
+        # ?fields= / ?expand= (posts/sparse.py)
+        expandable_fields = ('author', 'tags', 'comments')
+        # What /api/posts/ returns without ?fields=: enough for a card
+        list_fields = ('id', 'author', 'title', 'slug', 'excerpt', 'status', 'published_at', 'thumbnail_url')
+        field_sources = {'image': ('image',), 'thumbnail_url': ('image', 'image_variants')}
+
+    def validate_tag_slugs(self, slugs):
+        # Bulk requests resolve every item's tags up front (PostViewSet.get_serializer_context)
+        known = self.context.get('tags_by_slug')
+        if known is None:
+            known = Tag.objects.in_bulk(slugs, field_name='slug')
+        missing = [slug for slug in slugs if slug not in known]
+        if missing:
+            raise serializers.ValidationError(f"Unknown tags: {', '.join(missing)}")
+        return [known[slug] for slug in dict.fromkeys(slugs)]
 
     def create(self, validated_data):
         validated_data['author'] = self.context['request'].user
-        return super().create(validated_data)
+        tags = validated_data.pop('tag_slugs', None)
+        instance = super().create(validated_data)
+        if tags is not None:
+            instance.tags.set(tags)
+        return instance
 
     def update(self, instance, validated_data):
         # Allow image to be updated
         image = validated_data.get('image', None)
         if image is not None:
             instance.image = image
-        return super().update(instance, validated_data)
+        tags = validated_data.pop('tag_slugs', None)
+        instance = super().update(instance, validated_data)
+        if tags is not None:
+            instance.tags.set(tags)
+        return instance
     image = serializers.SerializerMethodField()
     def get_image(self, obj):
         if obj.image:
@@ -70,3 +106,19 @@ class ProfileSerializer(serializers.ModelSerializer):
         fields = ['id', 'full_name', 'username', 'email']
         read_only_fields = ['id']
 
+
+
+class GenerationJobSerializer(serializers.ModelSerializer):
+    post_slug = serializers.SlugRelatedField(source='post', slug_field='slug', read_only=True)
+    status_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = GenerationJob
+        fields = ['id', 'status', 'prompt', 'post_status', 'attempts', 'error',
+                  'post', 'post_slug', 'status_url', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+    def get_status_url(self, obj):
+        url = reverse('generate-blog-status', kwargs={'job_id': obj.pk})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
@@ -0,0 +1,135 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Comment, Post, PostTag, Tag
+from .page_cache import bump
+from .search import index_posts
+
+# Fields that feed the search index; saves touching only other fields
+# (e.g. update_fields=['click_count']) don't need a reindex.
+SEARCH_FIELDS = {'title', 'content', 'excerpt'}
+
+
+def _reindex_on_commit(post_ids):
+    post_ids = set(post_ids)
+    if post_ids:
+        transaction.on_commit(lambda: index_posts(post_ids))
+
+
+@receiver(post_save, sender=Post)
+def reindex_post(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not SEARCH_FIELDS & set(update_fields):
+        return
+    _reindex_on_commit([instance.pk])
+
+
+def _changed_post_ids(instance, action, pk_set):
+    # tag.post_set.clear() sends no pk_set; the posts are read on pre_clear
+    if action == 'post_clear':
+        return getattr(instance, '_cleared_post_ids', [])
+    return pk_set or []
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def remember_cleared_posts(sender, instance, action, reverse, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._cleared_post_ids = list(PostTag.objects.filter(tag=instance).values_list('post_id', flat=True))
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def reindex_post_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # tag.post_set.add(...): instance is the Tag, pk_set the posts
+        _reindex_on_commit(_changed_post_ids(instance, action, pk_set))
+    else:
+        _reindex_on_commit([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=PostTag)
+def reindex_post_tag_row(sender, instance, **kwargs):
+    _reindex_on_commit([instance.post_id])
+
+
+@receiver(post_save, sender=Tag)
+def reindex_tagged_posts(sender, instance, created, **kwargs):
+    if not created:
+        _reindex_on_commit(PostTag.objects.filter(tag=instance).values_list('post_id', flat=True))
+
+
+# --- Page/fragment cache invalidation (posts/page_cache.py) ---
+
+def _bump_on_commit(*scopes):
+    # Scopes are worked out now, while the rows are still there, but bumped
+    # only once the write is visible: bumping inside the transaction lets a
+    # concurrent reader cache the old rows under the new version.
+    transaction.on_commit(lambda: bump(*scopes))
+
+
+@receiver([post_save, post_delete], sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and set(update_fields) <= {'click_count', 'image_hash', 'image_variants'}:
+        return
+    slugs = {instance.slug, getattr(instance, '_loaded_slug', None)} - {None}
+    _bump_on_commit('list', f'post:{instance.pk}', *(f'page:{slug}' for slug in slugs))
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    _bump_on_commit('comments', f'comments:{instance.post_id}', *_page_scopes([instance.post_id]))
+
+
+def _page_scopes(post_ids):
+    slugs = Post.objects.filter(pk__in=list(post_ids)).values_list('slug', flat=True)
+    return [f'page:{slug}' for slug in slugs]
+
+
+@receiver([post_save, post_delete], sender=PostTag)
+def invalidate_post_tag_pages(sender, instance, **kwargs):
+    _bump_on_commit('list', f'post:{instance.post_id}', *_page_scopes([instance.post_id]))
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_tagged_pages(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        post_ids = _changed_post_ids(instance, action, pk_set)
+        _bump_on_commit('list', *(f'post:{pk}' for pk in post_ids), *_page_scopes(post_ids))
+    else:
+        _bump_on_commit('list', f'post:{instance.pk}', f'page:{instance.slug}')
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_tag_pages(sender, instance, **kwargs):
+    post_ids = list(PostTag.objects.filter(tag=instance).values_list('post_id', flat=True))
+    _bump_on_commit('list', 'tags', *(f'post:{pk}' for pk in post_ids), *_page_scopes(post_ids))
+
+
+def bulk_written(model, objects):
+    """Do what the post_save receivers above would have done for `objects`.
+
+    bulk_create() and bulk_update() send no signals (see posts/bulk.py).
+    Like them, reindexing and version bumps wait for the batch to commit.
+    """
+    objects = list(objects)
+    if not objects:
+        return
+    if model is Post:
+        _reindex_on_commit(obj.pk for obj in objects)
+        slugs = {slug for obj in objects for slug in (obj.slug, getattr(obj, '_loaded_slug', None)) if slug}
+        _bump_on_commit('list', *(f'post:{obj.pk}' for obj in objects), *(f'page:{slug}' for slug in slugs))
+    elif model is Comment:
+        post_ids = {obj.post_id for obj in objects}
+        _bump_on_commit('comments', *(f'comments:{pk}' for pk in post_ids), *_page_scopes(post_ids))
+    elif model is Tag:
+        post_ids = set(PostTag.objects.filter(tag__in=objects).values_list('post_id', flat=True))
+        _reindex_on_commit(post_ids)
+        _bump_on_commit('list', 'tags', *(f'post:{pk}' for pk in post_ids), *_page_scopes(post_ids))
+    elif model is PostTag:
+        post_ids = {obj.post_id for obj in objects}
+        _reindex_on_commit(post_ids)
+        _bump_on_commit('list', *(f'post:{pk}' for pk in post_ids), *_page_scopes(post_ids))
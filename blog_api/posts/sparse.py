@@ -0,0 +1,158 @@
+"""Sparse fieldsets (``?fields=``) and on-demand expansion (``?expand=``).
+
+Both parameters take comma-separated names; dotted names reach into nested
+serializers, e.g. ``?expand=comments,comments.author&fields=id,title,comments``.
+
+* ``fields`` limits the output to the named fields (default: all of them, or
+  the serializer's ``Meta.list_fields`` on list endpoints).
+* ``expand`` nests the named relations from ``Meta.expandable_fields``.
+  Unexpanded foreign keys render as their id; unexpanded to-many relations
+  are left out.
+
+The viewset side trims the SQL to match: only() the columns the selected
+fields read, and select/prefetch only the expanded relations. Requests
+without either parameter on a detail endpoint keep the full representation.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+def parse_names(value):
+    """'a, b,c.d' -> {'a', 'b', 'c.d'}"""
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+class FieldSelection:
+    """The parsed ?fields= / ?expand= for one serializer level."""
+
+    def __init__(self, fields=None, expand=()):
+        self.fields = None if fields is None else set(fields)
+        self.expand = set(expand)
+
+    def nested(self, name):
+        """Selection for the serializer nested under `name`."""
+        prefix = f'{name}.'
+        fields = None
+        if self.fields is not None:
+            fields = {f[len(prefix):] for f in self.fields if f.startswith(prefix)} or None
+        return FieldSelection(fields, {e[len(prefix):] for e in self.expand if e.startswith(prefix)})
+
+    def expands(self, name):
+        return name in self.expand
+
+    def top_level(self, names):
+        return {name.split('.', 1)[0] for name in names}
+
+
+class SparseFieldsMixin:
+    """Serializer mixin that honours a FieldSelection in context['sparse'].
+
+    Without one in the context the serializer behaves as before, so bulk
+    writes, the form views and direct use in code are unaffected.
+
+    Meta options:
+        expandable_fields -- relations nested only when expanded
+        list_fields       -- default fields for list endpoints
+        field_sources     -- model columns read by fields that aren't model
+                             fields themselves (properties, method fields)
+    """
+
+    def _selection(self):
+        selection = self.context.get('sparse')
+        if selection is None:
+            return None
+        # Walk up to the root, collecting the names this serializer is nested under
+        path, node = [], self
+        while node.parent is not None:
+            if node.field_name:
+                path.append(node.field_name)
+            node = node.parent
+        for name in reversed(path):
+            selection = selection.nested(name)
+        return selection
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = self._selection()
+        if selection is None:
+            return fields
+        expandable = set(getattr(self.Meta, 'expandable_fields', ()))
+        requested = selection.top_level(selection.fields) if selection.fields is not None else set(fields)
+        expanded = selection.top_level(selection.expand)
+        unknown = (requested | expanded) - set(fields)
+        if unknown or expanded - expandable:
+            raise ValidationError({
+                'fields': [f"Unknown field: {name}" for name in sorted(unknown)]
+                + [f"Not expandable: {name}" for name in sorted((expanded - expandable) - unknown)],
+            })
+
+        selected = {}
+        for name, field in fields.items():
+            if name not in requested | expanded:
+                continue
+            if name in expandable and name not in expanded:
+                if getattr(field, 'many', False):
+                    continue
+                field = serializers.PrimaryKeyRelatedField(source=field.source, read_only=True)
+            selected[name] = field
+        return selected
+
+    @classmethod
+    def sparse_columns(cls, selection, prefix=''):
+        """Model fields to pass to only() for `selection` (to-many relations excluded)."""
+        serializer = cls(context={'sparse': selection})
+        model = cls.Meta.model
+        extra = getattr(cls.Meta, 'field_sources', {})
+        columns = {prefix + model._meta.pk.name}
+        for name, field in serializer.fields.items():
+            if name in extra:
+                columns.update(prefix + source for source in extra[name])
+                continue
+            if field.write_only or field.source == '*':
+                continue
+            try:
+                model_field = model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                continue
+            if model_field.many_to_many or model_field.one_to_many:
+                continue
+            columns.add(prefix + model_field.name)
+            if model_field.is_relation and isinstance(field, serializers.ModelSerializer):
+                nested = field.sparse_columns(selection.nested(name)) if isinstance(field, SparseFieldsMixin) else {
+                    model_field.related_model._meta.pk.name,
+                    *(f.source for f in field.fields.values() if f.source != '*'),
+                }
+                columns.update(f'{prefix}{model_field.name}__{column}' for column in nested)
+        return columns
+
+
+class SparseFieldsViewMixin:
+    """Viewset side: read ?fields= / ?expand= into context['sparse'] for list and retrieve."""
+
+    def get_field_selection(self):
+        if self.action not in ('list', 'retrieve'):
+            return None
+        if not hasattr(self, '_field_selection'):
+            params = self.request.query_params
+            fields = parse_names(params.get('fields')) or None
+            expand = parse_names(params.get('expand'))
+            list_fields = getattr(self.get_serializer_class().Meta, 'list_fields', None)
+            if fields is None and self.action == 'list' and list_fields:
+                fields = set(list_fields)
+            # No parameters on a detail endpoint: the full, fully nested representation
+            self._field_selection = FieldSelection(fields, expand) if fields is not None or expand else None
+        return self._field_selection
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        selection = self.get_field_selection()
+        if selection is not None:
+            context['sparse'] = selection
+        return context
+
+    def sparse_only(self, queryset, selection, ordering=()):
+        """queryset.only() the columns `selection` shows, plus those `ordering` needs."""
+        columns = self.get_serializer_class().sparse_columns(selection)
+        columns.update(name.lstrip('-') for name in ordering)
+        return queryset.only(*columns)
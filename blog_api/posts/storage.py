@@ -0,0 +1,77 @@
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
+
+
+class CachedMetadataMixin:
+    """Cache exists()/size()/url() lookups of a storage backend in the Django cache.
+
+    post_detail checks `storage.exists()` on every view, which is a stat for
+    local files and a network round trip for remote backends. Results are
+    cached for MEDIA_METADATA_CACHE_TTL seconds, primed when a file is saved
+    and dropped when it is deleted, so hot pages don't touch storage at all.
+    Keep the TTL below the expiry of any signed URLs the backend returns.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._local = threading.local()
+
+    @property
+    def metadata_cache_timeout(self):
+        return getattr(settings, 'MEDIA_METADATA_CACHE_TTL', 300)
+
+    def _meta_key(self, kind, name):
+        scope = f"{type(self).__name__}:{getattr(self, 'location', '')}:{name}"
+        return f"storage-meta:{kind}:{hashlib.md5(scope.encode()).hexdigest()}"
+
+    def _cached(self, kind, name, compute):
+        key = self._meta_key(kind, name)
+        value = cache.get(key)
+        if value is None:
+            value = compute()
+            cache.set(key, value, self.metadata_cache_timeout)
+        return value
+
+    def invalidate_metadata(self, name):
+        cache.delete_many([self._meta_key(kind, name) for kind in ('exists', 'size', 'url')])
+
+    def exists(self, name):
+        # get_available_name() needs the real answer to avoid name collisions
+        if getattr(self._local, 'bypass', False):
+            return super().exists(name)
+        return self._cached('exists', name, lambda: super(CachedMetadataMixin, self).exists(name))
+
+    def size(self, name):
+        return self._cached('size', name, lambda: super(CachedMetadataMixin, self).size(name))
+
+    def url(self, name):
+        return self._cached('url', name, lambda: super(CachedMetadataMixin, self).url(name))
+
+    def get_available_name(self, name, max_length=None):
+        self._local.bypass = True
+        try:
+            return super().get_available_name(name, max_length=max_length)
+        finally:
+            self._local.bypass = False
+
+    def save(self, name, content, max_length=None):
+        name = super().save(name, content, max_length=max_length)
+        self.invalidate_metadata(name)
+        cache.set(self._meta_key('exists', name), True, self.metadata_cache_timeout)
+        size = getattr(content, 'size', None)
+        if size is not None:
+            cache.set(self._meta_key('size', name), size, self.metadata_cache_timeout)
+        return name
+
+    def delete(self, name):
+        super().delete(name)
+        self.invalidate_metadata(name)
+        cache.set(self._meta_key('exists', name), False, self.metadata_cache_timeout)
+
+
+class CachedFileSystemStorage(CachedMetadataMixin, FileSystemStorage):
+    pass
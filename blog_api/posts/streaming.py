@@ -0,0 +1,50 @@
+"""Server-Sent Events stream for AI post generation.
+
+Served by an async view, so under ASGI (blog_api/asgi.py) the request waits
+on the LLM in the event loop instead of holding a sync worker thread. Events:
+
+* ``start``  - sent immediately so the browser gets its first byte at once
+* ``delta``  - ``{"field": "title"|"content"|"excerpt", "text": "..."}``
+* ``done``   - ``{"slug": ..., "url": ...}`` once the Post is saved
+* ``error``  - ``{"error": "..."}``; nothing is saved
+"""
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.urls import reverse
+
+from .ai import StreamingFieldParser, create_generated_post
+from .llm_cache import astream_completion
+
+logger = logging.getLogger(__name__)
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_generated_post(user, prompt, post_status="published"):
+    yield sse("start", {"prompt": prompt})
+
+    parser = StreamingFieldParser()
+    chunks = []
+    try:
+        async for chunk in astream_completion(prompt, timeout=getattr(settings, 'AI_JOB_TIMEOUT', 60)):
+            chunks.append(chunk)
+            for field, text in parser.feed(chunk):
+                yield sse("delta", {"field": field, "text": text})
+    except Exception as e:
+        logger.warning("Streaming AI generation failed: %s", e)
+        yield sse("error", {"error": str(e)})
+        return
+
+    try:
+        post = await sync_to_async(create_generated_post)(user, prompt, ''.join(chunks), post_status)
+    except Exception:
+        # e.g. an IntegrityError from a concurrent post taking the slug
+        logger.exception("Saving the streamed AI post failed")
+        yield sse("error", {"error": "The generated post could not be saved."})
+        return
+    yield sse("done", {"slug": post.slug, "url": reverse("post_detail", kwargs={"slug": post.slug})})
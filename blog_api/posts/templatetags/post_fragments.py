@@ -0,0 +1,44 @@
+from django import template
+
+from posts.page_cache import get_or_render_fragment
+
+register = template.Library()
+
+# Which version stamps each fragment depends on (see posts/page_cache.py)
+FRAGMENT_SCOPES = {
+    'body': lambda post: [f'post:{post.pk}'],
+    'tags': lambda post: [f'post:{post.pk}'],
+    'comments': lambda post: [f'comments:{post.pk}'],
+}
+
+
+class CacheFragmentNode(template.Node):
+    def __init__(self, nodelist, name, post):
+        self.nodelist = nodelist
+        self.name = name
+        self.post = post
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        post = self.post.resolve(context)
+        return get_or_render_fragment(
+            name, FRAGMENT_SCOPES[name](post), [post.pk], lambda: self.nodelist.render(context)
+        )
+
+
+@register.tag
+def cachefragment(parser, token):
+    """Cache a per-post block until the post (or its comments) change.
+
+    Usage::
+
+        {% cachefragment "comments" post %} ... {% endcachefragment %}
+
+    Only put content that is the same for every visitor inside the block.
+    """
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes a fragment name and a post")
+    nodelist = parser.parse(('endcachefragment',))
+    parser.delete_first_token()
+    return CacheFragmentNode(nodelist, parser.compile_filter(bits[1]), parser.compile_filter(bits[2]))
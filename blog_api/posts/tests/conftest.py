@@ -0,0 +1,87 @@
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+from django.core.cache import cache
+
+# Micro-benchmarks (test_query_budgets.py, test_serializer_benchmarks.py) write
+# what they measure here as JSON, for tracking over time.
+BENCH_RESULTS = Path(os.getenv('BENCH_RESULTS', Path(__file__).parent / '.benchmarks' / 'latest.json'))
+
+
+def pytest_configure(config):
+    # A cache directory of our own: clear_cache() would otherwise wipe the one a
+    # dev server on this machine uses. The environment variable reaches the
+    # processes tests start.
+    from django.conf import settings
+
+    config.cache_dir = os.environ['CACHE_DIR'] = tempfile.mkdtemp(prefix='blog_api_test_cache')
+    if not settings.REDIS_URL:
+        settings.CACHES['shared']['LOCATION'] = config.cache_dir
+
+
+def pytest_unconfigure(config):
+    if getattr(config, 'cache_dir', None):
+        shutil.rmtree(config.cache_dir, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def sync_view_counter(settings):
+    # Write view counts straight through so tests can assert on click_count.
+    settings.VIEW_COUNTER_MODE = 'sync'
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Throttle counters and cached identities live in the cache; don't leak them between tests.
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def offline_ai(settings):
+    # Never call a real LLM from tests; run generation jobs inline after commit.
+    settings.AI_LLM_BACKEND = 'posts.ai.StubLLMBackend'
+    settings.AI_JOB_MODE = 'sync'
+    settings.AI_JOB_RETRY_BACKOFF = 0
+
+
+@pytest.fixture
+def seed_posts(db):
+    """seed_posts(n_posts, n_comments): published posts by `author{n_posts}`, one shared tag."""
+    from django.contrib.auth.models import User
+
+    from posts.models import Comment, Post, Tag
+
+    def seed(n_posts, n_comments):
+        user = User.objects.create_user(username=f'author{n_posts}', password='1234')
+        tag = Tag.objects.create(name=f'tag{n_posts}', slug=f'tag{n_posts}')
+        for i in range(n_posts):
+            post = Post.objects.create(
+                title=f'P{i}', slug=f'p{n_posts}-{i}', content='x', author=user, status='published',
+            )
+            post.tags.add(tag)
+            for _ in range(n_comments):
+                Comment.objects.create(post=post, author=user, content='c')
+        return user
+    return seed
+
+
+@pytest.fixture(scope='session')
+def bench_results():
+    """{'queries': {case: count}, 'serializers': {case: {...}}}, saved at the end of the run."""
+    results = {'queries': {}, 'serializers': {}}
+    yield results
+    if any(results.values()):
+        BENCH_RESULTS.parent.mkdir(parents=True, exist_ok=True)
+        BENCH_RESULTS.write_text(json.dumps({
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            **results,
+        }, indent=2, sort_keys=True) + '\n')
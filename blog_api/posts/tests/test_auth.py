@@ -0,0 +1,133 @@
+import json
+import threading
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from posts.auth import SupabaseJWTAuthentication
+from posts.jwks import JWKSCache, get_jwks_cache, get_token_cache
+
+
+@pytest.fixture
+def signing_key(tmp_path):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update({'kid': 'test-kid', 'use': 'sig', 'alg': 'RS256'})
+    jwks_file = tmp_path / 'jwks.json'
+    jwks_file.write_text(json.dumps({'keys': [jwk]}))
+    with override_settings(SUPABASE_JWKS_URL=str(jwks_file), SUPABASE_JWKS_REFRESH_SECONDS=0):
+        yield private_key
+
+
+def make_token(private_key, **claims):
+    payload = {'sub': 'supabase-user-1', 'email': 'a@test.com', 'exp': int(time.time()) + 60}
+    payload.update(claims)
+    return jwt.encode(payload, private_key, algorithm='RS256', headers={'kid': 'test-kid'})
+
+
+@pytest.mark.django_db
+def test_authenticate_with_local_jwks(signing_key):
+    token = make_token(signing_key)
+    request = APIRequestFactory().get('/api/me/', HTTP_AUTHORIZATION=f'Bearer {token}')
+    user, auth_token = SupabaseJWTAuthentication().authenticate(request)
+    assert user.username == 'a@test.com'
+    assert auth_token == token
+
+
+def test_verified_token_is_cached(signing_key, monkeypatch):
+    token = make_token(signing_key)
+    auth = SupabaseJWTAuthentication()
+    assert auth.decode_token(token)['sub'] == 'supabase-user-1'
+
+    # A cached token must not touch the key source or re-verify the signature.
+    monkeypatch.setattr(get_jwks_cache(), 'get_signing_key_from_jwt', None)
+    monkeypatch.setattr(jwt, 'decode', None)
+    assert auth.decode_token(token)['sub'] == 'supabase-user-1'
+
+
+def test_cold_cache_fetches_once_for_concurrent_requests(signing_key, monkeypatch):
+    jwks = JWKSCache(get_jwks_cache().source, refresh_interval=3600)
+    load, loads = jwks._load, []
+
+    def slow_load():
+        loads.append(1)
+        time.sleep(0.05)
+        return load()
+
+    monkeypatch.setattr(jwks, '_load', slow_load)
+    started = threading.Event()
+    monkeypatch.setattr(jwks, '_refresh_loop', started.wait)
+    threads = [threading.Thread(target=jwks.get_signing_key, args=('test-kid',)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    started.set()
+    assert len(loads) == 1
+    assert [t.name for t in threading.enumerate()].count('jwks-refresh') == 1
+
+
+def test_unknown_kid_is_rejected(signing_key):
+    token = jwt.encode({'sub': 'x'}, signing_key, algorithm='RS256', headers={'kid': 'other'})
+    with pytest.raises(jwt.InvalidTokenError):
+        SupabaseJWTAuthentication().decode_token(token)
+    assert get_token_cache().get(token) is None
+
+
+@pytest.mark.django_db
+def test_returning_user_costs_one_read_and_no_writes(signing_key, django_assert_num_queries):
+    token = make_token(signing_key)
+    auth = SupabaseJWTAuthentication()
+    factory = APIRequestFactory()
+    first_user, _ = auth.authenticate(factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+
+    with django_assert_num_queries(1):
+        user, _ = auth.authenticate(factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+        assert user.profile.auth_id == 'supabase-user-1'
+    assert user.pk == first_user.pk
+
+
+@pytest.mark.django_db
+def test_email_change_updates_existing_user(signing_key):
+    auth = SupabaseJWTAuthentication()
+    factory = APIRequestFactory()
+    token = make_token(signing_key)
+    user, _ = auth.authenticate(factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+
+    token = make_token(signing_key, email='new@test.com')
+    same_user, _ = auth.authenticate(factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+    assert same_user.pk == user.pk
+    same_user.refresh_from_db()
+    assert same_user.email == 'new@test.com'
+    assert same_user.profile.email == 'new@test.com'
+
+
+@pytest.mark.django_db
+def test_async_profile_get_skips_thread_hops_for_returning_user(signing_key, monkeypatch):
+    from django.test import Client
+    import posts.auth
+    import posts.identity
+
+    client = Client(HTTP_AUTHORIZATION=f'Bearer {make_token(signing_key)}')
+    assert client.get('/api/me/').json()['email'] == 'a@test.com'
+
+    def no_hop(func):
+        raise AssertionError(f'{func.__name__} left the event loop')
+    monkeypatch.setattr(posts.auth, 'sync_to_async', no_hop)
+    monkeypatch.setattr(posts.identity, 'sync_to_async', no_hop)
+    response = client.get('/api/me/')
+    assert response.status_code == 200
+    assert response.json()['username'] == 'a@test.com'
+
+
+@pytest.mark.django_db
+def test_async_profile_get_rejects_bad_token():
+    from django.test import Client
+
+    response = Client(HTTP_AUTHORIZATION='Bearer not-a-jwt').get('/api/me/')
+    assert response.status_code == 401
+    assert response['WWW-Authenticate'] == 'Bearer realm="api"'
@@ -0,0 +1,121 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from posts.models import Comment, Post, PostTag, Tag
+from posts.page_cache import get_versions
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(username='alaska', password='alaska')
+
+
+@pytest.mark.django_db
+def test_bulk_create_posts_with_tags_reports_each_item(client, user):
+    Tag.objects.create(name='Django', slug='django')
+    Tag.objects.create(name='Python', slug='python')
+    client.force_authenticate(user=user)
+    response = client.post('/api/posts/bulk/', [
+        {'title': 'One', 'slug': 'one', 'content': 'a', 'status': 'published', 'tag_slugs': ['django', 'python']},
+        {'title': 'Two', 'slug': 'two', 'content': 'b', 'tag_slugs': ['missing']},
+        {'title': 'Three', 'content': 'c'},
+    ], format='json')
+    assert response.status_code == 207
+    results = response.data['results']
+    assert [r['status'] for r in results] == [201, 400, 201]
+    assert 'tag_slugs' in results[1]['errors']
+    assert sorted(t['slug'] for t in results[0]['data']['tags']) == ['django', 'python']
+    assert Post.objects.get(slug='three').author == user
+    assert not Post.objects.filter(slug='two').exists()
+    assert PostTag.objects.filter(post__slug='one').count() == 2
+
+
+@pytest.mark.django_db
+def test_bulk_writes_bump_versions_after_commit(client, user, django_capture_on_commit_callbacks):
+    client.force_authenticate(user=user)
+    before = get_versions('list')
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post('/api/posts/bulk/', [{'title': 'One', 'content': 'a'}], format='json')
+        assert response.status_code == 201
+        assert get_versions('list') == before
+    assert get_versions('list') != before
+
+
+@pytest.mark.django_db
+def test_bulk_update_checks_each_object(client, user):
+    other = User.objects.create_user(username='other', password='other')
+    mine = Post.objects.create(title='Mine', slug='mine', content='x', author=user)
+    Post.objects.create(title='Theirs', slug='theirs', content='x', author=other)
+    client.force_authenticate(user=user)
+    response = client.patch('/api/posts/bulk/', [
+        {'slug': 'mine', 'status': 'published'},
+        {'slug': 'theirs', 'title': 'Hijacked'},
+        {'slug': 'nope', 'title': 'Ghost'},
+    ], format='json')
+    assert [r['status'] for r in response.data['results']] == [200, 403, 404]
+    mine.refresh_from_db()
+    assert mine.status == 'published' and mine.published_at is not None
+    assert Post.objects.get(slug='theirs').title == 'Theirs'
+
+
+@pytest.mark.django_db
+def test_bulk_comments_use_constant_queries(client, user):
+    Post.objects.create(title='P0', slug='p0', content='x', author=user)
+    client.force_authenticate(user=user)
+
+    def create(count):
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.post('/api/posts/p0/comments/bulk/', [
+                {'content': f'c{i}'} for i in range(count)
+            ], format='json')
+        assert response.status_code == 201
+        return len(ctx.captured_queries)
+
+    assert create(2) == create(20)
+    assert Comment.objects.filter(author=user, approved=True).count() == 22
+
+
+@pytest.mark.django_db
+def test_nested_bulk_comments_take_post_from_url(client, user):
+    post = Post.objects.create(title='P', slug='p', content='x', author=user)
+    client.force_authenticate(user=user)
+    response = client.post('/api/posts/p/comments/bulk/', [{'content': 'one'}, {'content': ''}], format='json')
+    assert [r['status'] for r in response.data['results']] == [201, 400]
+    assert list(post.comments.values_list('content', flat=True)) == ['one']
+
+
+@pytest.mark.django_db
+def test_bulk_delete_comments_checks_each_author(client, user):
+    other = User.objects.create_user(username='other', password='other')
+    post = Post.objects.create(title='P', slug='p', content='x', author=user)
+    mine = Comment.objects.create(post=post, author=user, content='mine')
+    theirs = Comment.objects.create(post=post, author=other, content='theirs')
+    client.force_authenticate(user=user)
+    response = client.delete('/api/posts/p/comments/bulk/', [mine.pk, theirs.pk], format='json')
+    assert [r['status'] for r in response.data['results']] == [204, 403]
+    assert list(post.comments.values_list('content', flat=True)) == ['theirs']
+
+
+@pytest.mark.django_db
+def test_bulk_delete_tags(client, user):
+    tags = [Tag.objects.create(name=n, slug=n) for n in ('a', 'b')]
+    client.force_authenticate(user=user)
+    response = client.delete('/api/tags/bulk/', [tags[0].pk, {'id': tags[1].pk}], format='json')
+    assert response.status_code == 200
+    assert [r['status'] for r in response.data['results']] == [204, 204]
+    assert not Tag.objects.exists()
+
+
+@pytest.mark.django_db
+def test_bulk_rejects_non_list(client, user):
+    client.force_authenticate(user=user)
+    response = client.post('/api/tags/bulk/', {'name': 'x'}, format='json')
+    assert response.status_code == 400
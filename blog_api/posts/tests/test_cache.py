@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+from django.core.cache import cache, caches
+
+from posts.cache import StateFileBasedCache, TwoTierCache, fcntl, get_cache_stats
+
+
+def _worker(name, **options):
+    """A TwoTierCache with its own L1, as another process would have."""
+    return TwoTierCache(name, {'OPTIONS': {
+        'L2': 'shared', 'L1_SYNC_INTERVAL': 0, 'L1_EXCLUDE': ['count:'], **options,
+    }})
+
+
+def test_workers_share_l2_and_see_each_others_deletes():
+    a, b = _worker('worker-a'), _worker('worker-b')
+    a.set('greeting', {'text': 'hi'})
+    assert b.get('greeting') == {'text': 'hi'}  # from L2
+    assert b.get('greeting') == {'text': 'hi'}  # from L1
+    assert b._store.stats['l1']['hit'] == 1
+
+    a.delete('greeting')
+    assert b.get('greeting') is None
+
+
+def test_deletes_drop_only_the_deleted_keys_elsewhere():
+    a, b = _worker('worker-g'), _worker('worker-h')
+    a.set_many({'kept': 1, 'gone': 2})
+    assert b.get_many(['kept', 'gone']) == {'kept': 1, 'gone': 2}
+    a.delete('gone')
+    assert b.get('gone') is None
+    hits = b._store.stats['l1']['hit']
+    assert b.get('kept') == 1
+    assert b._store.stats['l1']['hit'] == hits + 1
+
+    a.clear()
+    assert b.get('kept') is None
+
+
+def test_culling_keeps_state_keys(tmp_path):
+    store = StateFileBasedCache(str(tmp_path), {'OPTIONS': {
+        'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2, 'KEEP_PREFIXES': ['count:'],
+    }})
+    store.set('count:views', 7, None)
+    store.set('count:gone', 1, -1)
+    for i in range(30):
+        store.set(f'page:{i}', 'html')
+    assert len(store._list_cache_files()) <= 10
+    assert store.get('count:views') == 7
+    assert len(store._list_kept_files()) == 2
+
+    store._max_entries, store._swept_at = 1, 0.0
+    store.set('page:last', 'html')
+    assert len(store._list_kept_files()) == 1  # the expired one was swept
+    store.clear()
+    assert store.get('count:views') is None
+
+
+def test_tests_use_their_own_cache_dir():
+    assert caches['shared']._dir.startswith(os.environ['CACHE_DIR'])
+    assert 'blog_api_test_cache' in caches['shared']._dir
+
+
+def test_excluded_keys_bypass_l1():
+    a, b = _worker('worker-c'), _worker('worker-d')
+    a.set('count:x', 1)
+    assert b.get('count:x') == 1
+    a.incr('count:x')
+    assert b.get('count:x') == 2
+
+
+def test_l1_entries_expire():
+    a, b = _worker('worker-e', L1_TIMEOUT=0.05), _worker('worker-f')
+    a.set('k', 'old')
+    assert a.get('k') == 'old'
+    b.set('k', 'new')  # an overwrite sends no invalidation
+    time.sleep(0.06)
+    assert a.get('k') == 'new'
+
+
+def test_get_or_set_is_single_flight_across_threads():
+    calls = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'value'
+
+    before = get_cache_stats()['single_flight']
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_set('hot', slow, 60))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ['value'] * 8
+    assert len(calls) == 1
+    after = get_cache_stats()['single_flight']
+    assert (after['computed'] - before['computed'], after['waited'] - before['waited']) == (1, 7)
+
+
+def test_get_or_set_waits_for_another_process():
+    shared = caches['shared']
+    shared.add('slow:single-flight', 1, 30)  # another worker is computing
+    threading.Timer(0.05, lambda: shared.set('slow', 'theirs')).start()
+    assert _worker('worker-g').get_or_set('slow', lambda: pytest.fail('recomputed'), 60) == 'theirs'
+
+
+def _incr_many(n):
+    counter = _worker('worker-incr')
+    for _ in range(n):
+        counter.incr('count:shared')
+
+
+@pytest.mark.skipif(fcntl is None, reason="needs flock()")
+def test_file_backed_increments_are_atomic_across_processes():
+    # FileBasedCache.incr() is a get and a set; without the lock processes lose increments
+    caches['shared'].set('count:shared', 0, None)
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_incr_many, args=(200,)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert caches['shared'].get('count:shared') == 800
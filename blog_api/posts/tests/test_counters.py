@@ -0,0 +1,68 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from posts import counters
+from posts.counters import flush_view_counts, record_view
+from posts.models import Post
+
+
+@pytest.fixture
+def post():
+    user = User.objects.create_user(username='alaska', password='1234')
+    return Post.objects.create(title='Counted', slug='counted', content='x', author=user, status='published')
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('mode', ['memory', 'cache'])
+def test_views_are_buffered_until_flush(settings, post, mode):
+    cache.clear()
+    settings.VIEW_COUNTER_MODE = mode
+    for _ in range(3):
+        record_view(post.pk)
+    post.refresh_from_db()
+    assert post.click_count == 0
+
+    assert flush_view_counts() == 3
+    post.refresh_from_db()
+    assert post.click_count == 3
+    assert flush_view_counts() == 0
+
+
+@pytest.fixture
+def other_post(post):
+    return Post.objects.create(title='Other', slug='other', content='x', author=post.author, status='published')
+
+
+@pytest.mark.django_db
+def test_cache_counter_keeps_views_recorded_during_a_flush(settings, monkeypatch, post, other_post):
+    settings.VIEW_COUNTER_MODE = 'cache'
+    record_view(post.pk)
+    apply = counters.apply_increments
+
+    def apply_while_viewed(increments):
+        # Another worker records views while this flush is between read and write
+        record_view(post.pk)
+        record_view(other_post.pk)
+        return apply(increments)
+
+    monkeypatch.setattr(counters, 'apply_increments', apply_while_viewed)
+    assert flush_view_counts() == 1
+    monkeypatch.undo()
+    assert flush_view_counts() == 2
+    post.refresh_from_db()
+    other_post.refresh_from_db()
+    assert (post.click_count, other_post.click_count) == (2, 1)
+
+
+@pytest.mark.django_db
+def test_cache_counter_rereads_slots_not_written_yet(settings, post):
+    settings.VIEW_COUNTER_MODE = 'cache'
+    # A worker took a slot but hasn't written its post id when the flush runs
+    slot = counters._incr(counters.SLOT_SEQ_KEY)
+    cache.set(counters._count_key(post.pk), 1, None)
+    assert flush_view_counts() == 0
+
+    cache.set(counters._slot_key(slot), str(post.pk), None)
+    assert flush_view_counts() == 1
+    post.refresh_from_db()
+    assert post.click_count == 1
@@ -0,0 +1,86 @@
+import pytest
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from posts import db_router
+from posts.models import Post
+
+# The rest of the suite only allows queries on 'default', so run this module
+# on its own with e.g. REPLICA_DATABASE_URL=sqlite:///replica.sqlite3
+has_replica = pytest.mark.skipif(
+    db_router.REPLICA not in settings.DATABASES, reason="set REPLICA_DATABASE_URL to run against a replica"
+)
+
+
+def test_router_reads_replica_only_when_allowed_and_not_pinned(monkeypatch):
+    monkeypatch.setitem(settings.DATABASES, db_router.REPLICA, {})
+    router = db_router.ReplicaRouter()
+    assert router.db_for_read(Post) == 'default'  # outside a request
+
+    token = db_router.begin_request(pinned=False)
+    try:
+        assert router.db_for_read(Post) == 'default'  # view didn't opt in
+        db_router._state.get().replica_ok = True
+        assert router.db_for_read(Post) == db_router.REPLICA
+        assert router.db_for_write(Post) == 'default'
+        assert router.db_for_read(Post) == 'default'  # read-your-writes
+    finally:
+        db_router.end_request(token)
+
+    token = db_router.begin_request(pinned=True)
+    db_router._state.get().replica_ok = True
+    assert router.db_for_read(Post) == 'default'
+    db_router.end_request(token)
+
+
+@pytest.mark.django_db
+def test_writes_pin_the_browser_to_the_primary():
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='alaska', password='1234'))
+    assert db_router.PIN_COOKIE not in client.get('/test/').cookies
+    response = client.post('/api/tags/', {'name': 'a', 'slug': 'a'}, format='json')
+    assert response.cookies[db_router.PIN_COOKIE]['max-age'] == settings.REPLICA_PIN_SECONDS
+
+
+@pytest.mark.django_db
+def test_writes_pin_token_clients_by_user(monkeypatch):
+    # Routing is faked below; the alias only needs settings that request handling can read
+    monkeypatch.setitem(settings.DATABASES, db_router.REPLICA, settings.DATABASES['default'])
+    reads = []
+
+    def db_for_read(self, model, **hints):
+        state = db_router._state.get()
+        reads.append(state.replica_ok and not state.pinned)
+        return 'default'
+
+    monkeypatch.setattr(db_router.ReplicaRouter, 'db_for_read', db_for_read)
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='alaska', password='1234'))
+    client.get('/api/posts/')
+    assert all(reads)
+
+    assert client.post('/api/tags/', {'name': 'a', 'slug': 'a'}, format='json').status_code == 201
+    client.cookies.clear()  # like a bearer-token client
+    reads.clear()
+    client.get('/api/posts/')
+    assert reads and not any(reads)
+
+
+@has_replica
+@pytest.mark.django_db(databases=['default', db_router.REPLICA])
+def test_read_views_use_the_replica():
+    client = APIClient()
+    with CaptureQueriesContext(connections['default']) as primary, \
+            CaptureQueriesContext(connections[db_router.REPLICA]) as replica:
+        assert client.get('/api/posts/').status_code == 200
+        assert client.get('/').status_code == 200
+    assert not primary.captured_queries
+    assert len(replica.captured_queries) >= 2
+
+    client.cookies[db_router.PIN_COOKIE] = '1'
+    with CaptureQueriesContext(connections[db_router.REPLICA]) as replica:
+        client.get('/api/posts/?fields=id')
+    assert not replica.captured_queries
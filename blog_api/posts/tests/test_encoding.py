@@ -0,0 +1,86 @@
+import gzip
+import json
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from posts.middleware import CompressionMiddleware, accepted_encodings
+from posts.models import Post
+from posts.renderers import ORJSONRenderer
+from posts.views import PostViewSet
+
+
+@pytest.fixture
+def posts():
+    user = User.objects.create_user(username='alaska', password='1234')
+    return [
+        Post.objects.create(title=f'Post {i}', slug=f'post-{i}', content='Lorem ipsum ' * 200,
+                            excerpt='Ünïcode excerpt  ', author=user, status='published')
+        for i in range(5)
+    ]
+
+
+def test_orjson_matches_drf_json():
+    data = {'title': 'Ünïcode  ', 'n': 1, 'nested': [{'a': None, 'b': 1.5}]}
+    assert json.loads(ORJSONRenderer().render(data)) == json.loads(JSONRenderer().render(data))
+    assert b'\\u2028' in ORJSONRenderer().render(data)
+
+
+@pytest.mark.django_db
+def test_api_responses_are_compressed_and_revalidate(posts, monkeypatch):
+    monkeypatch.setattr(PostViewSet, 'throttle_classes', [])
+    client = APIClient()
+    url = '/api/posts/?fields=id,title,content'
+    plain = client.get(url)
+    compressed = client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+    assert 'Content-Encoding' not in plain
+    assert compressed['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed['Vary']
+    assert json.loads(gzip.decompress(compressed.content)) == plain.json()
+
+    etag = compressed['ETag']
+    assert etag.startswith('W/"')
+    assert client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+
+def test_compression_skips_small_and_streaming_responses():
+    request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+    small = CompressionMiddleware(lambda r: HttpResponse('x' * 100))(request)
+    sse = CompressionMiddleware(
+        lambda r: StreamingHttpResponse(iter(['data: x\n\n' * 500]), content_type='text/event-stream')
+    )(request)
+    assert not small.has_header('Content-Encoding')
+    assert not sse.has_header('Content-Encoding')
+    assert accepted_encodings('gzip;q=0, br;q=0.5') == {'gzip': 0.0, 'br': 0.5}
+
+
+@pytest.mark.django_db
+def test_invalid_json_body_is_a_400(posts):
+    client = APIClient()
+    client.force_authenticate(user=posts[0].author)
+    response = client.post('/api/posts/', b'{"title": ', content_type='application/json')
+    assert response.status_code == 400
+    assert 'JSON parse error' in response.json()['detail']
+
+
+@pytest.mark.django_db
+def test_msgpack_round_trip(posts, monkeypatch):
+    msgpack = pytest.importorskip('msgpack')
+    monkeypatch.setattr(PostViewSet, 'throttle_classes', [])
+    response = APIClient().get('/api/posts/', HTTP_ACCEPT='application/msgpack')
+    assert response['Content-Type'] == 'application/msgpack'
+    assert len(msgpack.unpackb(response.content)['results']) == 5
+
+
+@pytest.mark.django_db
+def test_bench_encoding_command(posts):
+    out = StringIO()
+    call_command('bench_encoding', '--repeat', '2', stdout=out)
+    output = out.getvalue()
+    assert 'drf-json' in output and 'orjson' in output
@@ -0,0 +1,105 @@
+import io
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+from posts import images
+from posts.models import Post
+
+
+def make_upload(name='photo.png', size=(1000, 600)):
+    buf = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buf, 'PNG')
+    return SimpleUploadedFile(name, buf.getvalue(), content_type='image/png')
+
+
+@pytest.fixture
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    settings.IMAGE_PIPELINE_MODE = 'sync'
+    return tmp_path
+
+
+@pytest.mark.django_db
+def test_variants_are_rendered_after_commit(media, django_capture_on_commit_callbacks):
+    user = User.objects.create_user(username='alaska', password='1234')
+    with django_capture_on_commit_callbacks(execute=True):
+        post = Post.objects.create(title='Pic', slug='pic', content='x', author=user, image=make_upload())
+    post.refresh_from_db()
+    assert set(post.image_variants['jpeg']) == {'400', '800', '1000'}
+    assert set(post.image_variants['webp']) == {'400', '800', '1000'}
+    assert post.thumbnail_url.endswith('_400.jpg')
+    assert '1000w' in post.image_webp_srcset
+    assert (media / post.image_variants['thumbnail']).exists()
+
+
+@pytest.mark.django_db
+def test_thumbnail_falls_back_to_original_until_processed(media, django_capture_on_commit_callbacks):
+    user = User.objects.create_user(username='alaska', password='1234')
+    with django_capture_on_commit_callbacks():  # pipeline not run
+        post = Post.objects.create(title='Pic', slug='pic', content='x', author=user, image=make_upload())
+    assert post.thumbnail_url == post.image.url
+
+    # Saved through the storage so its cached exists() sees it
+    post.image.storage.save('posts/images/post_list_img/photo_thumb.jpg', ContentFile(b'jpeg'))
+    post.image.name = 'posts/images/photo.png'
+    assert post.thumbnail_url.endswith('post_list_img/photo_thumb.jpg')
+
+
+@pytest.mark.django_db
+def test_portrait_variants_are_as_wide_as_their_descriptor(media, django_capture_on_commit_callbacks):
+    user = User.objects.create_user(username='alaska', password='1234')
+    with django_capture_on_commit_callbacks(execute=True):
+        post = Post.objects.create(
+            title='Tall', slug='tall', content='x', author=user, image=make_upload(size=(1000, 2000)),
+        )
+    post.refresh_from_db()
+    for width, name in post.image_variants['jpeg'].items():
+        with Image.open(media / name) as variant:
+            assert variant.size == (int(width), int(width) * 2)
+
+
+@pytest.mark.django_db
+def test_processed_image_changes_detail_etag(media, client, django_capture_on_commit_callbacks):
+    user = User.objects.create_user(username='alaska', password='1234')
+    with django_capture_on_commit_callbacks():  # the pipeline runs below, after the first GET
+        post = Post.objects.create(
+            title='Pic', slug='pic', content='x', author=user, status='published', image=make_upload(),
+        )
+    etag = client.get('/api/posts/pic/')['ETag']
+    images.process_post_image(post.pk)
+    response = client.get('/api/posts/pic/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()['thumbnail_url'].endswith('_400.jpg')
+
+
+@pytest.mark.django_db
+def test_text_edits_do_not_reprocess_image(media, monkeypatch, django_capture_on_commit_callbacks):
+    user = User.objects.create_user(username='alaska', password='1234')
+    with django_capture_on_commit_callbacks(execute=True):
+        post = Post.objects.create(title='Pic', slug='pic', content='x', author=user, image=make_upload())
+    post.refresh_from_db()
+
+    enqueued = []
+    monkeypatch.setattr(images, 'enqueue_post_image', enqueued.append)
+    post.title = 'Renamed'
+    post.save()
+    assert enqueued == []
+
+
+@pytest.mark.django_db
+def test_storage_metadata_is_cached(media, monkeypatch):
+    from django.core.files.storage import FileSystemStorage, default_storage
+
+    name = default_storage.save('posts/a.txt', SimpleUploadedFile('a.txt', b'hello'))
+    # primed on save: no filesystem access needed afterwards
+    monkeypatch.setattr(FileSystemStorage, 'exists', lambda self, name: pytest.fail('storage hit'))
+    monkeypatch.setattr(FileSystemStorage, 'size', lambda self, name: pytest.fail('storage hit'))
+    assert default_storage.exists(name)
+    assert default_storage.size(name) == 5
+    monkeypatch.undo()
+
+    default_storage.delete(name)
+    assert not default_storage.exists(name)
@@ -0,0 +1,63 @@
+import json
+import logging
+
+import pytest
+from django.contrib.auth.models import User
+
+from posts.instrumentation import registry
+from posts.models import Post
+
+
+@pytest.fixture
+def posts(db):
+    author = User.objects.create_user(username='instrumented', password='1234')
+    for i in range(3):
+        Post.objects.create(author=author, title=f'Timed {i}', content='body', status='published')
+
+
+@pytest.mark.django_db
+def test_server_timing_reports_queries_and_serialization(client, posts):
+    response = client.get('/api/posts/')
+    assert response.status_code == 200
+    timing = response['Server-Timing']
+    assert 'db;dur=' in timing
+    assert ' queries"' in timing and 'db;dur=0.0;desc="0 queries"' not in timing
+    assert 'ser;dur=' in timing
+    assert 'app;dur=' in timing
+
+
+@pytest.mark.django_db
+def test_server_timing_can_be_disabled(client, settings):
+    settings.SERVER_TIMING = False
+    assert 'Server-Timing' not in client.get('/api/tags/')
+
+
+@pytest.mark.django_db
+def test_slow_requests_are_logged_as_json(client, posts, settings, caplog):
+    settings.SLOW_REQUEST_QUERIES = 1
+    with caplog.at_level(logging.WARNING, logger='posts.slow_requests'):
+        client.get('/api/posts/')
+        settings.SLOW_REQUEST_QUERIES = 10_000
+        client.get('/api/posts/')
+    records = [r for r in caplog.records if r.name == 'posts.slow_requests']
+    assert len(records) == 1
+    entry = json.loads(records[0].getMessage())
+    assert entry['view'] == 'post-list'
+    assert entry['db_queries'] >= 1
+    assert entry['status'] == 200
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint(client, posts, settings):
+    registry.reset()
+    client.get('/api/posts/')
+    assert client.get('/metrics').status_code == 403  # no token, DEBUG off
+    settings.DEBUG = True
+    body = client.get('/metrics').content.decode()
+    assert 'blog_request_duration_seconds_count{view="post-list",method="GET"} 1' in body
+    assert 'blog_request_db_queries_total{view="post-list"}' in body
+    assert 'blog_cache_lookups_total{tier="l1",outcome="hit"}' in body
+
+    settings.METRICS_TOKEN = 'scrape'
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape').status_code == 200
@@ -0,0 +1,158 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import IntegrityError
+from django.test import Client
+from django.utils import timezone
+from rest_framework.test import APIClient
+from posts import ai, jobs
+from posts.jobs import QueueFull, reap_stale_jobs, submit_generation
+from posts.models import GenerationJob, Post
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(username='alaska', password='1234')
+
+
+class FlakyBackend:
+    calls = 0
+
+    def complete(self, messages, timeout=None):
+        FlakyBackend.calls += 1
+        if FlakyBackend.calls < 2:
+            raise TimeoutError("upstream timed out")
+        return '```json\n{"title": "Retried", "content": "Body", "excerpt": "Short"}\n```'
+
+
+class BrokenBackend:
+    def complete(self, messages, timeout=None):
+        raise TimeoutError("upstream timed out")
+
+
+@pytest.mark.django_db
+def test_generate_api_returns_job_and_creates_draft(user, django_capture_on_commit_callbacks):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post('/api/generate/', {'prompt': 'Django tips'}, format='json')
+    assert response.status_code == 202
+    assert response.data['status'] == 'queued'
+
+    status = client.get(response.data['status_url'])
+    assert status.data['status'] == 'succeeded'
+    post = Post.objects.get(slug=status.data['post_slug'])
+    assert post.title == 'About Django tips'
+    assert post.status == 'draft' and post.author == user
+
+
+@pytest.mark.django_db
+def test_job_retries_then_succeeds(settings, user, django_capture_on_commit_callbacks):
+    settings.AI_LLM_BACKEND = 'posts.tests.test_jobs.FlakyBackend'
+    FlakyBackend.calls = 0
+    with django_capture_on_commit_callbacks(execute=True):
+        job = submit_generation(user, 'anything')
+    job.refresh_from_db()
+    assert job.status == 'succeeded' and job.attempts == 2
+    assert job.post.title == 'Retried'
+
+
+@pytest.mark.django_db
+def test_job_fails_after_max_attempts(settings, user, django_capture_on_commit_callbacks):
+    settings.AI_LLM_BACKEND = 'posts.tests.test_jobs.BrokenBackend'
+    with django_capture_on_commit_callbacks(execute=True):
+        job = submit_generation(user, 'anything')
+    job.refresh_from_db()
+    assert job.status == 'failed'
+    assert job.attempts == settings.AI_JOB_MAX_ATTEMPTS
+    assert 'timed out' in job.error
+    assert not Post.objects.exists()
+
+
+@pytest.mark.django_db
+def test_full_queue_applies_backpressure(settings, user):
+    settings.AI_JOB_MODE = 'worker'
+    settings.AI_JOB_MAX_QUEUE = 1
+    submit_generation(user, 'first')
+    with pytest.raises(QueueFull):
+        submit_generation(user, 'second')
+
+    client = APIClient()
+    client.force_authenticate(user=user)
+    response = client.post('/api/generate/', {'prompt': 'third'}, format='json')
+    assert response.status_code == 503
+    assert response['Retry-After']
+    assert GenerationJob.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_html_flow_redirects_to_post_when_done(settings, user, django_capture_on_commit_callbacks):
+    client = Client()
+    client.force_login(user)
+    settings.AI_JOB_MODE = 'worker'
+    response = client.post('/posts/create-ai/', {'ai_prompt': 'Caching'})
+    job = GenerationJob.objects.get()
+    assert response.url == f'/posts/ai-jobs/{job.pk}/'
+
+    pending = client.get(response.url)
+    assert b'http-equiv="refresh"' in pending.content
+
+    from posts.jobs import run_job
+    assert run_job(job.pk)
+    assert not run_job(job.pk)  # already claimed
+    done = client.get(response.url)
+    assert done.status_code == 302
+    assert done.url == f'/posts/{Post.objects.get().slug}/'
+
+
+@pytest.mark.django_db
+def test_crash_after_claim_marks_job_failed(monkeypatch, user, django_capture_on_commit_callbacks):
+    def clash(*args):
+        raise IntegrityError("UNIQUE constraint failed: posts_post.slug")
+    monkeypatch.setattr(jobs, 'create_generated_post', clash)
+    with django_capture_on_commit_callbacks(execute=True):
+        job = submit_generation(user, 'anything')
+    job.refresh_from_db()
+    assert job.status == 'failed'
+    assert 'UNIQUE' in job.error
+    assert not jobs.pending_jobs().exists()
+
+
+@pytest.mark.django_db
+def test_stale_running_jobs_are_requeued_and_redispatched(settings, monkeypatch, user):
+    long_ago = timezone.now() - timedelta(seconds=settings.AI_JOB_STALE_AFTER + 1)
+    lost = GenerationJob.objects.create(user=user, prompt='lost', status='running', attempts=1)
+    spent = GenerationJob.objects.create(
+        user=user, prompt='spent', status='running', attempts=settings.AI_JOB_MAX_ATTEMPTS,
+    )
+    alive = GenerationJob.objects.create(user=user, prompt='alive', status='running', attempts=1)
+    GenerationJob.objects.filter(pk__in=[lost.pk, spent.pk]).update(updated_at=long_ago)
+    orphan = GenerationJob.objects.create(user=user, prompt='orphan')
+
+    assert reap_stale_jobs() == (1, 1)
+    statuses = dict(GenerationJob.objects.values_list('prompt', 'status'))
+    assert statuses == {'lost': 'queued', 'spent': 'failed', 'alive': 'running', 'orphan': 'queued'}
+
+    submitted = []
+
+    class Executor:
+        def submit(self, fn, job_id):
+            submitted.append(job_id)
+
+    monkeypatch.setattr(jobs, 'get_executor', Executor)
+    monkeypatch.setattr(jobs, '_last_recovery', None)
+    jobs.recover_jobs()
+    jobs.recover_jobs()  # throttled
+    assert submitted == [lost.pk, orphan.pk]
+
+    # The requeued job carries on from the attempts it had made
+    jobs.run_job(lost.pk)
+    lost.refresh_from_db()
+    assert lost.status == 'succeeded' and lost.attempts == 2
+
+
+def test_parse_ai_output_tolerates_fences_and_python_literals():
+    assert ai.parse_ai_output('```json\n{"title": "A"}\n```') == {'title': 'A'}
+    assert ai.parse_ai_output("Sure! {'title': 'B'}") == {'title': 'B'}
+    assert ai.parse_ai_output('not json') == {}
@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+from django.utils.module_loading import import_string
+from posts.ai import Completion
+from posts.llm_cache import cached_completion, get_llm_stats, prompt_key
+
+
+class CountingBackend:
+    calls = 0
+    release = threading.Event()
+
+    def complete(self, messages, timeout=None):
+        CountingBackend.calls += 1
+        CountingBackend.release.wait(5)
+        return Completion('{"title": "T"}', {'prompt_tokens': 10, 'completion_tokens': 5, 'total_tokens': 15})
+
+
+@pytest.fixture
+def counting_backend(settings):
+    settings.AI_LLM_BACKEND = 'posts.tests.test_llm_cache.CountingBackend'
+    # pytest may have imported this file under another module name
+    backend = import_string(settings.AI_LLM_BACKEND)
+    backend.calls = 0
+    backend.release.set()
+    return backend
+
+
+def test_repeated_prompt_is_served_from_cache(counting_backend):
+    assert cached_completion('Django  tips') == '{"title": "T"}'
+    assert cached_completion('django tips ') == '{"title": "T"}'
+    assert counting_backend.calls == 1
+
+    stats = get_llm_stats()
+    assert stats['calls'] == 1 and stats['hits'] == 1 and stats['misses'] == 1
+    assert stats['total_tokens'] == 15
+    assert stats['hit_rate'] == 0.5
+
+
+def test_cache_can_be_disabled(settings, counting_backend):
+    settings.AI_PROMPT_CACHE_TTL = 0
+    cached_completion('x')
+    cached_completion('x')
+    assert counting_backend.calls == 2
+
+
+def test_concurrent_identical_prompts_share_one_call(counting_backend):
+    counting_backend.release.clear()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cached_completion('same'))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + 5
+    while get_llm_stats()['coalesced'] < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    coalesced = get_llm_stats()['coalesced']
+    counting_backend.release.set()
+    for t in threads:
+        t.join(5)
+
+    assert coalesced == 3
+
+    assert results == ['{"title": "T"}'] * 4
+    assert counting_backend.calls == 1
+
+
+def test_key_depends_on_model(settings):
+    key = prompt_key('x')
+    settings.AI_MODEL = 'gemini/other-model'
+    assert prompt_key('x') != key
@@ -0,0 +1,45 @@
+import pytest
+
+from posts import loadtest
+from posts.models import Comment, Post, PostTag
+
+
+@pytest.mark.django_db
+def test_seed_dataset_is_reproducible():
+    summary = loadtest.seed_dataset(posts=20, comments=100, users=5, tags=4, seed=7)
+    assert (summary['users'], summary['posts'], summary['comments']) == (5, 20, 100)
+    assert PostTag.objects.exists()
+    first = sorted(Post.objects.values_list('id', 'slug', 'author__username'))
+    assert Comment.objects.filter(created_at__gt=Post.objects.order_by('-published_at')[0].published_at).exists()
+
+    Post.objects.all().delete()
+    loadtest.User.objects.filter(username__startswith=loadtest.USER_PREFIX).delete()
+    loadtest.Tag.objects.all().delete()
+    loadtest.seed_dataset(posts=20, comments=100, users=5, tags=4, seed=7)
+    assert sorted(Post.objects.values_list('id', 'slug', 'author__username')) == first
+
+    with pytest.raises(ValueError):
+        loadtest.seed_dataset(posts=1, comments=0, users=1, tags=0)
+
+
+@pytest.mark.django_db
+def test_stub_tokens_authenticate_seeded_users(client):
+    loadtest.seed_dataset(posts=1, comments=0, users=2, tags=0)
+    with loadtest._stubbed_settings(page_cache_enabled=False) as stub:
+        response = client.get('/api/me/', HTTP_AUTHORIZATION=f'Bearer {stub.token(1)}')
+    assert response.status_code == 200
+    assert response.json()['username'] == 'loadtest-1'
+
+
+def test_compare_flags_regressions():
+    stats = {'requests': 1000, 'errors': 0, 'rps': 100.0, 'p50_ms': 10.0, 'p95_ms': 40.0, 'p99_ms': 80.0}
+    baseline = {'endpoints': {'post_detail': stats, 'api_posts': stats}}
+    results = {'endpoints': {
+        'post_detail': {**stats, 'p95_ms': 45.0, 'p99_ms': 200.0},
+        'api_posts': {**stats, 'rps': 70.0, 'p50_ms': 13.0, 'errors': 50},
+    }}
+    assert loadtest.compare(baseline, results, tolerance=0.2) == [
+        'api_posts: p50_ms 10.0 -> 13.0',
+        'api_posts: rps 100.0 -> 70.0',
+        'api_posts: error rate 0.0% -> 5.0%',
+    ]
@@ -0,0 +1,50 @@
+import pytest
+from django.contrib.auth.models import User
+from django.test import Client
+from posts.models import Comment, Post
+from posts.page_cache import get_stats
+
+
+@pytest.fixture
+def post():
+    user = User.objects.create_user(username='alaska', password='1234')
+    return Post.objects.create(title='Cached', slug='cached', content='Body', author=user, status='published')
+
+
+@pytest.mark.django_db
+def test_anonymous_post_list_is_cached_until_a_post_changes(post, django_capture_on_commit_callbacks):
+    client = Client()
+    assert client.get('/')['X-Page-Cache'] == 'MISS'
+    assert client.get('/')['X-Page-Cache'] == 'HIT'
+
+    with django_capture_on_commit_callbacks(execute=True):
+        post.title = 'Renamed'
+        post.save()
+        # Not bumped before commit, or a reader could cache the old rows under the new version
+        assert client.get('/')['X-Page-Cache'] == 'HIT'
+    response = client.get('/')
+    assert response['X-Page-Cache'] == 'MISS'
+    assert b'Renamed' in response.content
+    assert get_stats()['page'] == {'hit': 2, 'miss': 2}
+
+
+@pytest.mark.django_db
+def test_logged_in_users_are_not_served_cached_pages(post):
+    client = Client()
+    client.get('/')
+    client.force_login(post.author)
+    response = client.get('/')
+    assert 'X-Page-Cache' not in response
+    assert b'Welcome, alaska' in response.content
+
+
+@pytest.mark.django_db
+def test_comment_invalidates_only_comment_fragment(post, django_capture_on_commit_callbacks):
+    client = Client()
+    client.get('/posts/cached/')
+    with django_capture_on_commit_callbacks(execute=True):
+        Comment.objects.create(post=post, author=post.author, content='First!')
+
+    response = client.get('/posts/cached/')
+    assert b'First!' in response.content
+    assert get_stats()['fragment'] == {'hit': 2, 'miss': 4}
@@ -0,0 +1,119 @@
+"""Query budgets for every view in posts/views.py and every viewset action.
+
+Each case is one request against seed_posts(10, 3). The budget is the most
+SQL queries it may make; it is fixed at the current count, so a change that
+adds queries (an N+1, a lost select_related) fails here. Lower a budget when
+a change saves queries. Counts are recorded in the benchmark results file
+(see conftest.py).
+"""
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from posts.models import Comment, GenerationJob, Post, Tag
+
+
+class Ctx:
+    def __init__(self, user, post, other_post, comment, tag, job):
+        self.user, self.post, self.other_post = user, post, other_post
+        self.comment, self.tag, self.job = comment, tag, job
+
+
+# (name, method, path, data, logged in, expected status, budget); path and data may take the Ctx
+CASES = [
+    # HTML views
+    ('post_list', 'get', lambda c: '/', None, False, 200, 1),
+    ('post_detail', 'get', lambda c: f'/posts/{c.post.slug}/', None, False, 200, 6),
+    ('post_detail:comment', 'post', lambda c: f'/posts/{c.post.slug}/', {'content': 'hi'}, True, 302, 10),
+    ('post_comments', 'get', lambda c: f'/posts/{c.post.slug}/comments/', None, False, 200, 2),
+    ('register_view', 'get', lambda c: '/register/', None, False, 200, 0),
+    ('register_view:post', 'post', lambda c: '/register/',
+     {'username': 'new', 'email': 'n@example.com', 'password1': 'pw', 'password2': 'pw'}, False, 302, 10),
+    ('login_view', 'get', lambda c: '/login/', None, False, 200, 0),
+    ('login_view:post', 'post', lambda c: '/login/', {'username': 'author10', 'password': '1234'}, False, 302, 9),
+    ('logout_view', 'get', lambda c: '/logout/', None, True, 302, 4),
+    ('profile_view', 'get', lambda c: '/profile/', None, True, 200, 2),
+    ('create_post', 'get', lambda c: '/posts/create/', None, True, 200, 2),
+    ('create_post:post', 'post', lambda c: '/posts/create/',
+     {'title': 'New', 'content': 'x', 'status': 'published'}, True, 302, 4),
+    ('create_post_ai', 'get', lambda c: '/posts/create-ai/', None, True, 200, 2),
+    ('create_post_ai:post', 'post', lambda c: '/posts/create-ai/', {'ai_prompt': 'cats'}, True, 302, 4),
+    ('ai_job_status', 'get', lambda c: f'/posts/ai-jobs/{c.job.pk}/', None, True, 200, 3),
+    ('stream_post_ai', 'post', lambda c: '/posts/create-ai/stream/', {'ai_prompt': 'cats'}, True, 200, 2),
+    ('edit_post', 'get', lambda c: f'/edit/{c.post.slug}/', None, True, 200, 4),
+    ('edit_post:post', 'post', lambda c: f'/edit/{c.post.slug}/',
+     {'title': 'Edited', 'content': 'y', 'status': 'published'}, True, 302, 5),
+    ('delete_post:post', 'post', lambda c: f'/delete/{c.other_post.slug}/', None, True, 302, 15),
+    ('add_comment', 'post', lambda c: f'/posts/{c.post.slug}/comment/', {'content': 'hi'}, True, 302, 5),
+    ('TestView', 'get', lambda c: '/test/', None, False, 200, 0),
+    ('profile_api', 'get', lambda c: '/api/me/', None, True, 200, 8),
+    ('ProfileUpdateView', 'patch', lambda c: '/api/me/', {'full_name': 'A'}, True, 200, 8),
+    ('GenerateBlogAPI', 'post', lambda c: '/api/generate/', {'prompt': 'cats'}, True, 202, 4),
+    ('GenerationJobStatusAPI', 'get', lambda c: f'/api/generate/{c.job.pk}/', None, True, 200, 3),
+
+    # PostViewSet
+    ('post-list', 'get', lambda c: '/api/posts/', None, False, 200, 1),
+    ('post-list:expand', 'get', lambda c: '/api/posts/?expand=author,tags,comments,comments.author',
+     None, False, 200, 3),
+    ('post-detail', 'get', lambda c: f'/api/posts/{c.post.slug}/', None, False, 200, 6),
+    ('post-create', 'post', lambda c: '/api/posts/',
+     {'title': 'API', 'content': 'x', 'status': 'published'}, True, 201, 5),
+    ('post-partial-update', 'patch', lambda c: f'/api/posts/{c.post.slug}/', {'title': 'T'}, True, 200, 9),
+    ('post-destroy', 'delete', lambda c: f'/api/posts/{c.other_post.slug}/', None, True, 204, 14),
+    ('post-bulk-create', 'post', lambda c: '/api/posts/bulk/',
+     [{'title': f'B{i}', 'content': 'x', 'status': 'published'} for i in range(5)], True, 201, 9),
+
+    # TagViewSet
+    ('tag-list', 'get', lambda c: '/api/tags/', None, True, 200, 4),
+    ('tag-detail', 'get', lambda c: f'/api/tags/{c.tag.pk}/', None, True, 200, 3),
+    ('tag-create', 'post', lambda c: '/api/tags/', {'name': 'New tag', 'slug': 'new-tag'}, True, 201, 6),
+
+    # CommentViewSet (nested under posts)
+    ('comment-list', 'get', lambda c: f'/api/posts/{c.post.slug}/comments/', None, False, 200, 1),
+    ('comment-detail', 'get', lambda c: f'/api/posts/{c.post.slug}/comments/{c.comment.pk}/', None, False, 200, 1),
+    # The serializer still requires `post` on nested creates (see test_comment_create_auto_attach_post)
+    ('comment-create', 'post', lambda c: f'/api/posts/{c.post.slug}/comments/',
+     lambda c: {'content': 'hi', 'post': str(c.post.pk)}, True, 201, 6),
+    ('comment-partial-update', 'patch', lambda c: f'/api/posts/{c.post.slug}/comments/{c.comment.pk}/',
+     {'content': 'edited'}, True, 200, 5),
+    ('comment-destroy', 'delete', lambda c: f'/api/posts/{c.post.slug}/comments/{c.comment.pk}/',
+     None, True, 204, 5),
+    ('comment-bulk-create', 'post', lambda c: f'/api/posts/{c.post.slug}/comments/bulk/',
+     [{'content': f'c{i}'} for i in range(5)], True, 201, 9),
+]
+
+
+@pytest.fixture
+def ctx(seed_posts, settings):
+    # Measure the views' own work, not the page cache
+    settings.PAGE_CACHE_ENABLED = False
+    settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    user = seed_posts(10, 3)
+    user.set_password('1234')
+    user.save()
+    posts = list(Post.objects.filter(author=user).order_by('slug'))
+    return Ctx(
+        user=user, post=posts[0], other_post=posts[1],
+        comment=Comment.objects.filter(post=posts[0]).first(), tag=Tag.objects.get(),
+        job=GenerationJob.objects.create(user=user, prompt='cats'),
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'name,method,path,data,logged_in,expected,budget', CASES, ids=[case[0] for case in CASES],
+)
+def test_query_budget(ctx, bench_results, name, method, path, data, logged_in, expected, budget):
+    client = APIClient()
+    if logged_in:
+        client.force_login(ctx.user)
+    data = data(ctx) if callable(data) else data
+    kwargs = {'format': 'json'} if isinstance(data, list) or method in ('patch', 'put') else {}
+    with CaptureQueriesContext(connection) as queries:
+        response = getattr(client, method)(path(ctx), data, **kwargs)
+    bench_results['queries'][name] = len(queries)
+    assert response.status_code == expected, getattr(response, 'content', b'')[:300]
+    assert len(queries) <= budget, f"{name}: {len(queries)} queries, budget {budget}:\n" + '\n'.join(
+        q['sql'] for q in queries.captured_queries
+    )
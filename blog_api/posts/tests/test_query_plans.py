@@ -0,0 +1,16 @@
+import pytest
+from django.core.management import call_command
+from posts.query_plans import check_query_plans
+
+
+@pytest.mark.django_db
+def test_hot_queries_use_their_indexes():
+    for name, plan, used, sorts in check_query_plans():
+        assert used, f"{name} does not use an index:\n{plan}"
+        assert not sorts, f"{name} sorts in memory:\n{plan}"
+
+
+@pytest.mark.django_db
+def test_explain_queries_command(capsys):
+    call_command('explain_queries')
+    assert 'FAIL' not in capsys.readouterr().out
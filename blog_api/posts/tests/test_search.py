@@ -0,0 +1,59 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete
+from django.urls import reverse
+from rest_framework.test import APIClient
+from posts.models import Post, PostTag, Tag
+from posts.search import search_posts
+from posts.signals import reindex_post_tag_row
+
+
+@pytest.fixture
+def posts(django_capture_on_commit_callbacks):
+    user = User.objects.create_user(username='alaska', password='1234')
+    django_tag = Tag.objects.create(name='django', slug='django')
+    python_tag = Tag.objects.create(name='python', slug='python')
+    with django_capture_on_commit_callbacks(execute=True):
+        in_title = Post.objects.create(title='Django tips', slug='tips', content='Views', author=user, status='published')
+        in_title.tags.add(django_tag, python_tag)
+        in_body = Post.objects.create(title='Notes', slug='notes', content='Some django content', author=user, status='published')
+        Post.objects.create(title='Other', slug='other', content='Unrelated', author=user, status='published')
+    return in_title, in_body
+
+
+@pytest.mark.django_db
+def test_search_ranks_and_deduplicates(posts):
+    in_title, in_body = posts
+    results = list(search_posts(Post.objects.filter(status='published'), 'django'))
+    assert results == [in_title, in_body]
+
+
+@pytest.mark.django_db
+def test_search_index_follows_edits_and_tags(posts, django_capture_on_commit_callbacks):
+    in_title, in_body = posts
+    with django_capture_on_commit_callbacks(execute=True):
+        in_body.title = 'Flask notes'
+        in_body.save()
+        in_body.tags.add(Tag.objects.get(slug='python'))
+    assert list(search_posts(Post.objects.all(), 'flask')) == [in_body]
+    assert set(search_posts(Post.objects.all(), 'python')) == {in_title, in_body}
+
+
+@pytest.mark.django_db
+def test_clearing_a_tags_posts_reindexes_them(posts, django_capture_on_commit_callbacks):
+    in_title, _ = posts
+    # Only the m2m_changed receiver: clear() gets no pk_set from Django
+    post_delete.disconnect(reindex_post_tag_row, sender=PostTag)
+    try:
+        with django_capture_on_commit_callbacks(execute=True):
+            Tag.objects.get(slug='python').post_set.clear()
+    finally:
+        post_delete.connect(reindex_post_tag_row, sender=PostTag)
+    assert list(search_posts(Post.objects.all(), 'python')) == []
+    assert list(search_posts(Post.objects.all(), 'tips')) == [in_title]
+
+
+@pytest.mark.django_db
+def test_api_search_uses_index(posts):
+    response = APIClient().get(reverse('post-list'), {'search': 'django'})
+    assert [p['slug'] for p in response.data['results']] == ['tips', 'notes']
@@ -0,0 +1,140 @@
+"""Serialization time of the API serializers at 10, 100 and 1000 rows.
+
+Every run checks that serializing already-loaded rows makes no SQL. The
+timings are wall-clock and too noisy for shared CI, so they only run with
+BENCH=1: each case times `.data` (best of REPEATS) and divides it by a fixed
+pure-Python workload timed on the same machine, so the score is comparable
+between machines. A case fails when its score is more than BENCH_TOLERANCE
+(default 50%) above benchmarks_baseline.json.
+
+    BENCH=1 pytest posts/tests/test_serializer_benchmarks.py
+
+Refresh the baseline after an intended change:
+
+    BENCH_UPDATE_BASELINE=1 pytest posts/tests/test_serializer_benchmarks.py
+"""
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Prefetch
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Comment, Post, Tag
+from posts.searilizers import CommentSerializer, PostSerializer, TagSerializer
+from posts.sparse import FieldSelection
+
+BASELINE = Path(__file__).parent / 'benchmarks_baseline.json'
+TOLERANCE = float(os.getenv('BENCH_TOLERANCE', 0.5))
+UPDATE_BASELINE = os.getenv('BENCH_UPDATE_BASELINE') == '1'
+RUN_TIMINGS = UPDATE_BASELINE or os.getenv('BENCH') == '1'
+REPEATS = 5
+SIZES = (10, 100, 1000)
+
+
+def _best_of(fn, loops):
+    best = float('inf')
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter() - started) / loops)
+    return best
+
+
+@pytest.fixture(scope='module')
+def calibration():
+    """Seconds for a fixed row-to-dict workload, the unit scores are measured in."""
+    when = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = [SimpleNamespace(id=i, name=f'row {i}', when=when) for i in range(2000)]
+    return _best_of(lambda: [{'id': r.id, 'name': r.name, 'when': r.when.isoformat()} for r in rows], 5)
+
+
+@pytest.fixture(scope='module')
+def baseline():
+    scores = json.loads(BASELINE.read_text())['serializers'] if BASELINE.exists() else {}
+    measured = {}
+    yield scores, measured
+    if UPDATE_BASELINE and measured:
+        BASELINE.write_text(json.dumps({'serializers': {**scores, **measured}}, indent=2, sort_keys=True) + '\n')
+
+
+def _posts(size, user):
+    Post.objects.bulk_create(
+        Post(title=f'Post {i}', slug=f'bench-{i}', content='Lorem ipsum ' * 100, excerpt='Lorem ipsum',
+             author=user, status='published')
+        for i in range(size)
+    )
+    posts = list(Post.objects.all())
+    tags = Tag.objects.bulk_create(Tag(name=f'tag {i}', slug=f'tag-{i}') for i in range(3))
+    Post.tags.through.objects.bulk_create(
+        Post.tags.through(post=post, tag=tag) for post in posts for tag in tags[:2]
+    )
+    Comment.objects.bulk_create(
+        Comment(post=post, author=user, content='Nice post!') for post in posts for _ in range(2)
+    )
+
+
+def _rows(kind, size):
+    user = User.objects.create_user(username='bench')
+    if kind == 'tag':
+        Tag.objects.bulk_create(Tag(name=f'tag {i}', slug=f'tag-{i}') for i in range(size))
+        return list(Tag.objects.all())
+    if kind == 'comment':
+        post = Post.objects.create(title='Post', content='x', author=user, status='published')
+        Comment.objects.bulk_create(Comment(post=post, author=user, content='Nice post!') for _ in range(size))
+        return list(Comment.objects.select_related('author'))
+    _posts(size, user)
+    return list(
+        Post.objects.select_related('author')
+        .prefetch_related('tags', Prefetch('comments', queryset=Comment.objects.select_related('author')))
+    )
+
+
+CASES = {
+    # What /api/posts/?expand=author,tags,comments,comments.author and the detail view build
+    'PostSerializer': ('post', lambda rows: PostSerializer(rows, many=True).data),
+    # The default /api/posts/ list
+    'PostSerializer[list]': ('post', lambda rows: PostSerializer(
+        rows, many=True, context={'sparse': FieldSelection(PostSerializer.Meta.list_fields)},
+    ).data),
+    'CommentSerializer': ('comment', lambda rows: CommentSerializer(rows, many=True).data),
+    'TagSerializer': ('tag', lambda rows: TagSerializer(rows, many=True).data),
+}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('name', list(CASES))
+def test_serializer_makes_no_queries(name, size):
+    kind, serialize = CASES[name]
+    rows = _rows(kind, size)
+    with CaptureQueriesContext(connection) as queries:
+        assert len(serialize(rows)) == size
+    assert not queries.captured_queries, f"{name} queries while serializing: {queries.captured_queries[0]['sql']}"
+
+
+@pytest.mark.skipif(not RUN_TIMINGS, reason="timings only run with BENCH=1")
+@pytest.mark.django_db
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('name', list(CASES))
+def test_serializer_speed(name, size, calibration, baseline, bench_results):
+    kind, serialize = CASES[name]
+    rows = _rows(kind, size)
+    seconds = _best_of(lambda: serialize(rows), loops=max(1, 1000 // size))
+    score = round(seconds / calibration, 3)
+    key = f'{name}[{size}]'.replace('][', ',')
+    bench_results['serializers'][key] = {'ms': round(seconds * 1000, 3), 'score': score}
+    scores, measured = baseline
+    measured[key] = score
+    if key in scores and not UPDATE_BASELINE:
+        assert score <= scores[key] * (1 + TOLERANCE), (
+            f"{key} is {score / scores[key] - 1:.0%} slower than the baseline "
+            f"({seconds * 1000:.2f} ms, score {score} vs {scores[key]})"
+        )
@@ -0,0 +1,10 @@
+from posts.management.commands.profile_startup import profile_startup
+
+# Measured ~0.3 s on a laptop; importing litellm at startup alone added ~4 s.
+STARTUP_BUDGET_SECONDS = 2.0
+
+
+def test_startup_stays_lazy_and_within_budget():
+    report = profile_startup(importtime=False)
+    assert report['loaded'] == []
+    assert report['seconds'] < STARTUP_BUDGET_SECONDS
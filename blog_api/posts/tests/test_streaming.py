@@ -0,0 +1,76 @@
+import json
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.db import IntegrityError
+from django.test import AsyncClient
+from posts import streaming
+from posts.ai import StreamingFieldParser
+from posts.models import Post
+
+
+def parse_events(body):
+    events = []
+    for message in body.decode().strip().split("\n\n"):
+        event, data = message.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def stream(client, data):
+    async def consume():
+        response = await client.post('/posts/create-ai/stream/', data)
+        body = b''.join([chunk async for chunk in response.streaming_content]) if response.streaming else response.content
+        return response, body
+    return async_to_sync(consume)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stream_sends_deltas_then_saves_post():
+    user = User.objects.create_user(username='alaska', password='1234')
+    client = AsyncClient()
+    client.force_login(user)
+
+    response, body = stream(client, {'ai_prompt': 'Async Django'})
+    assert response['Content-Type'] == 'text/event-stream'
+    events = parse_events(body)
+    assert events[0][0] == 'start'
+    assert len([e for e in events if e[0] == 'delta']) > 3  # arrives piece by piece
+    title = ''.join(d['text'] for e, d in events if e == 'delta' and d['field'] == 'title')
+    assert title == 'About Async Django'
+
+    event, done = events[-1]
+    post = Post.objects.get(slug=done['slug'])
+    assert event == 'done' and done['url'] == f'/posts/{post.slug}/'
+    assert post.title == title and post.status == 'published' and post.author == user
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stream_ends_with_error_event_when_save_fails(monkeypatch):
+    def collide(*args):
+        raise IntegrityError('UNIQUE constraint failed: posts_post.slug')
+
+    monkeypatch.setattr(streaming, 'create_generated_post', collide)
+    user = User.objects.create_user(username='alaska', password='1234')
+    client = AsyncClient()
+    client.force_login(user)
+    _, body = stream(client, {'ai_prompt': 'Async Django'})
+    assert parse_events(body)[-1] == ('error', {'error': 'The generated post could not be saved.'})
+    assert not Post.objects.exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stream_requires_login():
+    response, _ = stream(AsyncClient(), {'ai_prompt': 'x'})
+    assert response.status_code == 401
+    assert not Post.objects.exists()
+
+
+def test_parser_handles_split_escapes_and_nested_keys():
+    text = '{"meta": {"title": "no"}, "title": "A \\"b\\" \\u00e9", "content": "x\\ny"}'
+    parser = StreamingFieldParser()
+    out = {}
+    for ch in text:
+        for field, delta in parser.feed(ch):
+            out[field] = out.get(field, '') + delta
+    assert out == {'title': 'A "b" é', 'content': 'x\ny'}
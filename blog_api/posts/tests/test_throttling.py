@@ -0,0 +1,65 @@
+import pytest
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+
+from posts.throttling import Rate, hit
+
+
+def test_sliding_window_counts_and_weights_previous_window():
+    rate = Rate(limit=3, period=60)
+    assert [hit('throttle_t_a', rate, now=600 + i).allowed for i in range(4)] == [True, True, True, False]
+    denied = hit('throttle_t_a', rate, now=610)
+    assert (denied.allowed, denied.remaining) == (False, 0)
+    # The next window starts at 660; 3 * (1 - 20/60) + 1 fits at 680
+    assert denied.wait == pytest.approx(70)
+
+    # Halfway through the next window the 3 earlier requests count as 1.5
+    assert hit('throttle_t_a', rate, now=690).allowed
+    assert not hit('throttle_t_a', rate, now=690).allowed
+
+
+@pytest.fixture
+def rates(settings):
+    def set_rates(**rates):
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}
+    return set_rates
+
+
+@pytest.mark.django_db
+def test_reads_and_writes_have_separate_limits(rates):
+    rates(read='2/min', write='1/min')
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username='alaska', password='1234'))
+
+    first = client.get('/api/posts/')
+    assert (first['RateLimit-Limit'], first['RateLimit-Remaining']) == ('2', '1')
+    assert client.get('/api/posts/').status_code == 200
+    limited = client.get('/api/posts/')
+    assert limited.status_code == 429
+    assert int(limited['Retry-After']) > 0
+
+    assert client.post('/api/tags/', {'name': 'a', 'slug': 'a'}, format='json').status_code == 201
+    assert client.post('/api/tags/', {'name': 'b', 'slug': 'b'}, format='json').status_code == 429
+
+
+def test_test_view_demo_limits(db):
+    client = APIClient()
+    first = client.get('/test/')
+    assert first.status_code == 200
+    assert (first['RateLimit-Limit'], first['RateLimit-Remaining']) == ('1', '0')
+    assert client.get('/test/').status_code == 429
+
+
+@pytest.mark.django_db
+def test_async_profile_get_is_throttled_like_drf(rates):
+    rates(read='1/min')
+    client = APIClient()
+    client.force_login(User.objects.create_user(username='alaska', password='1234'))
+
+    first = client.get('/api/me/')
+    assert first.status_code == 200 and first['RateLimit-Remaining'] == '0'
+    limited = client.get('/api/me/')
+    assert limited.status_code == 429
+    assert int(limited['Retry-After']) > 0
+    # Other formats are negotiated by DRF and share the same limit
+    assert client.get('/api/me/', HTTP_ACCEPT='text/html').status_code == 429
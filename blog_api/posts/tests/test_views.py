@@ -3,6 +3,7 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from django.contrib.auth.models import User
 from posts.models import Post, Comment, Tag, Profile
+from posts.views import PostViewSet
 
 @pytest.fixture
 def client():
@@ -77,3 +78,100 @@ def test_profile_get_and_patch(client):
     assert patch_res.status_code == 200
     profile = Profile.objects.get(user=user)
     assert profile.full_name == 'Updated Name'
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('n_posts,n_comments', [(1, 1), (10, 8)])
+def test_post_list_query_count_is_constant(client, django_assert_num_queries, n_posts, n_comments, seed_posts):
+    seed_posts(n_posts, n_comments)
+    url = reverse('post-list')
+    # posts + authors, tags, latest comments + authors (keyset pages need no COUNT)
+    with django_assert_num_queries(3):
+        response = client.get(url, {'expand': 'author,tags,comments,comments.author'})
+    assert response.status_code == 200
+    for post in response.data['results']:
+        assert len(post['comments']) == min(n_comments, 3)
+        assert post['comments'][0]['author']['username'] == f'author{n_posts}'
+
+@pytest.mark.django_db
+def test_post_list_default_is_lightweight(client, django_assert_num_queries, seed_posts):
+    seed_posts(5, 3)
+    with django_assert_num_queries(1) as ctx:
+        response = client.get(reverse('post-list'))
+    post = response.data['results'][0]
+    assert set(post) == {'id', 'author', 'title', 'slug', 'excerpt', 'status', 'published_at', 'thumbnail_url'}
+    assert isinstance(post['author'], int)
+    assert '"content"' not in ctx.captured_queries[0]['sql']
+
+@pytest.mark.django_db
+def test_post_fields_and_expand(client, monkeypatch, seed_posts):
+    monkeypatch.setattr(PostViewSet, 'throttle_classes', [])
+    seed_posts(1, 2)
+    slug = Post.objects.get().slug
+    url = reverse('post-detail', args=[slug])
+    response = client.get(url, {'fields': 'title,comments.content', 'expand': 'comments'})
+    assert response.data == {'title': 'P0', 'comments': [{'content': 'c'}, {'content': 'c'}]}
+    assert set(client.get(url).data) >= {'content', 'tags', 'comments'}
+    assert client.get(url, {'expand': 'title'}).status_code == 400
+    assert client.get(url, {'fields': 'nope'}).status_code == 400
+
+@pytest.mark.django_db
+def test_post_list_cursor_pagination(client, monkeypatch, seed_posts):
+    monkeypatch.setattr(PostViewSet, 'throttle_classes', [])
+    seed_posts(25, 0)
+    url = reverse('post-list')
+    seen = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        seen += [p['slug'] for p in response.data['results']]
+        url = response.data['next']
+    assert len(seen) == len(set(seen)) == 25
+
+    previous = client.get(response.data['previous'])
+    assert [p['slug'] for p in previous.data['results']] == seen[10:20]
+
+@pytest.mark.django_db
+def test_post_list_conditional_get(
+    client, monkeypatch, django_assert_num_queries, django_capture_on_commit_callbacks, seed_posts,
+):
+    monkeypatch.setattr(PostViewSet, 'throttle_classes', [])
+    seed_posts(3, 1)
+    url = reverse('post-list')
+    first = client.get(url)
+    etag = first['ETag']
+
+    with django_assert_num_queries(0):
+        cached = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert cached.status_code == 304
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Comment.objects.create(post=Post.objects.first(), content='new')
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.django_db
+def test_post_detail_conditional_get_checks_existence_and_counts_views(client, monkeypatch, seed_posts):
+    monkeypatch.setattr(PostViewSet, 'throttle_classes', [])
+    seed_posts(1, 0)
+    post = Post.objects.get()
+    url = reverse('post-detail', kwargs={'slug': post.slug})
+    etag = client.get(url)['ETag']
+
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    assert client.get(url, HTTP_IF_NONE_MATCH='*').status_code == 304
+    post.refresh_from_db()
+    assert post.click_count == 3
+
+    missing = reverse('post-detail', kwargs={'slug': 'missing'})
+    assert client.get(missing, HTTP_IF_NONE_MATCH='*').status_code == 404
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bench_read_path_runs_both_handlers():
+    from io import StringIO
+    from django.core.management import call_command
+
+    out = StringIO()
+    call_command('bench_read_path', seed=2, requests=4, concurrency=2, stdout=out)
+    lines = out.getvalue().splitlines()
+    assert [line.split()[0] for line in lines[1:]] == ['wsgi', 'asgi'] * 3
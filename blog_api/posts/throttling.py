@@ -0,0 +1,150 @@
+"""Sliding-window-counter rate limiting in the shared cache.
+
+DRF's SimpleRateThrottle keeps a list of request timestamps per client and
+rewrites it with a get/set pair on every request, so concurrent workers
+overwrite each other's history. Here each client has two integer counters,
+the current and the previous fixed window, updated with cache.incr(), which
+is atomic across processes on Redis and, through a file lock, on the
+file-based fallback (posts/cache.py). The previous window is weighted by
+how much of it still overlaps the sliding window:
+
+    used = previous * (1 - elapsed / period) + current
+
+Rates come from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] as in DRF
+('10/min'). RequestKindThrottle limits reads, writes and AI generation
+separately. The outcome is kept on the request and RateLimitHeadersMiddleware
+(posts/middleware.py) turns it into RateLimit-* headers.
+"""
+import math
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+Rate = namedtuple('Rate', ['limit', 'period'])
+RateLimit = namedtuple('RateLimit', ['allowed', 'limit', 'remaining', 'reset', 'wait'])
+
+
+def get_rate(scope):
+    """Rate for `scope`, or None when the scope has no configured rate."""
+    rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+    if rate is None:
+        return None
+    limit, period = SimpleRateThrottle.parse_rate(None, rate)
+    return Rate(limit, period)
+
+
+def _wait(rate, previous, current, elapsed):
+    """Seconds until one more request fits in the window."""
+    if current < rate.limit:
+        # Wait for enough of the previous window to slide out
+        return max(0.0, rate.period * (1 - (rate.limit - current - 1) / previous) - elapsed)
+    # Only the next window has room; `current` becomes its previous window
+    return rate.period - elapsed + max(0.0, rate.period * (1 - (rate.limit - 1) / current))
+
+
+def hit(key, rate, now=None):
+    """Count one request against `key` and return the RateLimit outcome.
+
+    Rejected requests are taken back off the counter, so a client retrying
+    while limited doesn't extend its own ban.
+    """
+    now = time.time() if now is None else now
+    window = int(now // rate.period)
+    elapsed = now - window * rate.period
+    current_key = f'{key}_{window}'
+    try:
+        current = cache.incr(current_key)
+    except ValueError:
+        current = 1 if cache.add(current_key, 1, rate.period * 2) else cache.incr(current_key)
+    previous = cache.get(f'{key}_{window - 1}', 0)
+    weight = 1 - elapsed / rate.period
+    allowed = previous * weight + current <= rate.limit
+    if not allowed:
+        try:
+            cache.decr(current_key)
+        except ValueError:
+            pass
+        current -= 1
+    remaining = max(0, math.floor(rate.limit - previous * weight - current))
+    return RateLimit(
+        allowed=allowed,
+        limit=rate.limit,
+        remaining=remaining,
+        reset=math.ceil(rate.period - elapsed),
+        wait=None if allowed else _wait(rate, previous, current, elapsed),
+    )
+
+
+def note_rate_limit(request, result):
+    """Remember the most restrictive outcome on the Django request for the headers."""
+    current = getattr(request, 'rate_limit', None)
+    if current is None or (not result.allowed, -result.remaining) > (not current.allowed, -current.remaining):
+        request.rate_limit = result
+
+
+def check_rate(request, scope, ident):
+    """hit() for plain Django views; None when `scope` has no rate."""
+    rate = get_rate(scope)
+    if rate is None:
+        return None
+    result = hit(f'throttle_{scope}_{ident}', rate)
+    note_rate_limit(request, result)
+    return result
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """Base class: subclasses pick the scope and the client identity."""
+    scope = None
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'user-{request.user.pk}'
+        return f'ip-{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        self.result = None
+        scope = self.get_scope(request, view)
+        ident = scope and self.get_ident_key(request, view)
+        if not ident:
+            return True
+        self.result = check_rate(request._request, scope, ident)
+        return self.result is None or self.result.allowed
+
+    def wait(self):
+        return self.result.wait if self.result is not None else None
+
+
+class UserRateThrottle(SlidingWindowThrottle):
+    """Like DRF's UserRateThrottle: the 'user' rate for logged-in users."""
+    scope = 'user'
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f'user-{request.user.pk}'
+        return None
+
+
+class AnonRateThrottle(SlidingWindowThrottle):
+    """Like DRF's AnonRateThrottle: the 'anon' rate for anonymous clients, by IP."""
+    scope = 'anon'
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return f'ip-{self.get_ident(request)}'
+
+
+class RequestKindThrottle(SlidingWindowThrottle):
+    """The view's `throttle_scope` (e.g. 'ai') if it has one, else 'read' or 'write' by method."""
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope:
+            return scope
+        return 'read' if request.method in ('GET', 'HEAD', 'OPTIONS') else 'write'
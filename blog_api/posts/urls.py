@@ -1,17 +1,19 @@
 from django.urls import path, include, re_path
-from . import views
+from . import instrumentation, views
 from .views import PostViewSet, TagViewSet, CommentViewSet
 from rest_framework.routers import DefaultRouter
 from rest_framework_nested.routers import NestedDefaultRouter
 from django.conf import settings
 from django.conf.urls.static import static
-from .views import ProfileUpdateView,GenerateBlogAPI
+from .views import GenerateBlogAPI,GenerationJobStatusAPI
 # HTML routes
 
 urlpatterns = [
     path('', views.post_list, name='post_list'),
     path('posts/create/', views.create_post, name='create_post'),  # create post URL
     path('posts/create-ai/', views.create_post_ai, name='create_post_ai'), # create post with AI URL
+    path('posts/create-ai/stream/', views.stream_post_ai, name='stream_post_ai'),  # SSE, needs the ASGI app
+    path('posts/ai-jobs/<uuid:job_id>/', views.ai_job_status, name='ai_job_status'),  # AI generation progress
     path('posts/<slug:slug>/', views.post_detail, name='post_detail'),
     path('posts/<slug:slug>/comments/', views.post_comments, name='post_comments'),
     path('edit/<slug:slug>/', views.edit_post, name='edit_post'),
@@ -19,10 +21,13 @@ urlpatterns = [
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('register/', views.register_view, name='register'),
-    path('api/me/', ProfileUpdateView.as_view(), name='profile-update'), 
+    path('api/me/', views.profile_api, name='profile-update'), 
+    path('api/generate/', GenerateBlogAPI.as_view(), name='generate-blog'),
+    path('api/generate/<uuid:job_id>/', GenerationJobStatusAPI.as_view(), name='generate-blog-status'),
     path('profile/', views.profile_view, name='profile'),
     path('posts/<slug:slug>/comment/', views.add_comment, name='add_comment'),
     path('test/', views.TestView.as_view(), name='test'),  # Test view with throttling
+    path('metrics', instrumentation.metrics_view, name='metrics'),  # Prometheus scrape endpoint
     path('posts/<slug:slug>/', views.post_detail, name='post_detail'),
 ]
 
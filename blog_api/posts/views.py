@@ -1,6 +1,6 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from rest_framework import viewsets, filters
-from .models import Post, Tag, Comment
+from .models import Post, PostTag, Tag, Comment
 from .searilizers import PostSerializer, TagSerializer, CommentSerializer
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 from .permissions import IsAuthorOrReadOnly
@@ -16,57 +16,118 @@ from django.shortcuts import redirect,render
 from django.contrib import messages
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
+from .throttling import AnonRateThrottle, UserRateThrottle, check_rate
 from rest_framework import generics, status, permissions
 from .models import Profile 
 from .searilizers import ProfileSerializer
-from django.http import JsonResponse
-from litellm import completion
+from .models import GenerationJob
+from .searilizers import GenerationJobSerializer
+from .jobs import QueueFull, submit_generation
+from .streaming import stream_generated_post
+from .counters import arecord_view, record_view
+from .search import PostSearchFilter, search_posts
+from .page_cache import cache_anonymous_page
+from .conditional import ConditionalGetMixin
+from .bulk import BulkModelMixin
+from .sparse import SparseFieldsViewMixin
+from .db_router import ReplicaReadsMixin, replica_reads
+from .signals import bulk_written
+from .pagination import CommentCursorPagination, InvalidCursor, PostCursorPagination, akeyset_page
+from .aio import aget_user, arender
+from .auth import SupabaseJWTAuthentication, aauthenticate_request
+from rest_framework.exceptions import AuthenticationFailed
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from asgiref.sync import sync_to_async
 from django.conf import settings
 import json
+import math
 import re
 import ast
 import logging
 from django.utils import timezone
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
 import os
+def _search_page(queryset, query, page_number):
+    # Paginator has no async API; count and fetch the page in one thread hop
+    page = Paginator(search_posts(queryset, query), 5).get_page(page_number)
+    page.object_list = list(page.object_list)
+    return page
+
+
 # Home page with search
-def post_list(request):
+@cache_anonymous_page(lambda request: ["list"])
+@replica_reads
+async def post_list(request):
     query = request.GET.get("q")
-    posts_list = Post.objects.filter(status="published").order_by("-published_at")
+    posts_list = Post.objects.filter(status="published").select_related("author").order_by("-published_at")
     if query:
-        posts_list = posts_list.filter(title__icontains=query) | posts_list.filter(content__icontains=query) | posts_list.filter(tags__name__icontains=query)
-
-    paginator = Paginator(posts_list, 5)
-    page_number = request.GET.get("page")
-    posts = paginator.get_page(page_number)
-    context = {"posts": posts, "user": request.user}
-    return render(request, "posts/post_list.html", context)
+        # Ranked search results can't be keyset-paginated; keep page numbers
+        posts = await sync_to_async(_search_page)(posts_list, query, request.GET.get("page"))
+        context = {"posts": posts, "user": await aget_user(request)}
+        return await arender(request, "posts/post_list.html", context)
+
+    # Browsing the feed: "load more" via an opaque (published_at, id) cursor
+    try:
+        page = await akeyset_page(posts_list, PostCursorPagination.ordering, request.GET.get("cursor"), page_size=5)
+    except InvalidCursor:
+        raise Http404("Invalid cursor")
+    context = {
+        "posts": page.items,
+        "next_cursor": page.next_cursor,
+        "previous_cursor": page.previous_cursor,
+        "user": await aget_user(request),
+    }
+    return await arender(request, "posts/post_list.html", context)
 
 
 # Post detail with comments + comment form
-def post_detail(request, slug):
-    post = get_object_or_404(Post, slug=slug, status="published")
-    comments = post.comments.filter(approved=True)
+@replica_reads
+async def post_detail(request, slug):
+    # Everything the template shows is loaded here: lazy queries can't run on the event loop
+    approved = Comment.objects.filter(approved=True).select_related("author")
+    try:
+        post = await (
+            Post.objects.select_related("author")
+            .prefetch_related("tags", Prefetch("comments", queryset=approved))
+            .aget(slug=slug, status="published")
+        )
+    except Post.DoesNotExist:
+        raise Http404("No Post matches the given query.")
+    # Buffered; the count shown includes this view without waiting for the flush
+    await arecord_view(post.pk)
     post.click_count += 1
-    post.save(update_fields=['click_count'])
 
-    # Check if image exists on disk
-    if post.image and not post.image.storage.exists(post.image.name):
+    # Check if image exists on disk (cached by posts.storage, no stat per view)
+    if post.image and not await sync_to_async(post.image.storage.exists)(post.image.name):
         post.image = None
 
-    if request.method == "POST" and request.user.is_authenticated:
+    if request.method == "POST" and (await aget_user(request)).is_authenticated:
         content = request.POST.get("content")
         if content.strip():
-            Comment.objects.create(post=post, author=request.user, content=content)
+            await Comment.objects.acreate(post=post, author=request.user, content=content)
             return redirect("post_detail", slug=post.slug)
 
-    return render(request, "posts/post_detail.html", {"post": post, "comments": comments})
-
-
-def post_comments(request, slug):
-    post = get_object_or_404(Post, slug=slug, status="published")
-    comments = post.comments.filter(approved=True).order_by('-created_at')
-    return render(request, "posts/post_comments.html", {"post": post, "comments": comments})
+    return await arender(request, "posts/post_detail.html", {"post": post, "comments": post.comments.all()})
+
+
+@cache_anonymous_page(lambda request, slug: [f"page:{slug}"])
+async def post_comments(request, slug):
+    try:
+        post = await Post.objects.aget(slug=slug, status="published")
+    except Post.DoesNotExist:
+        raise Http404("No Post matches the given query.")
+    comments = post.comments.filter(approved=True).select_related("author")
+    try:
+        page = await akeyset_page(comments, CommentCursorPagination.ordering, request.GET.get("cursor"), page_size=20)
+    except InvalidCursor:
+        raise Http404("Invalid cursor")
+    return await arender(request, "posts/post_comments.html", {
+        "post": post,
+        "comments": page.items,
+        "next_cursor": page.next_cursor,
+        "previous_cursor": page.previous_cursor,
+    })
 
 # --- Authentication ---
 @csrf_protect
@@ -142,53 +203,47 @@ def create_post_ai(request):
         if not prompt:
             return render(request, "posts/create_post_ai.html", {"error": "Please enter a prompt!"})
 
+        # Generation runs in the background; the status page polls until it's done
         try:
-            # Call AI to generate blog content
-            response = completion(
-                model="gemini/gemini-flash-lite-latest",
-                messages=[
-                    {
-                        "role": "user",
-                        "content":  f"Generate a detailed blog post about: \"{prompt}\".\n\n"
-                                     "Return your output ONLY as a valid JSON object, with these exact keys:\n"
-                                     "- title (string)\n"
-                                     "- content (string)\n"
-                                     "- excerpt (string)\n\n"
-                                    "Rules:\n"
-                                     "1. Do not include any text before or after the JSON.\n"
-                                    "2. Do not use markdown or code blocks.\n"
-                                    "3. The JSON must be valid and directly parsable using json.loads()."
-                    }
-                ],
-                api_key=settings.GEMINI_API_KEY,
-                log_file="litellm_logs.txt"
-            )
-
-            ai_output = response['choices'][0]['message']['content']
-            # parse and clean AI output into title/content/excerpt
-            
-            parsed = json.loads(ai_output)
-            title = parsed.get('title') or 'Post'
-            content = parsed.get('content')
-            excerpt = (parsed.get('excerpt') or content[:150])[:150]
-
-            # Create the post
-            post = Post.objects.create(
-                author=request.user,
-                title=title,
-                slug=slugify(title)[:50],
-                content=content,
-                excerpt=excerpt,
-                status="published",
-                published_at=timezone.now()
-            )
+            job = submit_generation(request.user, prompt, post_status="published")
+        except QueueFull as e:
+            return render(request, "posts/create_post_ai.html", {"error": str(e)}, status=503)
+        return redirect("ai_job_status", job_id=job.pk)
 
-            return redirect("post_detail", slug=post.slug)
+    return render(request, "posts/create_post_ai.html")
 
-        except Exception as e:
-            return render(request, "posts/create_post_ai.html", {"error": str(e)})
 
-    return render(request, "posts/create_post_ai.html")
+@login_required
+def ai_job_status(request, job_id):
+    job = get_object_or_404(GenerationJob, pk=job_id, user=request.user)
+    if job.status == "succeeded" and job.post_id:
+        return redirect("post_detail", slug=job.post.slug)
+    return render(request, "posts/ai_job_status.html", {"job": job})
+
+
+def _authenticated_user(request):
+    return request.user if request.user.is_authenticated else None
+
+
+async def stream_post_ai(request):
+    """Generate a post and stream it to the browser as Server-Sent Events."""
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    # request.user is loaded lazily from the session, which needs the sync ORM
+    user = await sync_to_async(_authenticated_user)(request)
+    if user is None:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+    prompt = request.POST.get("ai_prompt", "").strip()
+    if not prompt:
+        return JsonResponse({"error": "Please enter a prompt!"}, status=400)
+    limit = await sync_to_async(check_rate)(request, "ai", f"user-{user.pk}")
+    if limit is not None and not limit.allowed:
+        return JsonResponse({"error": "Too many AI generations, try again later."}, status=429)
+
+    response = StreamingHttpResponse(stream_generated_post(user, prompt), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # don't let nginx buffer the stream
+    return response
 
 
 @login_required
@@ -223,20 +278,60 @@ def delete_post(request, slug):
 
 
 # --- API ViewSets ---
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(ReplicaReadsMixin, BulkModelMixin, SparseFieldsViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
     lookup_field = "slug"
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # PostSearchFilter goes last so relevance wins over the default ordering
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, PostSearchFilter]
     filterset_fields = ["tags__slug", "status"]
-    search_fields = ["title", "content", "tags__name"]
-    ordering = ["-published_at"]
+    # Must match PostCursorPagination.ordering for keyset pages
+    ordering = ["-published_at", "-id"]
+    pagination_class = PostCursorPagination
+
+    # List responses embed only the latest few comments of each post
+    list_comments_limit = 3
+    bulk_prefetch = ("tags", Prefetch("comments", queryset=Comment.objects.select_related("author")))
 
     def get_queryset(self):
-        if self.action in ["list", "retrieve"]:
-            return Post.objects.filter(status="published")
-        return Post.objects.all()
+        if self.action not in ("list", "retrieve"):
+            return Post.objects.all()
+        queryset = Post.objects.filter(status="published")
+        selection = self.get_field_selection()
+        if selection is None:
+            # No ?fields= / ?expand=: the full representation
+            return queryset.select_related("author").prefetch_related("tags", self._comments_prefetch(None))
+        # Load only the columns and relations the response shows (posts/sparse.py)
+        queryset = self.sparse_only(queryset, selection, self.ordering)
+        if selection.expands("author"):
+            queryset = queryset.select_related("author")
+        if selection.expands("tags"):
+            queryset = queryset.prefetch_related("tags")
+        if selection.expands("comments"):
+            queryset = queryset.prefetch_related(self._comments_prefetch(selection.nested("comments")))
+        return queryset
+
+    def _comments_prefetch(self, selection):
+        comments = Comment.objects.all()
+        if selection is None or selection.expands("author"):
+            comments = comments.select_related("author")
+        if selection is not None:
+            # post_id is what the prefetch matches comments to posts on
+            comments = comments.only("post", *CommentSerializer.sparse_columns(selection))
+        if self.action == "list":
+            # One query for the whole page: number each post's comments newest
+            # first and keep the first N, instead of fetching every comment.
+            comments = (
+                comments.annotate(row_number=Window(
+                    expression=RowNumber(),
+                    partition_by=F("post_id"),
+                    order_by=F("created_at").desc(),
+                ))
+                .filter(row_number__lte=self.list_comments_limit)
+                .order_by("-created_at")
+            )
+        return Prefetch("comments", queryset=comments)
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -247,31 +342,113 @@ class PostViewSet(viewsets.ModelViewSet):
        else:
            serializer.save(author=self.request.user)
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == "bulk" and isinstance(self.request.data, list):
+            # One query for the tags of every item instead of one per item
+            slugs = {
+                slug for item in self.request.data if isinstance(item, dict)
+                for slug in (item.get("tag_slugs") or []) if isinstance(slug, str)
+            }
+            context["tags_by_slug"] = Tag.objects.in_bulk(slugs, field_name="slug")
+        return context
+
+    def perform_bulk_create(self, validated):
+        tags = [data.pop("tag_slugs", None) for data in validated]
+        posts = [Post(author=self.request.user, **data) for data in validated]
+        for post in posts:
+            # What Post.save() would do; published_at is auto_now_add
+            if not post.slug:
+                post.slug = slugify(post.title)
+        Post.objects.bulk_create(posts)
+        self._bulk_set_tags({post: post_tags for post, post_tags in zip(posts, tags) if post_tags is not None})
+        bulk_written(Post, posts)
+        return posts
+
+    def perform_bulk_update(self, changes):
+        tags = {obj: data.pop("tag_slugs") for obj, data in changes if "tag_slugs" in data}
+        for obj, data in changes:
+            if data.get("status", obj.status) == "published" and not obj.published_at:
+                data["published_at"] = timezone.now()
+        posts = super().perform_bulk_update(changes)
+        self._bulk_set_tags(tags)
+        return posts
+
+    def _bulk_set_tags(self, tags_by_post):
+        """Replace the tags of each post in a couple of queries, through PostTag."""
+        if not tags_by_post:
+            return
+        wanted = {(post.pk, tag.pk) for post, tags in tags_by_post.items() for tag in tags}
+        rows = PostTag.objects.filter(post__in=list(tags_by_post)).values_list("id", "post_id", "tag_id")
+        existing = {(post_id, tag_id): pk for pk, post_id, tag_id in rows}
+        stale = [pk for pair, pk in existing.items() if pair not in wanted]
+        if stale:
+            PostTag.objects.filter(pk__in=stale).delete()
+        added = PostTag.objects.bulk_create(
+            [PostTag(post_id=post_id, tag_id=tag_id) for post_id, tag_id in wanted - existing.keys()]
+        )
+        bulk_written(PostTag, added)
+
+    def get_validator_scopes(self):
+        if self.action == "retrieve":
+            return [f"page:{self.kwargs['slug']}"]
+        return ["list", "comments"]
+
     def retrieve(self, request, *args, **kwargs):
+        response = self._conditional(request, self._retrieve_and_count, self._published_pk)
+        if response.status_code == 304:
+            # Revalidating a cached copy is still a view
+            record_view(self._published_pk())
+        return response
+
+    def _published_pk(self):
+        """The pk of the post being retrieved, without loading it; Http404 if there is none."""
+        if not hasattr(self, "_pk"):
+            pk = Post.objects.filter(status="published", slug=self.kwargs["slug"]).values_list("pk", flat=True).first()
+            if pk is None:
+                raise Http404("No Post matches the given query.")
+            self._pk = pk
+        return self._pk
+
+    def _retrieve_and_count(self):
         instance = self.get_object()
-        instance.click_count += 1
-        instance.save(update_fields=['click_count'])  
+        record_view(instance.pk)
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(BulkModelMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_validator_scopes(self):
+        return ["tags"]
+
 
-class CommentViewSet(viewsets.ModelViewSet):
-    queryset = Comment.objects.all()
+class CommentViewSet(BulkModelMixin, SparseFieldsViewMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Comment.objects.select_related('author')
     serializer_class = CommentSerializer
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    permission_classes = [IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
+    pagination_class = CommentCursorPagination
 
     def get_queryset(self):
         # Support either the explicit 'post_slug' kwarg or nested router's 'post_pk'
         post_slug = self.kwargs.get('post_slug') or self.kwargs.get('post_pk') or self.request.query_params.get('post')
+        queryset = Comment.objects.filter(post__slug=post_slug, approved=True) if post_slug else Comment.objects.all()
+        selection = self.get_field_selection()
+        if selection is None:
+            return queryset.select_related('author')
+        queryset = self.sparse_only(queryset, selection, self.pagination_class.ordering)
+        if selection.expands('author'):
+            queryset = queryset.select_related('author')
+        return queryset
+
+    def get_validator_scopes(self):
+        post_slug = self.kwargs.get('post_slug') or self.kwargs.get('post_pk')
         if post_slug:
-            return Comment.objects.filter(post__slug=post_slug, approved=True)
-        return super().get_queryset()
+            return [f"page:{post_slug}"]
+        return ["comments"]
 
     def perform_create(self, serializer):
         # Attach the post (by slug from URL or nested kwarg) and the requesting user as author
@@ -283,6 +460,21 @@ class CommentViewSet(viewsets.ModelViewSet):
             # fallback: expect 'post' in validated data
             serializer.save(author=self.request.user)
 
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if self.action == 'bulk' and (self.kwargs.get('post_slug') or self.kwargs.get('post_pk')):
+            # Nested bulk writes take the post from the URL, not from each item
+            serializer.child.fields['post'].read_only = True
+        return serializer
+
+    def perform_bulk_create(self, validated):
+        # Same defaults as CommentSerializer.create()
+        extra = {'author': self.request.user, 'approved': True}
+        post_slug = self.kwargs.get('post_slug') or self.kwargs.get('post_pk')
+        if post_slug:
+            extra['post'] = get_object_or_404(Post, slug=post_slug)
+        return super().perform_bulk_create([{**data, **extra} for data in validated])
+
 def add_comment(request, slug):
     post = get_object_or_404(Post, slug=slug)
     if request.method == 'POST':
@@ -304,6 +496,11 @@ class ProfileUpdateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def _get_profile(self, user):
+        # SupabaseJWTAuthentication already resolved the profile for this user
+        try:
+            return user.profile
+        except Profile.DoesNotExist:
+            pass
         profile, created = Profile.objects.get_or_create(
             user=user,
             defaults={
@@ -336,6 +533,49 @@ class ProfileUpdateView(APIView):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+
+_profile_update_view = ProfileUpdateView.as_view()
+
+
+def _accepts_json(request):
+    """True when DRF's content negotiation would pick the JSON renderer."""
+    if request.GET.get("format", "json") != "json":
+        return False
+    accepted = (media.split(";")[0].strip() for media in request.headers.get("Accept", "*/*").split(","))
+    return all(media in ("", "*/*", "application/*", "application/json") for media in accepted)
+
+
+async def profile_api(request):
+    """/api/me/: JSON GETs are served natively async; writes and other formats go to ProfileUpdateView."""
+    if request.method != "GET" or not _accepts_json(request):
+        return await sync_to_async(_profile_update_view)(request)
+
+    unauthorized = {"WWW-Authenticate": SupabaseJWTAuthentication().authenticate_header(request)}
+    try:
+        user, _ = await aauthenticate_request(request)
+    except AuthenticationFailed as e:
+        return JsonResponse({"detail": str(e.detail)}, status=401, headers=unauthorized)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401, headers=unauthorized)
+    # What RequestKindThrottle does for ProfileUpdateView; the headers come from RateLimitHeadersMiddleware
+    limit = await sync_to_async(check_rate)(request, "read", f"user-{user.pk}")
+    if limit is not None and not limit.allowed:
+        return JsonResponse(
+            {"detail": f"Request was throttled. Expected available in {math.ceil(limit.wait)} seconds."}, status=429,
+        )
+
+    if User.profile.is_cached(user):
+        profile = user.profile
+    else:
+        profile = await Profile.objects.filter(user=user).afirst()
+        if profile is None:
+            profile = await sync_to_async(ProfileUpdateView()._get_profile)(user)
+    return JsonResponse(ProfileSerializer(profile).data)
+
+
+# DRF views are csrf-exempt and enforce CSRF for session auth themselves
+profile_api.csrf_exempt = True
+
 @login_required
 def generate_blog(request):
     if request.method == "POST":
@@ -346,6 +586,7 @@ def generate_blog(request):
 
 class GenerateBlogAPI(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = "ai"
 
     def post(self, request):
         prompt = request.data.get("prompt")
@@ -353,34 +594,17 @@ class GenerateBlogAPI(APIView):
             return Response({"error": "Prompt is required"}, status=400)
 
         try:
-            response = completion(
-                model="gemini/gemini-flash-lite-latest",
-                messages=[{
-                    "role": "user",
-                    "content": f"Generate a detailed blog post about: {prompt}. "
-                               f"Return JSON with keys: title, content, excerpt."
-                }],
-                api_key=settings.GEMINI_API_KEY,
-                log_file="litellm_logs.txt"
-            )
-            ai_output = response['choices'][0]['message']['content']
-            parsed = parse_and_clean_ai_output(ai_output)
-            # Ensure we have sensible defaults when parsing failed
-            title = parsed.get('title') or f"AI: {prompt}"
-            content = parsed.get('content') or ai_output
-            excerpt = parsed.get('excerpt') or (content[:150])
-
-            post = Post.objects.create(
-                author=request.user,
-                title=title,
-                slug=slugify(title)[:50],
-                content=content,
-                excerpt=excerpt,
-                status="draft"
-            )
+            job = submit_generation(request.user, prompt, post_status="draft")
+        except QueueFull as e:
+            return Response({"error": str(e)}, status=503, headers={"Retry-After": "30"})
+        serializer = GenerationJobSerializer(job, context={"request": request})
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
-            serializer = PostSerializer(post)
-            return Response(serializer.data)
 
-        except Exception as e:
-            return Response({"error": str(e)}, status=500)
+class GenerationJobStatusAPI(generics.RetrieveAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = GenerationJobSerializer
+    lookup_url_kwarg = "job_id"
+
+    def get_queryset(self):
+        return GenerationJob.objects.filter(user=self.request.user).select_related('post')